@@ -0,0 +1,214 @@
+"""End-to-end throughput of the spiders against the local replay server.
+
+Runs every selected spider on its own, then all of them together, through the
+full Scrapy stack (scheduler, middlewares, downloader, pipeline, feed export)
+with the replay settings profile, and reports per run:
+
+    req/s        downloaded requests per second of crawl time
+    items/s      scraped items per second of crawl time
+    p50/p95 ms   download latency (request sent to response received)
+    peak RSS     maximum resident set size of the crawling process
+
+Each run is a separate process, so the RSS numbers do not mix. The replay
+server lives in this process and injects the requested latency, jitter and
+error rate.
+
+    python benchmarks/e2e_bench.py                               # all spiders, no latency
+    python benchmarks/e2e_bench.py itu gazi --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+    python benchmarks/e2e_bench.py --no-combined --output e2e.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def crawl(spider_names, server_url, concurrency, loglevel):
+    """Run the spiders in this process, return the child report"""
+    os.environ["SCRAPY_SETTINGS_MODULE"] = "teknokent_scraper.settings_replay"
+    os.environ["REPLAY_SERVER_URL"] = server_url
+    sys.path.insert(0, ROOT)
+    import main as runner
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+
+    settings = runner.build_settings(len(spider_names), concurrency, loglevel)
+    process = CrawlerProcess(settings)
+
+    crawlers = []
+    for name in spider_names:
+        crawler = process.create_crawler(runner.SPIDERS[name])
+        latencies = []
+
+        def response_received(response, request, spider, latencies=latencies):
+            latency = request.meta.get("download_latency")
+            if latency is not None:
+                latencies.append(latency)
+
+        # Signal receivers are held weakly: keep a reference with the crawler
+        crawler.signals.connect(response_received, signal=signals.response_received)
+        process.crawl(crawler)
+        crawlers.append((name, crawler, latencies, response_received))
+
+    started = time.monotonic()
+    process.start()
+    elapsed = time.monotonic() - started
+
+    spiders = {}
+    for name, crawler, latencies, _ in crawlers:
+        stats = crawler.stats.get_stats()
+        spiders[name] = {
+            "requests": stats.get("downloader/request_count", 0),
+            "items": stats.get("item_scraped_count", 0),
+            "errors": stats.get("log_count/ERROR", 0),
+            "retries": stats.get("retry/count", 0),
+            "latencies": latencies,
+        }
+    return {
+        "elapsed": elapsed,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "spiders": spiders,
+    }
+
+
+def summarize(label, report):
+    """One result row from a child report"""
+    spiders = report["spiders"].values()
+    latencies = [latency for spider in spiders for latency in spider["latencies"]]
+    requests = sum(spider["requests"] for spider in spiders)
+    items = sum(spider["items"] for spider in spiders)
+    elapsed = report["elapsed"]
+    p50, p95 = percentile(latencies, 0.50), percentile(latencies, 0.95)
+    return {
+        "run": label,
+        "spiders": sorted(report["spiders"]),
+        "seconds": round(elapsed, 2),
+        "requests": requests,
+        "items": items,
+        "retries": sum(spider["retries"] for spider in spiders),
+        "errors": sum(spider["errors"] for spider in spiders),
+        "requests_per_sec": round(requests / elapsed, 1) if elapsed else 0.0,
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        "peak_rss_mb": round(report["peak_rss_mb"], 1),
+    }
+
+
+def run_child(spider_names, server_url, args):
+    """Crawl in a fresh interpreter and working directory, return its report"""
+    with tempfile.TemporaryDirectory() as workdir:
+        report_path = os.path.join(workdir, "report.json")
+        command = [
+            sys.executable, os.path.abspath(__file__), "--child", report_path,
+            "--server", server_url, "--concurrency", str(args.concurrency), "--loglevel", args.loglevel,
+            *spider_names,
+        ]
+        # Feeds, nonce caches and spider state land in the scratch directory
+        subprocess.run(command, cwd=workdir, check=True)
+        with open(report_path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def print_results(rows):
+    print()
+    print(f"{'run':<32} {'secs':>6} {'reqs':>6} {'items':>6} {'req/s':>8} {'items/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'RSS MB':>7} {'retry':>6}")
+    print("-" * 102)
+    for row in rows:
+        print(
+            f"{row['run']:<32} {row['seconds']:>6.1f} {row['requests']:>6} {row['items']:>6} "
+            f"{row['requests_per_sec']:>8.1f} {row['items_per_sec']:>8.1f} {row['p50_ms'] or 0:>7.1f} "
+            f"{row['p95_ms'] or 0:>7.1f} {row['peak_rss_mb']:>7.1f} {row['retries']:>6}"
+        )
+
+
+def main(argv=None):
+    sys.path.insert(0, ROOT)
+    from main import SPIDERS
+
+    parser = argparse.ArgumentParser(description="End-to-end crawl benchmark against the local replay server")
+    parser.add_argument("spiders", nargs="*", metavar="SPIDER", help=f"Spiders to run (default: all). Choices: {', '.join(SPIDERS)}")
+    parser.add_argument("-c", "--concurrency", type=int, default=32, help="Global concurrent request budget (default: 32)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean replay server latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- spread around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503 (0-1)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for jitter and errors (default: 1)")
+    parser.add_argument("--no-combined", action="store_true", help="Skip the run with all spiders together")
+    parser.add_argument("--no-single", action="store_true", help="Skip the one-spider runs")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("-L", "--loglevel", default="ERROR", help="Scrapy log level of the crawls (default: ERROR)")
+    parser.add_argument("--child", metavar="REPORT", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.spiders if name not in SPIDERS]
+    if unknown:
+        parser.error(f"unknown spider(s): {', '.join(unknown)}")
+    selected = args.spiders or list(SPIDERS)
+
+    if args.child:
+        report = crawl(selected, args.server, args.concurrency, args.loglevel)
+        with open(args.child, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        return 0
+
+    from replay_server import start_server
+
+    server = start_server(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"Replay server on {server.url}: latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, error rate {args.error_rate:.1%}")
+
+    rows = []
+    try:
+        if not args.no_single:
+            for name in selected:
+                print(f"Crawling {name} ...", flush=True)
+                rows.append(summarize(name, run_child([name], server.url, args)))
+        if not args.no_combined and len(selected) > 1:
+            print(f"Crawling {len(selected)} spiders together ...", flush=True)
+            rows.append(summarize("combined", run_child(selected, server.url, args)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print_results(rows)
+    print(f"\nReplay server: {server.counts['requests']} requests, {server.counts['errors']} injected errors, "
+          f"{server.counts['not_found']} unknown URLs")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "concurrency": args.concurrency,
+                "runs": rows,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
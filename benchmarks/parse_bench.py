@@ -0,0 +1,351 @@
+"""Offline parse benchmark for every spider callback.
+
+Each case feeds a recorded response from tests/fixtures/<site>/ to one spider
+callback, with no network and no engine, and reports:
+
+    items/s      items yielded per CPU second spent in the callback
+    us/resp      CPU microseconds per response (lxml parsing included), best
+                 of the rounds
+    KiB/resp     peak Python heap allocated while handling one response
+                 (tracemalloc; lxml's own C allocations are not counted)
+
+Usage (from the repository root):
+
+    python benchmarks/parse_bench.py                  # run and compare with the baseline
+    python benchmarks/parse_bench.py --save-baseline  # store the current numbers
+    python benchmarks/parse_bench.py -k ankara -n 50  # only the Ankara cases, 50 rounds
+
+With a baseline present, cases slower than --tolerance percent are flagged
+and the exit status is 1. Timings depend on the machine, so keep the stored
+baseline from the machine the comparison runs on; a change in the number of
+items or requests a case yields is reported too.
+"""
+
+import gc
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "teknokent_scraper"))
+
+from scrapy import Item
+from scrapy.http import HtmlResponse, Request, TextResponse
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.spiders.ankara_teknokent_comprehensive import AnkaraTeknokentComprehensiveSpider
+from teknokent_scraper.spiders.bilkent_teknokent_spider import BilkentSpider
+from teknokent_scraper.spiders.ege_teknokpark import EgeTeknoKentSpider
+from teknokent_scraper.spiders.gazi_teknokent_spider import GaziSpider
+from teknokent_scraper.spiders.hacettepe_teknokent_spider import HacettepeSpider
+from teknokent_scraper.spiders.itu_teknokent_spider import ItuTeknokentSpider
+from teknokent_scraper.spiders.izmir_teknopark import IzmirTeknoparkSpider
+from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+FIXTURES_DIR = os.path.join(ROOT, "tests", "fixtures")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+ANKARA_DETAIL_META = {
+    "company_name": "Firma",
+    "company_phone": ["0312 555 12 34"],
+    "company_url": "https://firmarehberi.ankarateknokent.com/firma/firma/",
+    "category": "YAZILIM-BILISIM",
+}
+
+# name, spider class, callback, fixture files, url, request meta and the
+# spider state each response starts from
+CASES = [
+    {
+        "name": "ankara/category",
+        "spider": AnkaraTeknokentComprehensiveSpider,
+        "callback": "parse_category_page",
+        "files": ["ankara/category_yazilim-bilisim.html"],
+        "url": AnkaraTeknokentComprehensiveSpider.CATEGORIES["YAZILIM-BILISIM"],
+        "meta": {"category": "YAZILIM-BILISIM"},
+        # Listing pages waiting for the nonce are re-issued once it is found
+        "state": {"nonce_pending": [["YAZILIM-BILISIM", 0], ["SAVUNMA", 0]]},
+    },
+    {
+        "name": "ankara/ajax",
+        "spider": AnkaraTeknokentComprehensiveSpider,
+        "callback": "parse_ajax_listings",
+        "files": ["ankara/ajax_yazilim-bilisim_page0.json"],
+        "url": "https://firmarehberi.ankarateknokent.com/?mylisting-ajax=1&action=get_listings",
+        "meta": {"category": "YAZILIM-BILISIM", "page": 0, "nonce": "4f1c9a2e7b"},
+    },
+    {
+        "name": "ankara/detail",
+        "spider": AnkaraTeknokentComprehensiveSpider,
+        "callback": "parse_company_detail",
+        "files": [
+            "ankara/detail_aselsis.html",
+            "ankara/detail_gomulu.html",
+            "ankara/detail_medicore.html",
+            "ankara/detail_veritas.html",
+        ],
+        "url": "https://firmarehberi.ankarateknokent.com/firma/firma/",
+        "meta": ANKARA_DETAIL_META,
+    },
+    {
+        "name": "hacettepe/category",
+        "spider": HacettepeSpider,
+        "callback": "parse_category_page",
+        "files": ["hacettepe/category_yazilim.html"],
+        "url": HacettepeSpider.CATEGORIES["YAZILIM"],
+        "meta": {"category": "YAZILIM"},
+    },
+    {
+        "name": "hacettepe/detail",
+        "spider": HacettepeSpider,
+        "callback": "parse_company_detail",
+        "files": [
+            "hacettepe/detail_biyonik.html",
+            "hacettepe/detail_enerjitek.html",
+            "hacettepe/detail_kuantum.html",
+        ],
+        "url": "https://www.hacettepeteknokent.com.tr/tr/firma/firma-1",
+        "meta": ANKARA_DETAIL_META,
+    },
+    {
+        "name": "bilkent/archive",
+        "spider": BilkentSpider,
+        "callback": "parse",
+        "files": ["bilkent/archive_1.html", "bilkent/archive_9.html"],
+        "url": BilkentSpider.ARCHIVE_URL.format(1),
+        "meta": {},
+    },
+    {
+        "name": "ege/tablepress",
+        "spider": EgeTeknoKentSpider,
+        "callback": "parse",
+        "files": ["ege/kuluckalik-firmalar.html", "ege/ege-teknopark.html"],
+        # parse() picks the table from the URL
+        "urls": EgeTeknoKentSpider.start_urls,
+        "meta": {},
+    },
+    {
+        "name": "gazi/api",
+        "spider": GaziSpider,
+        "callback": "parse",
+        "files": ["gazi/units.json"],
+        "url": GaziSpider.start_urls[0],
+        "meta": {},
+    },
+    {
+        "name": "itu/listing",
+        "spider": ItuTeknokentSpider,
+        "callback": "parse",
+        "files": ["itu/listing_page1.html"],
+        "url": ItuTeknokentSpider.start_urls[0],
+        "meta": {},
+    },
+    {
+        "name": "itu/company_json",
+        "spider": ItuTeknokentSpider,
+        "callback": "parse_company_details",
+        "files": ["itu/company_5100.json", "itu/company_5101.json"],
+        "url": ItuTeknokentSpider.DETAIL_URL.format(5100),
+        "meta": {"company_id": "5100"},
+    },
+    {
+        "name": "izmir/list",
+        "spider": IzmirTeknoparkSpider,
+        "callback": "parse",
+        "files": ["izmir/firmalar-liste.html"],
+        "url": "https://teknoparkizmir.com.tr/tr/firmalar-liste/",
+        "meta": {},
+    },
+    {
+        "name": "odtu/table",
+        "spider": OdtuSpider,
+        "callback": "parse",
+        "files": ["odtu/tum-firmalar.html"],
+        "url": OdtuSpider.start_urls[0],
+        "meta": {},
+    },
+]
+
+
+def load_fixtures(case):
+    """(url, body) pairs for a case"""
+    urls = case.get("urls") or [case["url"]] * len(case["files"])
+    bodies = []
+    for url, name in zip(urls, case["files"]):
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            bodies.append((url, f.read()))
+    return bodies
+
+
+def make_response(url, body, meta, is_json):
+    request = Request(url, meta=dict(meta))
+    cls = TextResponse if is_json else HtmlResponse
+    return cls(url, body=body, encoding="utf-8", request=request)
+
+
+def run_callback(spider, callback, response):
+    """Exhaust a callback, return (items, requests)"""
+    items = requests = 0
+    for output in getattr(spider, callback)(response) or ():
+        if isinstance(output, Request):
+            requests += 1
+        elif isinstance(output, (Item, dict)):
+            items += 1
+    return items, requests
+
+
+def bench_case(case, rounds):
+    crawler = get_crawler(case["spider"])
+    spider = crawler._create_spider()
+    fixtures = load_fixtures(case)
+    is_json = [name.endswith(".json") for name in case["files"]]
+
+    def reset_state():
+        spider.checkpoint_state.clear()
+        spider.checkpoint_state.update(copy.deepcopy(case.get("state", {})))
+
+    def responses():
+        return [make_response(url, body, case["meta"], json_) for (url, body), json_ in zip(fixtures, is_json)]
+
+    # Warm-up, and the output counts of one round
+    items = requests = 0
+    for response in responses():
+        reset_state()
+        i, r = run_callback(spider, case["callback"], response)
+        items += i
+        requests += r
+
+    # Best round, like timeit: slower rounds measure other load on the machine
+    round_times = []
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            elapsed = 0.0
+            # Build the responses outside the timed region; parsing happens
+            # lazily on first use, inside it
+            for response in responses():
+                reset_state()
+                started = time.process_time()
+                run_callback(spider, case["callback"], response)
+                elapsed += time.process_time() - started
+            round_times.append(elapsed)
+    finally:
+        gc.enable()
+    elapsed = min(round_times)
+
+    peak = 0
+    tracemalloc.start()
+    for response in responses():
+        reset_state()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run_callback(spider, case["callback"], response)
+        peak += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        "responses": len(fixtures),
+        "items": items,
+        "requests": requests,
+        "items_per_sec": round(items / elapsed, 1) if elapsed else 0.0,
+        "us_per_response": round(elapsed / len(fixtures) * 1e6, 1),
+        "alloc_kib_per_response": round(peak / len(fixtures) / 1024, 1),
+    }
+
+
+def run(selected=None, rounds=20):
+    """Benchmark the selected cases, return {case name: metrics}"""
+    results = {}
+    cwd = os.getcwd()
+    # Callbacks like the Ankara nonce refresh write state files relative to the cwd
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for case in CASES:
+                if selected and not any(key in case["name"] for key in selected):
+                    continue
+                results[case["name"]] = bench_case(case, rounds)
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, rounds, path=BASELINE_PATH):
+    baseline = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "rounds": rounds,
+        "cases": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def report(results, baseline=None, tolerance=50.0):
+    """Print the results table, return the names of regressed cases"""
+    cases = (baseline or {}).get("cases", {})
+    regressed = []
+    print(f"{'case':<20} {'resp':>5} {'items':>6} {'reqs':>5} {'items/s':>10} {'us/resp':>10} {'KiB/resp':>9}  vs baseline")
+    print("-" * 92)
+    for name, metrics in results.items():
+        line = (
+            f"{name:<20} {metrics['responses']:>5} {metrics['items']:>6} {metrics['requests']:>5} "
+            f"{metrics['items_per_sec']:>10.0f} {metrics['us_per_response']:>10.1f} {metrics['alloc_kib_per_response']:>9.1f}"
+        )
+        before = cases.get(name)
+        if before:
+            change = (metrics["us_per_response"] / before["us_per_response"] - 1) * 100
+            line += f"  {change:+6.1f}% time"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressed.append(name)
+            if (metrics["items"], metrics["requests"]) != (before["items"], before["requests"]):
+                line += f"  output changed (was {before['items']} items, {before['requests']} requests)"
+        print(line)
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the spider callbacks on the recorded fixtures")
+    parser.add_argument("-k", dest="selected", action="append", help="Only cases whose name contains this (repeatable)")
+    parser.add_argument("-n", "--rounds", type=int, default=20, help="Timed rounds over each case's fixtures (default: 20)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write the results to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    parser.add_argument("--tolerance", type=float, default=50.0, help="Allowed slowdown against the baseline, in percent (default: 50)")
+    args = parser.parse_args(argv)
+
+    # The callbacks log every company; that is not what we are measuring
+    logging.disable(logging.CRITICAL)
+    results = run(args.selected, args.rounds)
+
+    if args.save_baseline:
+        save_baseline(results, args.rounds)
+        report(results)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+        return 0
+
+    baseline = load_baseline()
+    regressed = report(results, baseline, args.tolerance)
+    if baseline is None:
+        print("\nNo baseline yet: run with --save-baseline to store one")
+    elif regressed:
+        print(f"\n{len(regressed)} case(s) slower than the baseline by more than {args.tolerance:.0f}%: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Per-item cost of TeknokentScraperPipeline, before and after batched normalisation.
+
+The items are the real ones the spider callbacks yield for the recorded
+fixtures in tests/fixtures/ (see parse_bench.py). Each round gets fresh
+copies of them, and three variants run over the same items:
+
+    legacy     the previous process_item: ItemAdapter walk, six adapter.get
+               defaults and one INFO log line per item
+    direct     normalize_item() with the per-spider defaults, no batching
+    batched    process_item() with NORMALIZE_BATCH_SIZE items per flush,
+               Deferreds included
+
+Logging goes to a NullHandler at INFO, so the legacy numbers include building
+the log record but no I/O. Reported is CPU time per item, best of the rounds.
+
+    python benchmarks/pipeline_bench.py
+    python benchmarks/pipeline_bench.py -n 200 --batch-size 64
+"""
+
+import gc
+import os
+import sys
+import copy
+import time
+import logging
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from itemadapter import ItemAdapter
+from scrapy import Item
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+
+from parse_bench import CASES, load_fixtures, make_response
+from teknokent_scraper.pipelines import TeknokentScraperPipeline, normalize_item
+from teknokent_scraper.settings import ITEM_DEFAULTS
+
+
+def legacy_process_item(item, spider, state):
+    """process_item as it was before the normalisation stage"""
+    adapter = ItemAdapter(item)
+
+    for field_name, field_value in adapter.items():
+        if field_value:
+            if isinstance(field_value, list):
+                adapter[field_name] = '; '.join([str(v).strip() for v in field_value if str(v).strip()])
+            elif isinstance(field_value, str):
+                adapter[field_name] = field_value.strip()
+
+    if not adapter.get('company_name'):
+        spider.logger.warning("Item dropped: missing company_name")
+        return None
+
+    if not adapter.get('company_location'):
+        adapter['company_location'] = 'Ankara'
+    if not adapter.get('company_desc'):
+        adapter['company_desc'] = ''
+    if not adapter.get('company_contact_mail'):
+        adapter['company_contact_mail'] = ''
+    if not adapter.get('company_phone'):
+        adapter['company_phone'] = ''
+    if not adapter.get('company_website'):
+        adapter['company_website'] = ''
+    if not adapter.get('company_area'):
+        adapter['company_area'] = ''
+
+    state["items_scraped"] += 1
+    spider.logger.info(f"Processed item {state['items_scraped']}: {adapter.get('company_name')}")
+    return item
+
+
+def collect_items():
+    """{spider class: [items]} from every parse_bench case"""
+    collected = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        # Some callbacks write state files relative to the cwd
+        os.chdir(scratch)
+        try:
+            for case in CASES:
+                spider = get_crawler(case["spider"])._create_spider()
+                spider.checkpoint_state.update(copy.deepcopy(case.get("state", {})))
+                for (url, body), name in zip(load_fixtures(case), case["files"]):
+                    response = make_response(url, body, case["meta"], name.endswith(".json"))
+                    for output in getattr(spider, case["callback"])(response) or ():
+                        if isinstance(output, (Item, dict)) and not isinstance(output, Request):
+                            collected.setdefault(case["spider"], []).append(output)
+        finally:
+            os.chdir(cwd)
+    return collected
+
+
+class NoTimer:
+    def active(self):
+        return False
+
+
+class UntimedPipeline(TeknokentScraperPipeline):
+    """No reactor here: batches are flushed when full or at the end of a pass"""
+
+    def schedule_flush(self, spider):
+        return NoTimer()
+
+
+class FakeSpider:
+    def __init__(self, name):
+        self.name = name
+        self.logger = logging.LoggerAdapter(logging.getLogger(name), {})
+
+
+def time_variant(run, items, rounds):
+    """Best CPU seconds of one pass over fresh copies of the items"""
+    best = None
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            batch = copy.deepcopy(items)
+            started = time.process_time()
+            run(batch)
+            elapsed = time.process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+    return best
+
+
+def bench_spider(spidercls, items, rounds, batch_size):
+    spider = FakeSpider(spidercls.name)
+    defaults = {**TeknokentScraperPipeline().defaults, **ITEM_DEFAULTS.get(spidercls.name, {})}
+
+    def legacy(batch):
+        state = {"items_scraped": 0}
+        for item in batch:
+            legacy_process_item(item, spider, state)
+
+    def direct(batch):
+        for item in batch:
+            normalize_item(item, defaults)
+
+    pipeline = UntimedPipeline(ITEM_DEFAULTS, batch_size=batch_size)
+    pipeline.open_spider(spider)
+
+    def batched(batch):
+        for item in batch:
+            pipeline.process_item(item, spider)
+        pipeline.flush(spider)
+
+    return {
+        name: time_variant(run, items, rounds) / len(items) * 1e6
+        for name, run in (("legacy", legacy), ("direct", direct), ("batched", batched))
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-item cost of the item pipeline, before and after")
+    parser.add_argument("-n", "--rounds", type=int, default=50, help="Rounds per variant, best one counts (default: 50)")
+    parser.add_argument("--batch-size", type=int, default=32, help="NORMALIZE_BATCH_SIZE for the batched variant")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    collected = collect_items()
+
+    print(f"{'spider':<32} {'items':>6} {'legacy us':>10} {'direct us':>10} {'batched us':>11} {'speedup':>8}")
+    print("-" * 82)
+    totals = {"legacy": 0.0, "direct": 0.0, "batched": 0.0}
+    count = 0
+    for spidercls, items in collected.items():
+        result = bench_spider(spidercls, items, args.rounds, args.batch_size)
+        for name in totals:
+            totals[name] += result[name] * len(items)
+        count += len(items)
+        print(
+            f"{spidercls.name:<32} {len(items):>6} {result['legacy']:>10.2f} {result['direct']:>10.2f} "
+            f"{result['batched']:>11.2f} {result['legacy'] / result['batched']:>7.1f}x"
+        )
+    print("-" * 82)
+    print(
+        f"{'all':<32} {count:>6} {totals['legacy'] / count:>10.2f} {totals['direct'] / count:>10.2f} "
+        f"{totals['batched'] / count:>11.2f} {totals['legacy'] / totals['batched']:>7.1f}x"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Local stand-in for all eight teknokent sites.
+
+Serves the recorded responses in tests/fixtures/ under
+http://<address>/<original host>/<original path>, which is where
+teknokent_scraper.replay.ReplayDownloadHandler sends requests when the
+spiders run with the replay settings profile.
+
+Every answer waits --latency-ms plus or minus a uniform --jitter-ms, and a
+--error-rate share of the requests gets a 503 instead of the fixture. Listing
+routes can rewrite the links in their fixture per request URL ("vary"), so
+every listing page leads to its own detail pages like on the real sites.
+
+    python benchmarks/replay_server.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures")
+
+ANKARA = "firmarehberi.ankarateknokent.com"
+HACETTEPE = "www.hacettepeteknokent.com.tr"
+
+# First match wins: host, path regex, optional query regex, fixture files
+# (served in turn) and an optional (pattern, replacement) applied per distinct
+# request URL, with {n} numbering those URLs
+ROUTES = [
+    {
+        "host": ANKARA,
+        "path": r"^/$",
+        "query": r"action=get_listings",
+        "files": ["ankara/ajax_yazilim-bilisim_page0.json"],
+        "vary": (r"(/firma/[^/\"]+)/", r"\g<1>-{n}/"),
+    },
+    {"host": ANKARA, "path": r"^/$", "files": ["ankara/category_yazilim-bilisim.html"]},
+    {
+        "host": ANKARA,
+        "path": r"^/firma/",
+        "files": [
+            "ankara/detail_aselsis.html",
+            "ankara/detail_gomulu.html",
+            "ankara/detail_medicore.html",
+            "ankara/detail_veritas.html",
+        ],
+    },
+    {
+        "host": HACETTEPE,
+        "path": r"^/tr/firma_rehberi/",
+        "files": ["hacettepe/category_yazilim.html"],
+        "vary": (r'href="(/tr/firma/[^"]+)"', r'href="\g<1>-{n}"'),
+    },
+    {
+        "host": HACETTEPE,
+        "path": r"^/tr/firma/",
+        "files": [
+            "hacettepe/detail_biyonik.html",
+            "hacettepe/detail_enerjitek.html",
+            "hacettepe/detail_kuantum.html",
+        ],
+    },
+    {"host": "www.cyberpark.com.tr", "path": r"^/firma-arsiv/", "files": ["bilkent/archive_1.html", "bilkent/archive_9.html"]},
+    {"host": "egeteknopark.com.tr", "path": r"^/kuluckalik-firmalar/", "files": ["ege/kuluckalik-firmalar.html"]},
+    {"host": "egeteknopark.com.tr", "path": r"^/ege-teknopark/", "files": ["ege/ege-teknopark.html"]},
+    {"host": "api.gaziteknopark.com.tr", "path": r"^/Unit/GetUnitByPaginationAll", "files": ["gazi/units.json"]},
+    {
+        "host": "www.ariteknokent.com.tr",
+        "path": r"^/tr/teknoloji-firmalari/teknokentli-firmalar",
+        "files": ["itu/listing_page1.html"],
+        # Row IDs are numeric: append the page number to keep them unique
+        "vary": (r'data-row-id="(\d+)"', r'data-row-id="\g<1>{n}"'),
+    },
+    {
+        "host": "www.ariteknokent.com.tr",
+        "path": r"^/tr/getCompanyInformations",
+        "files": ["itu/company_5100.json", "itu/company_5101.json"],
+    },
+    {"host": "teknoparkizmir.com.tr", "path": r"^/tr/firmalar-liste/", "files": ["izmir/firmalar-liste.html"]},
+    {"host": "odtuteknokent.com.tr", "path": r"^/tr/firmalar/tum-firmalar\.php", "files": ["odtu/tum-firmalar.html"]},
+]
+
+CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".json": "application/json; charset=utf-8"}
+
+
+class Route:
+    """One ROUTES entry with its fixtures loaded"""
+
+    def __init__(self, host, path, files, query=None, vary=None, fixtures_dir=FIXTURES_DIR):
+        self.host = host
+        self.path_re = re.compile(path)
+        self.query_re = re.compile(query) if query else None
+        self.bodies = []
+        for name in files:
+            with open(os.path.join(fixtures_dir, name), "rb") as f:
+                self.bodies.append((f.read(), CONTENT_TYPES[os.path.splitext(name)[1]]))
+        self.vary = (re.compile(vary[0].encode()), vary[1]) if vary else None
+        self.served = 0
+        self.variants = {}
+        self.lock = threading.Lock()
+
+    def matches(self, host, path, query):
+        return host == self.host and self.path_re.search(path) and (not self.query_re or self.query_re.search(query))
+
+    def body_for(self, target):
+        with self.lock:
+            body, content_type = self.bodies[self.served % len(self.bodies)]
+            self.served += 1
+            if not self.vary:
+                return body, content_type
+            n = self.variants.setdefault(target, len(self.variants))
+        pattern, replacement = self.vary
+        return pattern.sub(replacement.replace("{n}", str(n)).encode(), body), content_type
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer answering from the fixture routes"""
+
+    daemon_threads = True
+    # The crawler opens many keep-alive connections at once
+    request_queue_size = 128
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, routes=ROUTES):
+        super().__init__(address, ReplayHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.routes = [Route(**route) for route in routes]
+        self.counts = {"requests": 0, "errors": 0, "not_found": 0}
+        self.counts_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.counts_lock:
+            self.counts[key] += 1
+
+    def route_for(self, host, path, query):
+        for route in self.routes:
+            if route.matches(host, path, query):
+                return route
+        return None
+
+    def delay(self):
+        with self.counts_lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)), self.random.random() < self.error_rate
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        target = urlsplit(self.path)
+        host, _, path = target.path.lstrip("/").partition("/")
+        path = "/" + path
+
+        delay, fail = server.delay()
+        time.sleep(delay)
+
+        if fail:
+            server.count("errors")
+            self.answer(503, b"Service Unavailable", "text/plain", {"Retry-After": "1"})
+            return
+
+        route = server.route_for(host, path, target.query)
+        if route is None:
+            server.count("not_found")
+            self.answer(404, b"Not Found", "text/plain")
+            return
+        body, content_type = route.body_for(self.path)
+        self.answer(200, body, content_type)
+
+    do_POST = do_GET
+
+    def answer(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request would drown the crawl's own output
+        pass
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Start a ReplayServer on a background thread, return it"""
+    server = ReplayServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="replay-server", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the recorded teknokent responses locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean delay before every answer")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- spread around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503 (0-1)")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and errors, for repeatable runs")
+    args = parser.parse_args(argv)
+
+    server = ReplayServer(
+        (args.host, args.port),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"Replaying {len(server.routes)} routes on {server.url} (REPLAY_SERVER_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {server.counts['requests']} requests, {server.counts['errors']} injected errors, "
+              f"{server.counts['not_found']} unknown URLs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,14 @@
-import os 
-import sys
-import logging
-
-logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
-
-log_dir = "logs"
-log_filepath = os.path.join(log_dir, "logging.log")
-
-os.makedirs(log_dir, exist_ok=True)
-
-logging.basicConfig(
-    level = logging.INFO,
-    format = logging_str,
-
-    handlers=[
-        logging.FileHandler(log_filepath),
-        logging.StreamHandler(sys.stdout),
-    ]
+from .logger import (
+    SamplingFilter,
+    configure,
+    get_logger,
+    queue_root_logging,
+    start,
+    stop,
 )
 
-logger = logging.getLogger("teknokent-scraper-logger")
\ No newline at end of file
+
+def __getattr__(name):
+    if name == "logger":
+        return get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,22 +1,226 @@
-import os 
+import os
 import sys
+import time
+import queue
+import atexit
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Importing this module has no side effects: nothing is written or attached to
+# a logger until the first record is emitted. Records are put on an in-memory
+# queue by the logging thread and formatted and written by a background
+# QueueListener thread to
+#
+#     <log_dir>/logging.log                 everything, like before
+#     <log_dir>/spiders/<spider>.log        records of one Scrapy spider
+#     <log_dir>/components/<component>.log  everything else, by logger name
+#
+# plus stdout. Repetitive INFO/DEBUG lines (one per company, one per email)
+# are sampled per call site before they reach the queue.
 
 logging_str = "[%(asctime)s: %(levelname)s: %(module)s: %(message)s]"
 
-log_dir = "logs"
-log_filepath = os.path.join(log_dir, "logging.log")
+DEFAULT_LOGGER_NAME = "teknokent-scraper-logger"
+
+DEFAULTS = {
+    "log_dir": "logs",
+    "level": logging.INFO,
+    "stdout": True,
+    # Per spider/component files next to logging.log
+    "sinks": True,
+    # Records per call site let through every interval; None turns sampling off
+    "sample_burst": 20,
+    "sample_interval": 60.0,
+}
+
+_config = dict(DEFAULTS)
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+def configure(**options):
+    """Override DEFAULTS; takes effect when logging starts (first record or start())"""
+    unknown = set(options) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown logging option(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        if _listener is not None:
+            raise RuntimeError("Logging already started, call configure() before the first log record")
+        _config.update(options)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through ``burst`` records per call site every ``interval`` seconds.
+
+    Only records up to ``max_level`` are sampled, warnings and errors always
+    pass. The first record of a new interval reports how many were dropped.
+    """
+
+    def __init__(self, burst=20, interval=60.0, max_level=logging.INFO, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self.clock = clock
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = self.clock()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                window = self.windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class SinkHandler(logging.Handler):
+    """Write each record to the file of its spider or component, opened on first use"""
+
+    def __init__(self, log_dir, level=logging.NOTSET):
+        super().__init__(level)
+        self.log_dir = log_dir
+        self.handlers = {}
+
+    def sink_for(self, record):
+        spider = getattr(record, "spider", None)
+        if spider is not None:
+            return os.path.join("spiders", f"{getattr(spider, 'name', spider)}.log")
+        # teknokent_scraper.pipelines -> teknokent_scraper, email_automation.x -> email_automation
+        component = record.name.split(".", 1)[0] or "root"
+        return os.path.join("components", f"{component}.log")
+
+    def emit(self, record):
+        path = self.sink_for(record)
+        handler = self.handlers.get(path)
+        if handler is None:
+            full_path = os.path.join(self.log_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            handler = self.handlers[path] = logging.FileHandler(full_path, encoding="utf-8")
+            handler.setFormatter(self.formatter)
+        handler.handle(record)
+
+    def close(self):
+        for handler in self.handlers.values():
+            handler.close()
+        self.handlers.clear()
+        super().close()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that starts the listener when the first record arrives"""
+
+    def handle(self, record):
+        # Before the filters run, so the first record is sampled too
+        if _listener is None:
+            start()
+        return super().handle(record)
+
+    def prepare(self, record):
+        # The queue never leaves the process, so the record can go as it is
+        # and the message is formatted on the listener thread
+        return record
+
+
+def _build_handlers(config, extra_handlers=()):
+    formatter = logging.Formatter(logging_str)
+    handlers = list(extra_handlers)
+    if config["log_dir"]:
+        os.makedirs(config["log_dir"], exist_ok=True)
+        handlers.append(logging.FileHandler(os.path.join(config["log_dir"], "logging.log"), encoding="utf-8"))
+        if config["sinks"]:
+            handlers.append(SinkHandler(config["log_dir"]))
+    if config["stdout"]:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers[len(extra_handlers):]:
+        handler.setLevel(config["level"])
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _queue_handler():
+    global _handler
+    if _handler is None:
+        _handler = DeferredQueueHandler(queue.SimpleQueue())
+    return _handler
+
+
+def start(extra_handlers=()):
+    """Start the background listener; called by the first record if not before"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+        handler = _queue_handler()
+        # Sampling follows configure(), so it is set up here and not earlier
+        for old in [f for f in handler.filters if isinstance(f, SamplingFilter)]:
+            handler.removeFilter(old)
+        if _config["sample_burst"] is not None:
+            handler.addFilter(SamplingFilter(_config["sample_burst"], _config["sample_interval"]))
+        _listener = QueueListener(handler.queue, *_build_handlers(_config, extra_handlers), respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop)
+        return _listener
+
+
+def stop():
+    """Flush the queue and close the files"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def get_logger(name=DEFAULT_LOGGER_NAME):
+    """Logger whose records go through the queue; no I/O until it is used"""
+    log = logging.getLogger(name)
+    handler = _queue_handler()
+    if handler not in log.handlers:
+        log.addHandler(handler)
+        log.setLevel(_config["level"])
+        log.propagate = False
+    return log
+
 
-os.makedirs(log_dir, exist_ok=True)
+def queue_root_logging():
+    """Move the root logger's handlers (e.g. Scrapy's) behind the queue.
 
-logging.basicConfig(
-    level = logging.INFO,
-    format = logging_str,
+    Scrapy's spider loggers tag records with the spider, so every spider gets
+    its own sink file as well. Handlers added to the root logger later, like
+    Scrapy's log counters, still run synchronously and see every record.
+    """
+    root = logging.getLogger()
+    handler = _queue_handler()
+    if handler in root.handlers:
+        return
+    moved = list(root.handlers)
+    for h in moved:
+        root.removeHandler(h)
+    root.addHandler(handler)
+    listener = start(extra_handlers=moved)
+    missing = tuple(h for h in moved if h not in listener.handlers)
+    if missing:
+        # Already started by an earlier record
+        listener.handlers += missing
 
-    handlers=[
-        logging.FileHandler(log_filepath),
-        logging.StreamHandler(sys.stdout),
-    ]
-)
 
-logger = logging.getLogger("teknokent-scraper-logger")
\ No newline at end of file
+def __getattr__(name):
+    # ``from custom_logging.logger import logger`` keeps working, lazily
+    if name == "logger":
+        return get_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -23,13 +23,15 @@ from queue import Queue
 import numpy as np
 
 import time
-from custom_logging.logger import logger
+from custom_logging import get_logger
 from .email_parser import LinkedInEmailParser
 from dotenv import load_dotenv
 import pandas as pd
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 NUM_THREADS = 2  # Very conservative to avoid Gmail rate limits
 NUM_PROCESSES = os.cpu_count() or 1  
 
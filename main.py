@@ -1,24 +1,162 @@
-# import scrapy 
-# from scrapy.crawler import CrawlerProcess
-# from teknokent_scraper.spiders.ankarauni_teknokent_spider import AnkaraUniSpider
-# from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
-# from teknokent_scraper.spiders.itu_teknkent_spider import ItuSpider
-# from teknokent_scraper.spiders.hacettepe_teknokent_spider import HacettepeSpider
-# from teknokent_scraper.spiders.gazi_teknokent_spider import GaziSpider
-# from teknokent_scraper.spiders.bilkent_teknokent_spider import BilkentSpider
-
-def main():
-    # crawler = CrawlerProcess()
-    # crawler.crawl(AnkaraUniSpider)
-    # crawler.crawl(OdtuSpider)
-    # crawler.crawl(ItuSpider)
-    # crawler.crawl(HacettepeSpider)
-    # crawler.crawl(GaziSpider)
-    # crawler.crawl(BilkentSpider)
-    
-    # crawler.start()
-    pass
+import os
+import sys
+import time
+import argparse
+
+# The Scrapy project lives in ./teknokent_scraper (next to scrapy.cfg); spiders
+# import it as ``teknokent_scraper.*`` and the per-spider FEEDS use paths
+# relative to that directory, so run from there just like the Makefile does.
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.join(ROOT_DIR, "teknokent_scraper")
+sys.path.insert(0, PROJECT_DIR)
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "teknokent_scraper.settings")
+
+import custom_logging
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from teknokent_scraper.spiders.ankara_teknokent_comprehensive import AnkaraTeknokentComprehensiveSpider
+from teknokent_scraper.spiders.bilkent_teknokent_spider import BilkentSpider
+from teknokent_scraper.spiders.ege_teknokpark import EgeTeknoKentSpider
+from teknokent_scraper.spiders.gazi_teknokent_spider import GaziSpider
+from teknokent_scraper.spiders.hacettepe_teknokent_spider import HacettepeSpider
+from teknokent_scraper.spiders.itu_teknokent_spider import ItuTeknokentSpider
+from teknokent_scraper.spiders.izmir_teknopark import IzmirTeknoparkSpider
+from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+SPIDERS = {
+    spider.name: spider
+    for spider in (
+        AnkaraTeknokentComprehensiveSpider,
+        BilkentSpider,
+        EgeTeknoKentSpider,
+        GaziSpider,
+        HacettepeSpider,
+        ItuTeknokentSpider,
+        IzmirTeknoparkSpider,
+        OdtuSpider,
+    )
+}
+
+# Total number of in-flight requests shared by all spiders of a run
+DEFAULT_CONCURRENCY = 32
+
+# Relative to PROJECT_DIR, like the Makefile's CHECKPOINT_DIR
+DEFAULT_CHECKPOINT_DIR = ".crawl_state/jobs"
+
+DEFAULT_LOG_DIR = os.path.join(ROOT_DIR, "logs")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run teknokent spiders concurrently in one process")
+    parser.add_argument(
+        "spiders",
+        nargs="*",
+        metavar="SPIDER",
+        help=f"Spiders to run (default: all). Choices: {', '.join(SPIDERS)}",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Global concurrent request budget split across the spiders (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "-L", "--loglevel",
+        default="INFO",
+        help="Scrapy log level (default: INFO)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const=DEFAULT_CHECKPOINT_DIR,
+        metavar="DIR",
+        help=f"Checkpoint every spider to DIR/<spider> (default: {DEFAULT_CHECKPOINT_DIR}); "
+             "running the same command again resumes the pending requests",
+    )
+    parser.add_argument(
+        "--log-dir",
+        default=DEFAULT_LOG_DIR,
+        metavar="DIR",
+        help="Also write the log to DIR/logging.log and one file per spider, from a background "
+             "thread with repetitive lines sampled (default: logs/; empty for Scrapy's plain logging)",
+    )
+    parser.add_argument("--list", action="store_true", help="List available spiders and exit")
+    return parser.parse_args(argv)
+
+
+def build_settings(spider_count, concurrency, loglevel, checkpoint_dir=None):
+    """Project settings with the global budget divided between the spiders"""
+    settings = get_project_settings()
+    per_spider = max(1, concurrency // max(1, spider_count))
+    settings.set("CONCURRENT_REQUESTS", per_spider, priority="cmdline")
+    settings.set("LOG_LEVEL", loglevel, priority="cmdline")
+    if checkpoint_dir:
+        # Each spider turns this into its own JOBDIR (see checkpoint.py)
+        settings.set("CHECKPOINT_DIR", checkpoint_dir, priority="cmdline")
+    return settings
+
+
+def print_summary(results, elapsed):
+    """Print one line per spider with the numbers from its stats collector"""
+    print()
+    print("Crawl summary")
+    print("=" * 92)
+    print(f"{'spider':<32} {'items':>7} {'requests':>9} {'responses':>10} {'errors':>7} {'seconds':>9}  reason")
+    print("-" * 92)
+    total_items = 0
+    for name, stats in results:
+        items = stats.get("item_scraped_count", 0)
+        total_items += items
+        start, finish = stats.get("start_time"), stats.get("finish_time")
+        seconds = (finish - start).total_seconds() if start and finish else 0.0
+        print(
+            f"{name:<32} {items:>7} {stats.get('downloader/request_count', 0):>9} "
+            f"{stats.get('response_received_count', 0):>10} {stats.get('log_count/ERROR', 0):>7} "
+            f"{seconds:>9.1f}  {stats.get('finish_reason', 'n/a')}"
+        )
+    print("-" * 92)
+    print(f"{len(results)} spiders, {total_items} items in {elapsed:.1f}s")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.list:
+        for name, spider in SPIDERS.items():
+            print(f"{name:<32} {spider.__name__}")
+        return 0
+
+    unknown = [name for name in args.spiders if name not in SPIDERS]
+    if unknown:
+        print(f"Unknown spider(s): {', '.join(unknown)}. Use --list to see the available spiders.")
+        return 2
+
+    selected = args.spiders or list(SPIDERS)
+
+    os.chdir(PROJECT_DIR)
+    process = CrawlerProcess(build_settings(len(selected), args.concurrency, args.loglevel, args.checkpoint))
+
+    # Keep our own handles: the process forgets crawlers once they finish
+    crawlers = []
+    for name in selected:
+        crawler = process.create_crawler(SPIDERS[name])
+        process.crawl(crawler)
+        crawlers.append((name, crawler))
+
+    if args.log_dir:
+        # After crawl(): every crawler reinstalls Scrapy's root handler with its
+        # own settings. That handler stays the console output, behind the queue
+        custom_logging.configure(log_dir=args.log_dir, level=args.loglevel, stdout=False)
+        custom_logging.queue_root_logging()
+
+    started = time.monotonic()
+    process.start()
+    elapsed = time.monotonic() - started
+
+    print_summary([(name, crawler.stats.get_stats()) for name, crawler in crawlers], elapsed)
+    return 0
 
 
 if __name__ == "__main__":
-    print("hello world")
+    sys.exit(main())
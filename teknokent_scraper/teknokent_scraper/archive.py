@@ -0,0 +1,146 @@
+# Content-addressed response archive for record/replay crawls
+#
+# One directory per spider under ARCHIVE_DIR:
+#
+#     <spider>/index.jsonl           request fingerprint -> status, headers, body hash
+#     <spider>/blobs/ab/ab12....gz   response bodies, named by their SHA-256
+#
+# Bodies are stored once however many requests returned them (the Ankara and
+# Hacettepe category pages repeat a lot), compressed with gzip or zstd
+# (compression.zstd on Python 3.14+, the backports-zstd package before). The
+# index is an append-only JSON lines log loaded into a dict, so a lookup is a
+# single dict access; the last entry for a fingerprint wins and close()
+# rewrites the log without the stale ones.
+
+import os
+import gzip
+import json
+import hashlib
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.misc import load_object
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+CODECS = {
+    "gzip": (".gz", lambda data: gzip.compress(data, compresslevel=6, mtime=0), gzip.decompress),
+}
+if zstd is not None:
+    CODECS["zstd"] = (".zst", zstd.compress, zstd.decompress)
+
+EXTENSIONS = {extension: name for name, (extension, _, _) in CODECS.items()}
+
+
+class ResponseArchive:
+    """Responses of one spider, keyed by request fingerprint"""
+
+    def __init__(self, path, compression="gzip"):
+        if compression not in CODECS:
+            raise ValueError(f"ARCHIVE_COMPRESSION must be one of {tuple(CODECS)}, got {compression!r}")
+        self.path = path
+        self.compression = compression
+        self.index_path = os.path.join(path, "index.jsonl")
+        self.entries = {}
+        self.stale = 0
+        self.index_file = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry["fingerprint"] in self.entries:
+                        self.stale += 1
+                    self.entries[entry["fingerprint"]] = entry
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def blob_path(self, digest, extension):
+        return os.path.join(self.path, "blobs", digest[:2], digest + extension)
+
+    def put(self, fingerprint, response):
+        """Archive a response, return True if its body was not stored yet"""
+        body = response.body
+        digest = hashlib.sha256(body).hexdigest()
+        extension, compress, _ = CODECS[self.compression]
+        path = self.blob_path(digest, extension)
+        new_blob = not os.path.exists(path)
+        if new_blob:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compress(body))
+            os.replace(tmp_path, path)
+
+        entry = {
+            "fingerprint": fingerprint,
+            "url": response.url,
+            "class": f"{type(response).__module__}.{type(response).__name__}",
+            "status": response.status,
+            "headers": {
+                key.decode("latin-1"): [value.decode("latin-1") for value in values]
+                for key, values in response.headers.items()
+            },
+            "body": digest + extension,
+            "flags": [flag for flag in response.flags if flag != "archived"],
+            "protocol": response.protocol,
+        }
+        if fingerprint in self.entries:
+            self.stale += 1
+        self.entries[fingerprint] = entry
+        if self.index_file is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.index_file = open(self.index_path, "a", encoding="utf-8")
+        self.index_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return new_blob
+
+    def get(self, fingerprint, request):
+        """Rebuild the archived response for a request, or None"""
+        entry = self.entries.get(fingerprint)
+        if entry is None:
+            return None
+        digest, extension = entry["body"][:64], entry["body"][64:]
+        codec = EXTENSIONS.get(extension)
+        if codec is None:
+            raise RuntimeError(f"Archived body {entry['body']} needs Python 3.14+ or the backports.zstd package")
+        with open(self.blob_path(digest, extension), "rb") as f:
+            body = CODECS[codec][2](f.read())
+
+        headers = Headers(entry["headers"])
+        if entry.get("class"):
+            respcls = load_object(entry["class"])
+        else:
+            respcls = responsetypes.from_args(headers=headers, url=entry["url"], body=body)
+        return respcls(
+            url=entry["url"],
+            status=entry["status"],
+            headers=headers,
+            body=body,
+            flags=[*entry["flags"], "archived"],
+            request=request,
+            protocol=entry.get("protocol"),
+        )
+
+    def close(self):
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+        if self.stale:
+            # Drop the entries later records replaced
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.index_path)
+            self.stale = 0
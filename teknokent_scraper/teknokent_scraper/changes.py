@@ -0,0 +1,242 @@
+# Run-to-run change data capture
+#
+# Every company of a run is keyed by its normalised name (dedup.normalize_name)
+# and hashed over its fields. An identical repeat of a name is dropped; when a
+# name is listed with different fields, its records are sorted by website and
+# then by their fields and numbered "#2", "#3", ... in that order, so the keys
+# do not depend on the order the items arrived in. Two runs are compared in
+# one pass over each: equal hashes are skipped, and only the companies that
+# were added, removed or changed come out, the changed ones with the old and
+# new value of every field that moved:
+#
+#     {"change": "changed", "key": "acme yazilim a s",
+#      "fields": {"company_phone": ["0312 000 00 00", "0312 111 11 11"]},
+#      "record": {...new record...}}
+#
+# ChangeCapturePipeline does this after every crawl that finished (a run cut
+# short would show everything it did not get to as removed): it compares the
+# items of the run with the previous finished run in the crawl history (history.py;
+# runs without the completion marker are skipped) and writes
+#
+#     CHANGES_DIR/<spider>/<run start>.jsonl          the changes, one per line
+#     CHANGES_DIR/<spider>/<run start>.summary.json   counts per change type
+#
+# A job resumed from its JOBDIR is one run (checkpoint.py): the pipeline
+# starts from the items its earlier attempts already wrote to the history, so
+# the companies those attempts crawled do not show up as removed.
+#
+# Two history runs can also be compared by hand, by default the last two
+# finished ones:
+#
+#     python -m teknokent_scraper.changes outputs/history/itu
+
+import os
+import sys
+import json
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .dedup import FIELDS, digest, normalize_name, website_domain
+from .checkpoint import job_run_started
+from .exporters import RUN_TIME_FORMAT, run_started
+from .history import is_complete, iter_history
+from .pipelines import LIST_SEPARATOR
+
+CHANGE_TYPES = ("added", "removed", "changed")
+
+WEBSITE = FIELDS.index("company_website")
+
+
+def record_values(item):
+    """The item's FIELDS as text, lists joined like in the CSV files"""
+    adapter = ItemAdapter(item)
+    values = []
+    for name in FIELDS:
+        value = adapter.get(name)
+        if value is None:
+            value = ""
+        values.append(LIST_SEPARATOR.join(map(str, value)) if isinstance(value, (list, tuple)) else str(value))
+    return tuple(values)
+
+
+class Snapshot:
+    """The companies of one run: key -> (content hash, field values)"""
+
+    def __init__(self, items=()):
+        # name key -> {content hash: field values}
+        self.by_name = {}
+        self._records = None
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        values = record_values(item)
+        key = normalize_name(values[0])
+        if not key:
+            return None
+        # An identical repeat (a resumed job re-crawling a page, say) is one record
+        self.by_name.setdefault(key, {})[digest(*values)] = values
+        self._records = None
+        return key
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = {}
+            for key, records in self.by_name.items():
+                ordered = sorted(records.items(), key=lambda record: (website_domain(record[1][WEBSITE]), record[1]))
+                for n, (record_hash, values) in enumerate(ordered, 1):
+                    self._records[key if n == 1 else f"{key}#{n}"] = (record_hash, values)
+        return self._records
+
+    def __len__(self):
+        return len(self.records)
+
+
+def as_record(values):
+    return dict(zip(FIELDS, values))
+
+
+def diff(old, new):
+    """Changes from Snapshot ``old`` to Snapshot ``new``, in new-run order then removals"""
+    old_records = old.records
+    for key, (new_hash, new_values) in new.records.items():
+        previous = old_records.get(key)
+        if previous is None:
+            yield {"change": "added", "key": key, "record": as_record(new_values)}
+        elif previous[0] != new_hash:
+            old_values = previous[1]
+            fields = {
+                name: [old_value, new_value]
+                for name, old_value, new_value in zip(FIELDS, old_values, new_values)
+                if old_value != new_value
+            }
+            yield {"change": "changed", "key": key, "fields": fields, "record": as_record(new_values)}
+    new_records = new.records
+    for key, (_, old_values) in old_records.items():
+        if key not in new_records:
+            yield {"change": "removed", "key": key, "record": as_record(old_values)}
+
+
+def summarize(changes, old, new):
+    """Counts per change type, plus the run sizes and the fields that changed most"""
+    summary = {"before": len(old), "after": len(new), **dict.fromkeys(CHANGE_TYPES, 0)}
+    fields = {}
+    for change in changes:
+        summary[change["change"]] += 1
+        for name in change.get("fields", ()):
+            fields[name] = fields.get(name, 0) + 1
+    summary["unchanged"] = len(new) - summary["added"] - summary["changed"]
+    summary["changed_fields"] = dict(sorted(fields.items(), key=lambda item: -item[1]))
+    return summary
+
+
+def run_dirs(spider_dir):
+    """History run directories of one spider, oldest first"""
+    if not os.path.isdir(spider_dir):
+        return []
+    return sorted(
+        os.path.join(spider_dir, name) for name in os.listdir(spider_dir)
+        if os.path.isdir(os.path.join(spider_dir, name))
+    )
+
+
+def finished_runs(spider_dir):
+    """History run directories of one spider that finished, oldest first"""
+    return [path for path in run_dirs(spider_dir) if is_complete(path)]
+
+
+def previous_run(spider_dir, run_time):
+    """The latest finished history run of a spider that started before ``run_time``"""
+    earlier = [path for path in finished_runs(spider_dir) if os.path.basename(path) < run_time]
+    return earlier[-1] if earlier else None
+
+
+def write_changes(changes, path):
+    """Write the changes as JSON lines, return them for summarize()"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for change in changes:
+            f.write(json.dumps(change, ensure_ascii=False))
+            f.write("\n")
+            written.append(change)
+    os.replace(tmp_path, path)
+    return written
+
+
+class ChangeCapturePipeline:
+    """Write the companies added, removed and changed since the previous run"""
+
+    def __init__(self, history_dir, output_dir, stats=None):
+        self.history_dir = history_dir
+        self.output_dir = output_dir
+        self.stats = stats
+        self.snapshot = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("CHANGES_ENABLED", True):
+            raise NotConfigured
+        pipeline = cls(
+            settings.get("CHANGES_HISTORY_DIR", "outputs/history"),
+            settings.get("CHANGES_DIR", "outputs/changes"),
+            crawler.stats,
+        )
+        # The close reason only comes with the signal
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.snapshot = Snapshot()
+        jobdir = spider.crawler.settings.get("JOBDIR")
+        if jobdir and job_run_started(jobdir) is not None:
+            # Resumed: the run so far is in the history already
+            run_dir = os.path.join(self.history_dir, spider.name, run_started(spider).strftime(RUN_TIME_FORMAT))
+            if os.path.isdir(run_dir):
+                self.snapshot = Snapshot(iter_history(run_dir))
+                spider.logger.info(f"Resuming the run of {len(self.snapshot)} companies in {run_dir}")
+
+    def process_item(self, item, spider):
+        self.snapshot.add(item)
+        return item
+
+    def spider_closed(self, spider, reason):
+        if reason != "finished":
+            spider.logger.info(f"Run of {spider.name} closed with {reason!r}, not comparing it with the previous one")
+            return
+        run_time = run_started(spider).strftime(RUN_TIME_FORMAT)
+        previous = previous_run(os.path.join(self.history_dir, spider.name), run_time)
+        if previous is None:
+            spider.logger.info(f"No earlier run of {spider.name} in {self.history_dir}, nothing to compare")
+            return
+        old = Snapshot(iter_history(previous))
+        path = os.path.join(self.output_dir, spider.name, f"{run_time}.jsonl")
+        changes = write_changes(diff(old, self.snapshot), path)
+        summary = summarize(changes, old, self.snapshot)
+        summary["previous_run"] = os.path.basename(previous)
+        with open(path[:-len(".jsonl")] + ".summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        if self.stats is not None:
+            for change_type in CHANGE_TYPES:
+                self.stats.set_value(f"changes/{change_type}", summary[change_type])
+        spider.logger.info(
+            f"Since {summary['previous_run']}: {summary['added']} added, {summary['removed']} removed, "
+            f"{summary['changed']} changed, {summary['unchanged']} unchanged ({path})"
+        )
+
+
+if __name__ == "__main__":
+    # Compare the last two runs of a spider's history directory, or two runs
+    runs = sys.argv[1:] if len(sys.argv) > 2 else finished_runs(sys.argv[1])[-2:]
+    if len(runs) < 2:
+        sys.exit(f"Need two runs to compare, found {len(runs)}")
+    old, new = Snapshot(iter_history(runs[0])), Snapshot(iter_history(runs[1]))
+    changes = list(diff(old, new))
+    for change in changes:
+        print(json.dumps(change, ensure_ascii=False))
+    print(json.dumps(summarize(changes, old, new), ensure_ascii=False), file=sys.stderr)
@@ -0,0 +1,72 @@
+# Crash-safe checkpoint and resume
+#
+# Setting CHECKPOINT_DIR (``-s CHECKPOINT_DIR=.crawl_state/jobs``, ``make run-itu
+# CHECKPOINT=1`` or ``python main.py --checkpoint``) gives every spider its own
+# Scrapy JOBDIR under that directory. Scrapy then keeps the scheduler queues on
+# disk, persists the dupefilter fingerprints and pickles ``spider.state`` when
+# the spider stops. Running the same command again resumes with exactly the
+# requests that were still pending.
+#
+# Spider attributes that must survive a restart (collected IDs, pagination
+# progress, nonces) live in ``self.persistent(...)`` instead of plain
+# attributes; without a JOBDIR they behave like ordinary in-memory values.
+#
+# A job that is resumed is still the same run: its start time is kept in
+# JOBDIR/run_started until the job finishes, so the outputs named after the
+# run (the crawl history, see history.py) are continued, not started anew.
+
+import os
+from datetime import datetime
+
+RUN_STARTED_FILE = "run_started"
+
+
+def job_run_started(jobdir):
+    """Start time of the unfinished run of a job, or None"""
+    try:
+        with open(os.path.join(jobdir, RUN_STARTED_FILE), encoding="utf-8") as f:
+            return datetime.fromisoformat(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def save_job_run(jobdir, started):
+    """Remember the start time of a job's run until the job finishes"""
+    os.makedirs(jobdir, exist_ok=True)
+    with open(os.path.join(jobdir, RUN_STARTED_FILE), "w", encoding="utf-8") as f:
+        f.write(started.isoformat())
+
+
+def end_job_run(jobdir):
+    """Forget the run of a finished job, so the next crawl is a new run"""
+    try:
+        os.remove(os.path.join(jobdir, RUN_STARTED_FILE))
+    except FileNotFoundError:
+        pass
+
+
+class CheckpointMixin:
+    """Derive a per-spider JOBDIR from CHECKPOINT_DIR and expose persisted state"""
+
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        base = settings.get("CHECKPOINT_DIR")
+        if base and not settings.get("JOBDIR"):
+            settings.set("JOBDIR", os.path.join(base, cls.name), priority="spider")
+
+    @property
+    def checkpoint_state(self):
+        """The dict that is pickled into the JOBDIR when the spider stops"""
+        state = getattr(self, "state", None)
+        if state is None:
+            # No JOBDIR: SpiderState never sets spider.state
+            state = self.__dict__.setdefault("_memory_state", {})
+        return state
+
+    def persistent(self, key, default_factory):
+        """Value stored under ``key`` in the spider state, created on first use"""
+        state = self.checkpoint_state
+        if key not in state:
+            state[key] = default_factory()
+        return state[key]
@@ -0,0 +1,89 @@
+# Coalescing of company detail requests across categories
+#
+# The Ankara and Hacettepe directories list the same firm under several
+# categories. Detail requests carry meta["coalesce_key"] (the firm URL) and
+# meta["category"]; DetailCoalescingMiddleware lets the first request for a
+# key through and drops the others, remembering their categories. The item a
+# detail page produces goes out right away, with every category the firm has
+# been seen under so far merged into company_area.
+#
+# Detail requests are scheduled DETAIL_PRIORITY below the listings, so the
+# listings of all categories are normally crawled before any detail page and
+# the merged categories are complete. A category that still turns up after
+# the firm's item went out is counted in coalesce/late_categories and logged.
+#
+# The seen categories live in the spider's checkpoint state, so a resumed
+# crawl still merges correctly.
+
+from scrapy import signals
+from scrapy.http import Request
+
+
+def spider_state(spider, key):
+    """Dict kept in the checkpoint state when the spider has one"""
+    if hasattr(spider, "persistent"):
+        return spider.persistent(key, dict)
+    return spider.__dict__.setdefault(f"_{key}", {})
+
+
+class DetailCoalescingMiddleware:
+    """Fetch each company detail URL once and merge all of its categories"""
+
+    DETAIL_PRIORITY = -10
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mw = cls(crawler.stats)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_output(self, response, output, spider):
+        """Return the output to pass on, or None if it was absorbed"""
+        if isinstance(output, Request):
+            key = output.meta.get("coalesce_key")
+            if key is None:
+                return output
+
+            seen = spider_state(spider, "coalesce_categories")
+            category = output.meta.get("category")
+            if key not in seen:
+                seen[key] = [category] if category else []
+                return output.replace(priority=output.priority + self.DETAIL_PRIORITY)
+
+            if category and category not in seen[key]:
+                seen[key].append(category)
+                self.stats.inc_value("coalesce/merged_categories")
+                if key in spider_state(spider, "coalesce_exported"):
+                    self.stats.inc_value("coalesce/late_categories")
+                    spider.logger.warning(f"{key} is also listed under {category}, after its item went out")
+            self.stats.inc_value("coalesce/duplicate_fetches_avoided")
+            return None
+
+        key = response.meta.get("coalesce_key")
+        if key is None:
+            return output
+        categories = spider_state(spider, "coalesce_categories").get(key)
+        if categories:
+            output["company_area"] = list(categories)
+        spider_state(spider, "coalesce_exported")[key] = True
+        return output
+
+    def process_spider_output(self, response, result, spider):
+        for output in result:
+            output = self.process_output(response, output, spider)
+            if output is not None:
+                yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for output in result:
+            output = self.process_output(response, output, spider)
+            if output is not None:
+                yield output
+
+    def spider_closed(self, spider):
+        self.stats.set_value("coalesce/companies", len(spider_state(spider, "coalesce_categories")))
+        avoided = self.stats.get_value("coalesce/duplicate_fetches_avoided", 0)
+        spider.logger.info(f"Detail coalescing avoided {avoided} duplicate fetches")
@@ -0,0 +1,240 @@
+# Contact extraction for company detail pages
+#
+# The Ankara and Hacettepe detail parsers used to run a dozen CSS selectors
+# and several regex passes over the joined page text for every page.
+# extract_contacts() walks the lxml tree once and collects, in that single
+# walk:
+#
+#   * website links (absolute hrefs, hrefs inside "website"/"url" blocks and
+#     data-url/data-website/data-link attributes)
+#   * mailto: links and data-email attributes
+#   * the text of phone elements ([class*=phone], [class*=telefon], tel: links)
+#   * description candidates, ranked like the old selector list
+#   * every text node, joined only if a text scan is still needed
+#
+# The text scan is a single finditer() over one alternation of the patterns
+# that are still needed. With early_exit (the default) a field that was
+# already filled from the markup is not searched for in the text again, and
+# the text is not joined at all when nothing is left to find.
+
+import re
+from functools import lru_cache
+
+FIELDS = ("websites", "emails", "phones", "description")
+
+TEXT_PATTERNS = {
+    "email": r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
+    # info [at] firma [dot] com, info(at)firma.com.tr, info&#64;firma&#46;com
+    "obfuscated": (
+        r"\b[A-Za-z0-9._%+-]+\s*(?:\[at\]|\(at\)|&#64;|@)\s*[A-Za-z0-9-]+"
+        r"(?:(?:\s*(?:\[dot\]|\(dot\)|&#46;)\s*|\.)[A-Za-z0-9-]+)+"
+    ),
+    "website": (
+        r"https?://(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:/[^\s]*)?"
+        r"|www\.[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:/[^\s]*)?"
+    ),
+    "phone": (
+        r"0\d{3}\s?\d{3}\s?\d{2}\s?\d{2}"
+        r"|(?:\+90\s?)?(?:\(0?\d{3}\)|\d{3})[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}"
+        r"|\d{3}[\s\-]?\d{3}[\s\-]?\d{4}"
+    ),
+}
+
+# Which text patterns serve which field
+FIELD_PATTERNS = {
+    "emails": ("email", "obfuscated"),
+    "websites": ("website",),
+    "phones": ("phone",),
+}
+
+OBFUSCATED_AT_RE = re.compile(r"\s*(?:\[at\]|\(at\)|&#64;|@)\s*")
+OBFUSCATED_DOT_RE = re.compile(r"\s*(?:\[dot\]|\(dot\)|&#46;)\s*")
+TLD_RE = re.compile(r"\.[a-zA-Z]{2,}")
+DOMAIN_RE = re.compile(r"^https?://|^www\.|[a-zA-Z0-9-]+\.[a-zA-Z]{2,}")
+
+INVALID_EMAIL_PARTS = (
+    "example.com", "test.com", "domain.com", "email.com", "noemail", "no-reply", "noreply",
+)
+
+# Social media, link shorteners and the teknokent directories themselves
+SKIP_WEBSITE_PARTS = (
+    "facebook.com", "twitter.com", "instagram.com", "linkedin.com", "http://www.schema.org",
+    "youtube.com", "tiktok.com", "pinterest.com", "whatsapp.com",
+    "telegram.org", "discord.com", "reddit.com", "github.com",
+    "ankarateknokent.com", "hacettepeteknokent.com.tr", "google.com", "maps.google.com",
+    "goo.gl", "bit.ly", "t.co", "ow.ly", "tinyurl.com",
+)
+
+# Description sources in order of preference; the first one with text wins
+DESCRIPTION_LISTING_CONTENT_P = 0  # .listing-content p::text
+DESCRIPTION_CLASSES = {"company-description": 1, "listing-description": 2, "about-company": 3}
+DESCRIPTION_CLASS_P = 4  # [class*="description"] p::text
+
+DATA_URL_ATTRS = ("data-url", "data-website", "data-link")
+
+
+@lru_cache(maxsize=None)
+def text_scanner(kinds):
+    """One compiled alternation of the named TEXT_PATTERNS"""
+    return re.compile("|".join(f"(?P<{kind}>{TEXT_PATTERNS[kind]})" for kind in kinds))
+
+
+def is_valid_email(email):
+    """Validate email address"""
+    if not email or email.count("@") != 1:
+        return False
+    domain = email.split("@")[1]
+    if "." not in domain:
+        return False
+    email = email.lower()
+    return not any(part in email for part in INVALID_EMAIL_PARTS)
+
+
+def is_valid_website_url(url):
+    """Validate website URL"""
+    if not url or not isinstance(url, str):
+        return False
+    url = url.strip()
+    if len(url) < 4:
+        return False
+    lowered = url.lower()
+    if lowered.startswith(("mailto:", "tel:")) or any(part in lowered for part in SKIP_WEBSITE_PARTS):
+        return False
+    return bool(DOMAIN_RE.search(url) and TLD_RE.search(url))
+
+
+class PageScan:
+    """Everything the DOM walk collects from one page"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.websites = set()
+        self.emails = set()
+        self.phones = []
+        self.descriptions = {}
+        self.texts = []
+
+    def add_phone(self, phone):
+        phone = phone.strip()
+        if phone and phone not in self.phones and any(char.isdigit() for char in phone):
+            self.phones.append(phone)
+
+    def walk(self, element, in_listing_content=False, in_description=False, in_website_block=False):
+        tag = element.tag
+        if not isinstance(tag, str):
+            # Comments and processing instructions have no text of their own
+            return
+
+        attrib = element.attrib
+        classes = attrib.get("class", "")
+        tokens = classes.split() if classes else ()
+
+        if "websites" in self.fields:
+            for name in DATA_URL_ATTRS:
+                value = attrib.get(name)
+                if value and is_valid_website_url(value):
+                    self.websites.add(value)
+        if "emails" in self.fields:
+            email = attrib.get("data-email")
+            if email and is_valid_email(email):
+                self.emails.add(email)
+
+        is_phone = False
+        href = attrib.get("href") if tag == "a" else None
+        if href:
+            if href.startswith("mailto:"):
+                email = href[7:].split("?")[0].strip()
+                if "emails" in self.fields and is_valid_email(email):
+                    self.emails.add(email)
+            elif href.startswith("tel:"):
+                is_phone = True
+            elif "websites" in self.fields and ("http" in href or in_website_block):
+                if is_valid_website_url(href):
+                    self.websites.add(href.strip())
+        is_phone = "phones" in self.fields and (is_phone or "phone" in classes or "telefon" in classes)
+
+        rank = None
+        if "description" in self.fields:
+            if tag == "p":
+                if in_listing_content:
+                    rank = DESCRIPTION_LISTING_CONTENT_P
+                elif in_description:
+                    rank = DESCRIPTION_CLASS_P
+            for token in tokens:
+                if token in DESCRIPTION_CLASSES:
+                    rank = min(DESCRIPTION_CLASSES[token], DESCRIPTION_CLASS_P if rank is None else rank)
+
+        if is_phone or rank is not None:
+            # Text sitting directly in this element (not in its children)
+            own_text = [element.text] if element.text else []
+            own_text += [child.tail for child in element if child.tail]
+            if is_phone:
+                for text in own_text:
+                    self.add_phone(text)
+            if rank is not None:
+                self.descriptions.setdefault(rank, []).extend(own_text)
+
+        in_listing_content = in_listing_content or "listing-content" in tokens
+        in_description = in_description or "description" in classes
+        in_website_block = in_website_block or "website" in classes or "url" in classes
+
+        texts = self.texts
+        if element.text:
+            texts.append(element.text)
+        for child in element:
+            self.walk(child, in_listing_content, in_description, in_website_block)
+            if child.tail:
+                texts.append(child.tail)
+
+    def description(self):
+        for rank in sorted(self.descriptions):
+            text = " ".join(part.strip() for part in self.descriptions[rank] if part.strip())
+            if text:
+                return text
+        return None
+
+    def scan_text(self, early_exit):
+        """Search the joined page text for whatever the markup did not provide"""
+        kinds = []
+        for field, patterns in FIELD_PATTERNS.items():
+            if field in self.fields and not (early_exit and getattr(self, field)):
+                kinds.extend(patterns)
+        if not kinds:
+            return
+
+        text = " ".join(self.texts)
+        for match in text_scanner(tuple(kinds)).finditer(text):
+            kind = match.lastgroup
+            value = match.group()
+            if kind == "email":
+                if is_valid_email(value):
+                    self.emails.add(value)
+            elif kind == "obfuscated":
+                email = OBFUSCATED_DOT_RE.sub(".", OBFUSCATED_AT_RE.sub("@", value))
+                if is_valid_email(email):
+                    self.emails.add(email)
+            elif kind == "website":
+                if not value.startswith("http"):
+                    value = "https://" + value
+                if is_valid_website_url(value):
+                    self.websites.add(value)
+            else:
+                self.add_phone(value)
+
+
+def extract_contacts(response, fields=FIELDS, early_exit=True):
+    """Websites, emails, phones and description of a detail page
+
+    Returns a dict with sorted ``websites`` and ``emails`` lists, ``phones`` in
+    page order and ``description`` (or None). Only the requested ``fields``
+    are looked for.
+    """
+    scan = PageScan(frozenset(fields))
+    scan.walk(response.selector.root)
+    scan.scan_text(early_exit)
+    return {
+        "websites": sorted(scan.websites),
+        "emails": sorted(scan.emails),
+        "phones": scan.phones,
+        "description": scan.description() if "description" in scan.fields else None,
+    }
@@ -0,0 +1,283 @@
+# Cross-teknokent company index
+#
+# The same firm is often listed by several teknokents (an ODTU and a Hacettepe
+# office, say). CompanyDedupPipeline runs after the normalisation stage and
+# merges the items of every spider of the process while they stream in:
+#
+#   * the key is the normalised company name (Turkish lower case, diacritics
+#     folded, punctuation dropped) plus the domain of its website
+#   * an item without a website joins a record with the same name, and a
+#     record without a website is claimed by the first item of that name
+#     that has one
+#   * the canonical record keeps the first non-empty value of every field and
+#     the list of teknokents (spider names) that listed the company; the
+#     first item of a process to reach a record kept from an earlier process
+#     overwrites its fields with its own non-empty values, so numbers and
+#     addresses do not stay at what the first run found
+#
+# Only 16-byte key digests and row ids are kept in memory, so lookups are
+# dict hits; the records themselves live in a SQLite file (DEDUP_DB). The file
+# outlives the process: separate `scrapy crawl` runs, one per teknokent, and a
+# checkpoint resume all add to the same records, and the key digests are
+# loaded back from it when a process starts. DEDUP_REBUILD starts it afresh.
+#
+# Every record remembers the run (exporters.run_started, the same for all
+# attempts of a JOBDIR job) in which each teknokent last listed it. When a
+# spider finishes, its teknokent is taken off the records it did not list in
+# that run, and records no teknokent lists any more are dropped; a run cut
+# short drops nothing. Every spider close then rewrites DEDUP_OUTPUT, one
+# canonical record per line. Items pass through unchanged.
+
+import os
+import re
+import json
+import sqlite3
+import hashlib
+from urllib.parse import urlsplit
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .exporters import RUN_TIME_FORMAT, run_started
+from .pipelines import LIST_SEPARATOR, clean_text, turkish_lower
+
+FIELDS = (
+    "company_name",
+    "company_desc",
+    "company_contact_mail",
+    "company_phone",
+    "company_website",
+    "company_location",
+    "company_area",
+)
+
+FOLD_TABLE = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, record TEXT NOT NULL);
+-- The run in which each source last listed a record
+CREATE TABLE IF NOT EXISTS claims (
+    record_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    run TEXT NOT NULL,
+    PRIMARY KEY (record_id, source)
+);
+"""
+
+# One index per DEDUP_DB path, shared by all crawlers of the process
+_indexes = {}
+
+
+def normalize_name(name):
+    """'ACME Yazılım  A.Ş.' -> 'acme yazilim a s'"""
+    name = turkish_lower(clean_text(name)).translate(FOLD_TABLE)
+    return NON_WORD_RE.sub(" ", name).strip()
+
+
+def website_domain(website):
+    """Host of the first website of an item without 'www.', or ''"""
+    website = (website or "").split(LIST_SEPARATOR, 1)[0].strip()
+    if not website:
+        return ""
+    if "//" not in website:
+        website = "//" + website
+    try:
+        host = urlsplit(website).hostname or ""
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def digest(*parts):
+    return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+
+class CompanyIndex:
+    """Canonical company records in SQLite, found through in-memory key digests"""
+
+    def __init__(self, path, rebuild=False):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if rebuild and os.path.exists(path):
+                os.remove(path)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        # Records this process has merged an item into
+        self.updated = set()
+        self.load_keys()
+
+    def load_keys(self):
+        """Key digests of the records in the file"""
+        # (name, domain) digest -> row id
+        self.by_key = {}
+        # name digest -> row id of the record of that name without a website
+        self.without_website = {}
+        # name digest -> row id of the first record with that name
+        self.first_by_name = {}
+        for row_id, record in self.db.execute("SELECT id, record FROM records ORDER BY id"):
+            record = json.loads(record)
+            name = normalize_name(record["company_name"])
+            domain = website_domain(record["company_website"])
+            self.first_by_name.setdefault(digest(name), row_id)
+            if domain:
+                self.by_key[digest(name, domain)] = row_id
+            else:
+                self.without_website.setdefault(digest(name), row_id)
+
+    def find(self, name, domain):
+        if domain:
+            row_id = self.by_key.get(digest(name, domain))
+            return row_id if row_id is not None else self.without_website.get(digest(name))
+        return self.first_by_name.get(digest(name))
+
+    def add(self, item, source, run=""):
+        """Merge an item into its canonical record, return True if the company is new"""
+        adapter = ItemAdapter(item)
+        name = normalize_name(adapter.get("company_name") or "")
+        if not name:
+            return False
+        domain = website_domain(adapter.get("company_website"))
+        row_id = self.find(name, domain)
+
+        if row_id is None:
+            record = {field: adapter.get(field) or "" for field in FIELDS}
+            record["sources"] = [source]
+            row_id = self.db.execute("INSERT INTO records (record) VALUES (?)", (self.dump(record),)).lastrowid
+            self.claim(row_id, source, run)
+            self.first_by_name.setdefault(digest(name), row_id)
+            if domain:
+                self.by_key[digest(name, domain)] = row_id
+            else:
+                self.without_website.setdefault(digest(name), row_id)
+            return True
+
+        record = self.load(row_id)
+        # Kept from an earlier process: this run's values are newer
+        fresh = row_id not in self.updated
+        for field in FIELDS:
+            value = adapter.get(field)
+            if value and (fresh or not record[field]):
+                record[field] = value
+        if source not in record["sources"]:
+            record["sources"].append(source)
+        self.db.execute("UPDATE records SET record = ? WHERE id = ?", (self.dump(record), row_id))
+        self.claim(row_id, source, run)
+        if domain and digest(name, domain) not in self.by_key:
+            # The record got its website from this item: later items find it
+            # by the domain, and one with another domain is another company
+            self.by_key[digest(name, domain)] = row_id
+            if self.without_website.get(digest(name)) == row_id:
+                del self.without_website[digest(name)]
+        return False
+
+    def claim(self, row_id, source, run):
+        self.updated.add(row_id)
+        self.db.execute(
+            "INSERT INTO claims VALUES (?, ?, ?) ON CONFLICT (record_id, source) DO UPDATE SET run = excluded.run",
+            (row_id, source, run),
+        )
+
+    def prune(self, source, run):
+        """Take ``source`` off the records it did not list in ``run``, return how many records were dropped"""
+        stale = [
+            row_id for (row_id,) in
+            self.db.execute("SELECT record_id FROM claims WHERE source = ? AND run != ?", (source, run))
+        ]
+        if not stale:
+            return 0
+        self.db.execute("DELETE FROM claims WHERE source = ? AND run != ?", (source, run))
+        dropped = 0
+        for row_id in stale:
+            if self.db.execute("SELECT 1 FROM claims WHERE record_id = ?", (row_id,)).fetchone():
+                record = self.load(row_id)
+                record["sources"] = [name for name in record["sources"] if name != source]
+                self.db.execute("UPDATE records SET record = ? WHERE id = ?", (self.dump(record), row_id))
+            else:
+                self.db.execute("DELETE FROM records WHERE id = ?", (row_id,))
+                dropped += 1
+        self.db.commit()
+        if dropped:
+            self.load_keys()
+        return dropped
+
+    def load(self, row_id):
+        (record,) = self.db.execute("SELECT record FROM records WHERE id = ?", (row_id,)).fetchone()
+        return json.loads(record)
+
+    @staticmethod
+    def dump(record):
+        return json.dumps(record, ensure_ascii=False)
+
+    def records(self):
+        """Canonical records in the order the companies were first seen"""
+        for (record,) in self.db.execute("SELECT record FROM records ORDER BY id"):
+            yield json.loads(record)
+
+    def write(self, path):
+        """Write every canonical record as one JSON line, return the count"""
+        self.db.commit()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        count = 0
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (record,) in self.db.execute("SELECT record FROM records ORDER BY id"):
+                f.write(record)
+                f.write("\n")
+                count += 1
+        os.replace(tmp_path, path)
+        return count
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+def get_index(path, rebuild=False):
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = CompanyIndex(path, rebuild)
+    return index
+
+
+class CompanyDedupPipeline:
+    """Merge the companies of all spiders into one canonical record each"""
+
+    def __init__(self, index, output, stats=None):
+        self.index = index
+        self.output = output
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("DEDUP_ENABLED", True):
+            raise NotConfigured
+        pipeline = cls(
+            get_index(
+                settings.get("DEDUP_DB", ".crawl_state/dedup/companies.sqlite3"),
+                settings.getbool("DEDUP_REBUILD", False),
+            ),
+            settings.get("DEDUP_OUTPUT", "outputs/companies_canonical.jsonl"),
+            crawler.stats,
+        )
+        # Only a finished run may drop records, and the reason only comes with the signal
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def process_item(self, item, spider):
+        new = self.index.add(item, spider.name, run_started(spider).strftime(RUN_TIME_FORMAT))
+        if self.stats is not None:
+            self.stats.inc_value("dedup/unique" if new else "dedup/merged")
+        return item
+
+    def spider_closed(self, spider, reason):
+        if reason == "finished":
+            dropped = self.index.prune(spider.name, run_started(spider).strftime(RUN_TIME_FORMAT))
+            if self.stats is not None:
+                self.stats.set_value("dedup/dropped", dropped)
+            if dropped:
+                spider.logger.info(f"Dropped {dropped} companies {spider.name} no longer lists")
+        count = self.index.write(self.output)
+        spider.logger.info(f"Wrote {count} canonical companies to {self.output}")
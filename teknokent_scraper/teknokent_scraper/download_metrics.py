@@ -0,0 +1,260 @@
+# Per-domain download metrics
+#
+# DownloadMetricsMiddleware sits closest to the download handlers and records,
+# for every domain:
+#
+#   latency     histograms of the download latency, split by kind:
+#                 http                plain HTTP, time to the response headers
+#                 playwright_network  rendered requests, until the main document
+#                                     finished loading in the browser
+#                 playwright_render   rendered requests, the rest of the render
+#                                     (scripts, page methods, reading the DOM)
+#                 playwright_total    rendered requests, both of the above
+#   bytes       total and largest response body
+#   status      response count per status code
+#   retries     requests sent again by RetryMiddleware
+#   exceptions  download errors per exception class
+#
+# Histograms use log-spaced buckets 10% apart, so percentiles are within 10%
+# whatever the range, in constant memory. At spider close the percentiles go
+# into the stats as download_metrics/<domain>/<kind>/p50_ms etc., and the full
+# numbers into a JSON report (DOWNLOAD_METRICS_REPORT).
+
+import os
+import json
+import math
+import time
+from collections import Counter
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Meta keys used while a rendered request is in flight
+NETWORK_TIME_KEY = "download_metrics_network_time"
+EVENT_HANDLER_KEY = "playwright_page_event_handlers"
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of durations in seconds"""
+
+    GROWTH = 1.1
+    # Bucket 0 holds everything up to 1 ms
+    UNIT = 0.001
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def bucket(self, seconds):
+        if seconds <= self.UNIT:
+            return 0
+        return math.ceil(math.log(seconds / self.UNIT, self.GROWTH))
+
+    def upper_bound(self, index):
+        return self.UNIT * self.GROWTH ** index
+
+    def record(self, seconds):
+        seconds = max(0.0, seconds)
+        self.buckets[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the given percentile, in seconds"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        summary = {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "max_ms": round(self.max * 1000, 2),
+        }
+        for percent in PERCENTILES:
+            value = self.percentile(percent)
+            summary[f"p{percent}_ms"] = round(value * 1000, 2) if value is not None else None
+        return summary
+
+    def to_dict(self):
+        # Bucket upper bounds in ms -> count, for merging runs or plotting
+        buckets = {f"{self.upper_bound(index) * 1000:.3f}": self.buckets[index] for index in sorted(self.buckets)}
+        return dict(self.summary(), buckets=buckets)
+
+
+class DomainMetrics:
+    """Everything recorded for one domain"""
+
+    def __init__(self):
+        self.latency = {}
+        self.requests = 0
+        self.responses = 0
+        self.retries = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.status = Counter()
+        self.exceptions = Counter()
+
+    def record_latency(self, kind, seconds):
+        histogram = self.latency.get(kind)
+        if histogram is None:
+            histogram = self.latency[kind] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "mean_bytes": round(self.bytes / self.responses) if self.responses else None,
+            "status": {str(code): count for code, count in sorted(self.status.items())},
+            "exceptions": dict(self.exceptions),
+            "latency": {kind: histogram.to_dict() for kind, histogram in sorted(self.latency.items())},
+        }
+
+
+def network_time_handler(meta):
+    """Playwright requestfinished handler storing the main document load time in meta"""
+
+    def requestfinished(pw_request):
+        try:
+            if not pw_request.is_navigation_request() or pw_request.frame.parent_frame is not None:
+                return
+            timing = pw_request.timing
+        except Exception:
+            # The page may already be closing
+            return
+        # responseEnd is in ms after startTime, -1 when the browser has no timing
+        if timing and timing.get("responseEnd", -1) >= 0:
+            # Redirects finish one navigation request per hop
+            meta[NETWORK_TIME_KEY] = meta.get(NETWORK_TIME_KEY, 0.0) + timing["responseEnd"] / 1000
+
+    requestfinished.download_metrics = True
+    return requestfinished
+
+
+class DownloadMetricsMiddleware:
+    """Latency histograms, bytes, status codes and retries per domain"""
+
+    def __init__(self, stats, report_path=None):
+        self.stats = stats
+        self.report_path = report_path
+        self.domains = {}
+        self.started = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("DOWNLOAD_METRICS_ENABLED", True):
+            raise NotConfigured
+        mw = cls(crawler.stats, crawler.settings.get("DOWNLOAD_METRICS_REPORT"))
+        crawler.signals.connect(mw.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def domain(self, request):
+        host = urlparse_cached(request).hostname or ""
+        metrics = self.domains.get(host)
+        if metrics is None:
+            metrics = self.domains[host] = DomainMetrics()
+        return metrics
+
+    def process_request(self, request, spider):
+        metrics = self.domain(request)
+        metrics.requests += 1
+        if request.meta.get("retry_times"):
+            metrics.retries += 1
+        request.meta.pop(NETWORK_TIME_KEY, None)
+        if request.meta.get("playwright"):
+            handlers = dict(request.meta.get(EVENT_HANDLER_KEY) or {})
+            handlers.setdefault("requestfinished", network_time_handler(request.meta))
+            request.meta[EVENT_HANDLER_KEY] = handlers
+        return None
+
+    def process_response(self, request, response, spider):
+        self.drop_handler(request)
+        # Replayed from the archive: nothing was downloaded
+        if "archived" in response.flags:
+            return response
+
+        metrics = self.domain(request)
+        metrics.responses += 1
+        metrics.status[response.status] += 1
+        size = len(response.body)
+        metrics.bytes += size
+        metrics.max_bytes = max(metrics.max_bytes, size)
+
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            if "playwright" in response.flags:
+                metrics.record_latency("playwright_total", latency)
+                network = request.meta.get(NETWORK_TIME_KEY)
+                if network is not None:
+                    network = min(network, latency)
+                    metrics.record_latency("playwright_network", network)
+                    metrics.record_latency("playwright_render", latency - network)
+            else:
+                metrics.record_latency("http", latency)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.drop_handler(request)
+        metrics = self.domain(request)
+        metrics.exceptions[type(exception).__name__] += 1
+        return None
+
+    def drop_handler(self, request):
+        # The closure must not travel with retries into a disk queue
+        handlers = request.meta.get(EVENT_HANDLER_KEY)
+        if handlers and getattr(handlers.get("requestfinished"), "download_metrics", False):
+            handlers = {event: handler for event, handler in handlers.items() if event != "requestfinished"}
+            if handlers:
+                request.meta[EVENT_HANDLER_KEY] = handlers
+            else:
+                del request.meta[EVENT_HANDLER_KEY]
+
+    def spider_opened(self, spider):
+        self.started = time.time()
+
+    def spider_closed(self, spider, reason):
+        for host, metrics in self.domains.items():
+            prefix = f"download_metrics/{host}"
+            self.stats.set_value(f"{prefix}/bytes", metrics.bytes)
+            self.stats.set_value(f"{prefix}/retries", metrics.retries)
+            for kind, histogram in metrics.latency.items():
+                for key, value in histogram.summary().items():
+                    self.stats.set_value(f"{prefix}/{kind}/{key}", value)
+
+        if self.report_path and self.domains:
+            path = self.report_path % {"name": spider.name}
+            self.write_report(path, spider.name, reason)
+            spider.logger.info(f"Download metrics for {len(self.domains)} domain(s) written to {path}")
+
+    def report(self, spider_name, reason=None):
+        return {
+            "spider": spider_name,
+            "started": self.started,
+            "finished": time.time(),
+            "finish_reason": reason,
+            "domains": {host: metrics.to_dict() for host, metrics in sorted(self.domains.items())},
+        }
+
+    def write_report(self, path, spider_name, reason=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(spider_name, reason), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
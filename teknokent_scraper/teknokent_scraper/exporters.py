@@ -0,0 +1,186 @@
+# Parquet feed exporter
+#
+# FEED_EXPORTERS maps the "parquet" feed format to ParquetItemExporter. Items
+# are buffered column by column and written as one Parquet row group every
+# ROW_GROUP_SIZE items, so memory stays flat however long the crawl; only the
+# Parquet footer is written at the end. Columns are typed: the item fields are
+# strings, with the low-cardinality ones (location, area) dictionary-encoded
+# as Arrow dictionaries, and scraped_at is a UTC timestamp.
+#
+# With FEED_URI_PARAMS = "teknokent_scraper.exporters.uri_params" feed URIs
+# can use %(teknokent)s, %(run_date)s and %(run_time)s (the start time, the
+# same for every batch of a run, unlike %(time)s), which gives a Hive-style layout
+#
+#     outputs/parquet/teknokent=itu/run_date=2025-01-31/companies.parquet
+#
+# that read_companies() (or pyarrow.dataset / pandas.read_parquet) loads back
+# as one table, with the partition keys as columns.
+#
+# Needs pyarrow; without it the parquet feeds fail to open and the other
+# feeds of the spider are written as usual.
+
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+from scrapy.exporters import BaseItemExporter
+
+from .checkpoint import job_run_started, save_job_run
+from .items import CompanyDetailsItem
+from .pipelines import LIST_SEPARATOR
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+ROW_GROUP_SIZE = 10_000
+RUN_TIME_FORMAT = "%Y-%m-%dT%H-%M-%SZ"
+DICTIONARY_FIELDS = ("company_location", "company_area")
+
+# The feed every spider writes next to its JSON and CSV files (settings.py has
+# it in FEEDS, spiders with their own FEEDS add it to those)
+PARQUET_FEED = {
+    "outputs/parquet/teknokent=%(teknokent)s/run_date=%(run_date)s/companies.parquet": {
+        "format": "parquet",
+        "overwrite": True,
+        "store_empty": False,
+    },
+}
+
+
+def run_started(spider):
+    """UTC start time of the spider's run, kept across resumes of a JOBDIR job (now, before the crawl has started)"""
+    started = getattr(spider, "_run_started", None)
+    if started is not None:
+        return started
+    jobdir = spider.crawler.settings.get("JOBDIR")
+    started = job_run_started(jobdir) if jobdir else None
+    if started is None:
+        started = spider.crawler.stats.get_value("start_time") if spider.crawler.stats else None
+        started = started or datetime.now(tz=timezone.utc)
+        if jobdir:
+            save_job_run(jobdir, started)
+    spider._run_started = started
+    return started
+
+
+def uri_params(params, spider):
+    """Feed URI parameters plus teknokent (spider name), run_date and run_time (UTC start)"""
+    started = run_started(spider)
+    return {
+        **params,
+        "teknokent": spider.name,
+        "run_date": started.strftime("%Y-%m-%d"),
+        "run_time": started.strftime(RUN_TIME_FORMAT),
+    }
+
+
+def company_schema(fields):
+    columns = [
+        pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_FIELDS else pa.string())
+        for name in fields
+    ]
+    columns.append(pa.field("scraped_at", pa.timestamp("ms", tz="UTC")))
+    return pa.schema(columns)
+
+
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return LIST_SEPARATOR.join(str(v) for v in value)
+    return str(value)
+
+
+class KeepOpen:
+    """Write-only view of a feed file; closing it leaves the file to the feed storage"""
+
+    def __init__(self, file):
+        self.file = file
+        self.closed = False
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.closed = True
+
+
+class ParquetItemExporter(BaseItemExporter):
+    """Write items to Parquet, one row group every ``row_group_size`` items"""
+
+    def __init__(self, file, *, row_group_size=ROW_GROUP_SIZE, compression="zstd", **kwargs):
+        if pa is None:
+            raise ImportError("The parquet feed format needs pyarrow (uv add pyarrow)")
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = row_group_size
+        self.compression = compression
+        if isinstance(self.fields_to_export, Mapping):
+            self.fields = list(self.fields_to_export.values())
+        else:
+            self.fields = list(self.fields_to_export or CompanyDetailsItem.fields)
+        self.schema = company_schema(self.fields)
+        self.columns = {name: [] for name in self.fields}
+        self.buffered = 0
+        self.writer = None
+
+    def start_exporting(self):
+        self.writer = pq.ParquetWriter(
+            pa.PythonFile(KeepOpen(self.file), mode="w"),
+            self.schema,
+            compression=self.compression,
+            use_dictionary=True,
+        )
+
+    def serialized_fields(self, item):
+        # get_serialized_fields() is public in newer Scrapy versions
+        get_fields = getattr(self, "get_serialized_fields", None) or self._get_serialized_fields
+        return dict(get_fields(item, default_value=None, include_empty=True))
+
+    def export_item(self, item):
+        fields = self.serialized_fields(item)
+        for name, column in self.columns.items():
+            column.append(to_text(fields.get(name)))
+        self.buffered += 1
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered items as one row group"""
+        if not self.buffered:
+            return
+        scraped_at = datetime.now(tz=timezone.utc).replace(microsecond=0)
+        arrays = [
+            pa.array(self.columns[field.name], type=field.type)
+            if field.name in self.columns else pa.array([scraped_at] * self.buffered, type=field.type)
+            for field in self.schema
+        ]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=self.row_group_size)
+        for column in self.columns.values():
+            column.clear()
+        self.buffered = 0
+
+    def finish_exporting(self):
+        self.flush()
+        self.writer.close()
+        self.writer = None
+
+
+def read_companies(path, columns=None, filter=None):
+    """The whole Hive-partitioned Parquet feed under ``path`` as one Arrow table"""
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(
+        pa.schema([("teknokent", pa.string()), ("run_date", pa.date32())]),
+        flavor="hive",
+    )
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    return dataset.to_table(columns=columns, filter=filter)
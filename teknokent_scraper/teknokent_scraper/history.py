@@ -0,0 +1,207 @@
+# Append-only crawl history in compressed JSON Lines
+#
+# HISTORY_FEED is a jsonlines feed that never overwrites anything: every run
+# writes its own files, named after the run's start time, and the items are
+# compressed while they stream out by a feed postprocessing plugin (zstd, or
+# Scrapy's GzipPlugin where zstd is not available):
+#
+#     outputs/history/itu/2025-01-31T06-00-00Z/part-00001.jsonl.zst
+#
+# RotatingFeedExporter replaces Scrapy's FeedExporter and adds two feed
+# options next to the built-in batch_item_count. A feed with either of them
+# starts a new file (batch) once its current one has
+#
+#   batch_max_bytes     that many bytes on disk (compressed, so it lags by
+#                       what the compressor still buffers, ~128 KiB), or
+#   batch_max_seconds   been open that long
+#
+# A run directory gets a COMPLETE_MARKER file (feed option complete_marker)
+# once the crawl has finished normally; runs without it were killed, crashed
+# or are still being resumed from a checkpoint. A resumed job continues its
+# run directory (see checkpoint.py) with new part files after the existing
+# ones, and a finished job writes the marker.
+#
+# iter_history() streams the items of one or more runs back, oldest first. A
+# part cut short by a crash is read as far as it can be (up to the last full
+# 1 MiB read buffer) and then skipped, with a warning.
+
+import os
+import io
+import re
+import glob
+import gzip
+import json
+import logging
+from time import monotonic
+
+from scrapy.extensions.feedexport import FeedExporter, apply_uri_params
+
+from .checkpoint import end_job_run
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+logger = logging.getLogger(__name__)
+
+COMPLETE_MARKER = "_COMPLETE"
+
+HISTORY_EXTENSION = ".jsonl.zst" if zstd is not None else ".jsonl.gz"
+
+HISTORY_FEED = {
+    f"outputs/history/%(name)s/%(run_time)s/part-%(batch_id)05d{HISTORY_EXTENSION}": {
+        "format": "jsonlines",
+        "encoding": "utf-8",
+        "overwrite": False,
+        "store_empty": False,
+        "postprocessing": [
+            "teknokent_scraper.history.ZstdPlugin" if zstd is not None else "scrapy.extensions.postprocessing.GzipPlugin",
+        ],
+        "gzip_compresslevel": 6,
+        "batch_max_bytes": 64 * 1024 * 1024,
+        "batch_max_seconds": 3600,
+        "complete_marker": COMPLETE_MARKER,
+    },
+}
+
+
+class ZstdPlugin:
+    """Feed postprocessing plugin that compresses with zstd (``zstd_level``, default 3)"""
+
+    def __init__(self, file, feed_options):
+        if zstd is None:
+            raise ImportError("ZstdPlugin needs Python 3.14+ or the backports.zstd package")
+        self.file = file
+        self.zstdfile = zstd.ZstdFile(file, mode="w", level=feed_options.get("zstd_level", 3))
+
+    def write(self, data):
+        return self.zstdfile.write(data)
+
+    def close(self):
+        self.zstdfile.close()
+
+
+class RotatingFeedExporter(FeedExporter):
+    """FeedExporter that also starts new batches by file size and age"""
+
+    ROTATION_OPTIONS = ("batch_max_bytes", "batch_max_seconds")
+
+    def _settings_are_valid(self):
+        # Like batch_item_count: without a batch parameter in the URI every
+        # rotation would write over the same file
+        for uri_template, feed_options in self.feeds.items():
+            rotates = any(feed_options.get(option) for option in self.ROTATION_OPTIONS)
+            if rotates and not re.search(r"%\(batch_time\)s|%\(batch_id\)", uri_template):
+                logger.error(
+                    f"%(batch_time)s or %(batch_id)d must be in the feed URI ({uri_template}) "
+                    "if batch_max_bytes or batch_max_seconds is set"
+                )
+                return False
+        return super()._settings_are_valid()
+
+    def _start_new_batch(self, batch_id, uri, feed_options, spider, uri_template):
+        if not feed_options.get("overwrite") and "%(batch_id)" in uri_template:
+            # A resumed run goes on after the parts of its earlier attempts
+            params = self._get_uri_params(spider, feed_options["uri_params"])
+            while os.path.exists(local_path(uri)):
+                batch_id += 1
+                uri = apply_uri_params(uri_template, {**params, "batch_id": batch_id})
+        slot = super()._start_new_batch(
+            batch_id=batch_id, uri=uri, feed_options=feed_options, spider=spider, uri_template=uri_template
+        )
+        slot.opened_at = monotonic()
+        return slot
+
+    async def close_spider(self, spider, reason=None):
+        await super().close_spider(spider)
+        if reason != "finished":
+            return
+        for slot in self.slots:
+            marker = self.feeds[slot.uri_template].get("complete_marker")
+            run_dir = os.path.dirname(local_path(slot.uri))
+            if marker and os.path.isdir(run_dir):
+                with open(os.path.join(run_dir, marker), "w", encoding="utf-8") as f:
+                    json.dump({"finish_reason": reason, "parts": slot.batch_id}, f)
+        jobdir = self.crawler.settings.get("JOBDIR")
+        if jobdir:
+            end_job_run(jobdir)
+
+    def item_scraped(self, item, spider):
+        super().item_scraped(item, spider)
+        self.slots = [self.rotate(slot, spider) if self.is_full(slot) else slot for slot in self.slots]
+
+    def is_full(self, slot):
+        if not slot.itemcount:
+            return False
+        feed_options = self.feeds[slot.uri_template]
+        max_bytes = feed_options.get("batch_max_bytes")
+        if max_bytes and getattr(slot, "file", None) is not None and slot.file.tell() >= max_bytes:
+            return True
+        max_seconds = feed_options.get("batch_max_seconds")
+        return bool(max_seconds) and monotonic() - slot.opened_at >= max_seconds
+
+    def rotate(self, slot, spider):
+        """Close the slot's file and continue the feed in the next batch"""
+        feed_options = self.feeds[slot.uri_template]
+        uri_params = self._get_uri_params(spider, feed_options["uri_params"], slot)
+        self._schedule_slot_close(slot, spider)
+        return self._start_new_batch(
+            batch_id=slot.batch_id + 1,
+            uri=apply_uri_params(slot.uri_template, uri_params),
+            feed_options=feed_options,
+            spider=spider,
+            uri_template=slot.uri_template,
+        )
+
+
+def local_path(uri):
+    """File system path of a feed URI ("" for other storages)"""
+    if uri.startswith("file://"):
+        return uri[len("file://"):]
+    return "" if "://" in uri else uri
+
+
+def is_complete(run_dir, marker=COMPLETE_MARKER):
+    """Whether a history run directory belongs to a crawl that finished"""
+    return os.path.exists(os.path.join(run_dir, marker))
+
+
+def open_history_file(path):
+    """Binary stream of the decompressed contents of one history file"""
+    if path.endswith(".zst"):
+        if zstd is None:
+            raise ImportError(f"Reading {path} needs Python 3.14+ or the backports.zstd package")
+        return io.BufferedReader(zstd.ZstdFile(path), buffer_size=1 << 20)
+    if path.endswith(".gz"):
+        return io.BufferedReader(gzip.GzipFile(path), buffer_size=1 << 20)
+    return open(path, "rb", buffering=1 << 20)
+
+
+def history_files(path):
+    """History files under a run, spider or history directory, oldest first"""
+    if os.path.isfile(path):
+        return [path]
+    files = glob.glob(os.path.join(path, "**", "*.jsonl*"), recursive=True)
+    # Run directories are start times and parts are zero-padded batch ids
+    return sorted(files, key=lambda f: (os.path.dirname(f), f))
+
+
+TRUNCATED_ERRORS = (EOFError, json.JSONDecodeError, gzip.BadGzipFile) + (
+    (zstd.ZstdError,) if zstd is not None else ()
+)
+
+
+def iter_history(path):
+    """Items of every history file under ``path``, streamed one line at a time"""
+    for file_path in history_files(path):
+        with open_history_file(file_path) as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except TRUNCATED_ERRORS as e:
+                logger.warning(f"{file_path} is cut short ({e}), skipping the rest of it")
@@ -0,0 +1,193 @@
+# Incremental recrawl of company detail pages
+#
+# Detail requests carry meta["fingerprint_key"] (the detail URL, or the ITU
+# rowID). For every key the FingerprintStore remembers the ETag, Last-Modified
+# and content hash of the last response plus the item it produced. Item fields
+# a spider takes from the listing page rather than the detail page go into
+# meta["fingerprint_extra"]: when they differ from the stored ones the page
+# counts as changed, so a renamed company or a new phone number on the
+# listing is parsed again instead of carried forward.
+#
+#   * IncrementalDownloaderMiddleware turns known keys into conditional
+#     requests and flags the response as unchanged on 304 or a hash match.
+#   * IncrementalSpiderMiddleware skips the callback of unchanged responses
+#     and yields the previous item instead, and records the items of changed
+#     ones.
+#
+# Both middlewares share one store per crawler, written to INCREMENTAL_DIR
+# when the spider closes.
+
+import os
+import re
+import json
+import hashlib
+import weakref
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request, TextResponse
+
+from .items import CompanyDetailsItem
+
+# Inline scripts carry per-request nonces and would defeat the content hash
+SCRIPT_RE = re.compile(rb"<script\b[^>]*>.*?</script>", re.IGNORECASE | re.DOTALL)
+
+_stores = weakref.WeakKeyDictionary()
+
+
+def content_hash(response):
+    body = response.body
+    if isinstance(response, TextResponse) and b"<script" in body.lower():
+        body = SCRIPT_RE.sub(b"", body)
+    return hashlib.sha1(body).hexdigest()
+
+
+class FingerprintStore:
+    """Per-spider JSON file of fingerprint_key -> last response fingerprint and item"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.records = json.load(f)
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def update(self, key, fingerprint, item):
+        # The item itself is kept (and only serialised on save) so later stages
+        # that still change it, like detail coalescing, end up in the store
+        self.records[key] = dict(fingerprint, item=item)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False, default=dict)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.records)
+
+
+def get_store(crawler):
+    """The crawler's FingerprintStore, created on first use and saved at spider close"""
+    store = _stores.get(crawler)
+    if store is None:
+        if not crawler.settings.getbool("INCREMENTAL_ENABLED", True):
+            raise NotConfigured
+        # Recording needs full answers instead of 304s, and a replay is run to
+        # parse every page again
+        if crawler.settings.get("ARCHIVE_MODE"):
+            raise NotConfigured
+        path = os.path.join(crawler.settings.get("INCREMENTAL_DIR", ".crawl_state/fingerprints"), f"{crawler.spidercls.name}.json")
+        store = _stores[crawler] = FingerprintStore(path)
+
+        def save_store(spider):
+            store.save()
+            spider.logger.info(f"Saved {len(store)} fingerprints to {store.path}")
+
+        crawler.signals.connect(save_store, signal=signals.spider_closed, weak=False)
+    return store
+
+
+class IncrementalDownloaderMiddleware:
+    """Send conditional requests for known detail pages and detect unchanged ones"""
+
+    def __init__(self, store, stats):
+        self.store = store
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(get_store(crawler), crawler.stats)
+
+    def process_request(self, request, spider):
+        key = request.meta.get("fingerprint_key")
+        record = self.store.get(key) if key else None
+        if not record or record.get("extra") != request.meta.get("fingerprint_extra"):
+            # A 304 would leave nothing to parse the new listing fields with
+            return None
+
+        if record.get("etag"):
+            request.headers.setdefault("If-None-Match", record["etag"])
+        if record.get("last_modified"):
+            request.headers.setdefault("If-Modified-Since", record["last_modified"])
+        allowed = request.meta.get("handle_httpstatus_list", [])
+        if 304 not in allowed:
+            request.meta["handle_httpstatus_list"] = [*allowed, 304]
+        return None
+
+    def process_response(self, request, response, spider):
+        key = request.meta.get("fingerprint_key")
+        if not key:
+            return response
+
+        record = self.store.get(key) or {}
+        extra = request.meta.get("fingerprint_extra")
+        if record and record.get("extra") != extra:
+            record = {}
+        if response.status == 304 and record:
+            request.meta["fingerprint_unchanged"] = True
+            self.stats.inc_value("incremental/not_modified")
+        elif response.status == 200:
+            fingerprint = {
+                "etag": response.headers.get("ETag", b"").decode("latin-1"),
+                "last_modified": response.headers.get("Last-Modified", b"").decode("latin-1"),
+                "hash": content_hash(response),
+                "extra": extra,
+            }
+            request.meta["fingerprint"] = fingerprint
+            if record and record.get("hash") == fingerprint["hash"]:
+                request.meta["fingerprint_unchanged"] = True
+                self.stats.inc_value("incremental/hash_match")
+        return response
+
+
+class IncrementalSpiderMiddleware:
+    """Carry the previous item forward for unchanged detail pages"""
+
+    def __init__(self, store, stats):
+        self.store = store
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(get_store(crawler), crawler.stats)
+
+    def previous_item(self, response):
+        """Stored item for an unchanged response, or None if the callback must run"""
+        if not response.meta.get("fingerprint_unchanged"):
+            return None
+        record = self.store.get(response.meta.get("fingerprint_key"))
+        if not record or not record.get("item"):
+            return None
+        self.stats.inc_value("incremental/carried_forward")
+        return CompanyDetailsItem(**record["item"])
+
+    def record(self, response, output):
+        key = response.meta.get("fingerprint_key")
+        fingerprint = response.meta.get("fingerprint")
+        if key and fingerprint and not isinstance(output, Request):
+            self.store.update(key, fingerprint, output)
+            self.stats.inc_value("incremental/recorded")
+
+    def process_spider_output(self, response, result, spider):
+        item = self.previous_item(response)
+        if item is not None:
+            # The callback generator is never started, so no parsing happens
+            yield item
+            return
+        for output in result:
+            self.record(response, output)
+            yield output
+
+    async def process_spider_output_async(self, response, result, spider):
+        item = self.previous_item(response)
+        if item is not None:
+            yield item
+            return
+        async for output in result:
+            self.record(response, output)
+            yield output
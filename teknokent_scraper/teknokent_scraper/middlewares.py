@@ -3,98 +3,324 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+import time
+
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Request, TextResponse
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from .archive import ResponseArchive
+from .playwright_pool import context_meta
+
+DOWNLOAD_MODES = ("http", "playwright")
+ARCHIVE_MODES = ("record", "replay")
+
+
+# Counters kept per callback, in Prometheus metric order
+CALLBACK_METRICS = (
+    ("responses", "counter", "Responses handled by the callback"),
+    ("wall_seconds", "counter", "Wall-clock time spent inside the callback"),
+    ("cpu_seconds", "counter", "CPU time of the reactor thread spent inside the callback"),
+    ("items", "counter", "Items yielded by the callback"),
+    ("requests", "counter", "Requests yielded by the callback"),
+    ("max_wall_seconds", "gauge", "Slowest single response of the callback"),
+)
+
+
+def callback_name(response):
+    """Name of the callback that handles a response"""
+    request = response.request
+    callback = request.callback if request is not None else None
+    if callback is None:
+        return "parse"
+    return getattr(callback, "__name__", repr(callback))
+
 
 class TeknokentScraperSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """Time every spider callback and count what it yields.
+
+    Wall and CPU time are only taken while the callback generator runs, not
+    while later middlewares or the engine handle its output. Per callback the
+    totals go into the stats as ``callbacks/<name>/...`` and, at spider close,
+    into a Prometheus text file (CALLBACK_METRICS_FILE) for the node exporter
+    textfile collector.
+    """
+
+    def __init__(self, stats, metrics_file=None):
+        self.stats = stats
+        self.metrics_file = metrics_file
+        self.callbacks = {}
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
-        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        if not crawler.settings.getbool("CALLBACK_METRICS_ENABLED", True):
+            raise NotConfigured
+        s = cls(crawler.stats, crawler.settings.get("CALLBACK_METRICS_FILE"))
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def counters(self, name):
+        counters = self.callbacks.get(name)
+        if counters is None:
+            counters = self.callbacks[name] = {
+                "responses": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "items": 0, "requests": 0, "max_wall_seconds": 0.0,
+            }
+        return counters
 
-        # Should return None or raise an exception.
-        return None
+    def finish(self, counters, wall, cpu, items, requests):
+        counters["responses"] += 1
+        counters["wall_seconds"] += wall
+        counters["cpu_seconds"] += cpu
+        counters["items"] += items
+        counters["requests"] += requests
+        counters["max_wall_seconds"] = max(counters["max_wall_seconds"], wall)
 
     def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+        counters = self.counters(callback_name(response))
+        wall = cpu = 0.0
+        items = requests = 0
+        result = iter(result)
+        try:
+            while True:
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    output = next(result)
+                except StopIteration:
+                    return
+                finally:
+                    wall += time.perf_counter() - wall_start
+                    cpu += time.thread_time() - cpu_start
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        finally:
+            self.finish(counters, wall, cpu, items, requests)
 
-        # Must return an iterable of Request, or item objects.
-        for i in result:
-            yield i
+    async def process_spider_output_async(self, response, result, spider):
+        counters = self.counters(callback_name(response))
+        wall = cpu = 0.0
+        items = requests = 0
+        result = result.__aiter__()
+        try:
+            while True:
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    output = await result.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    wall += time.perf_counter() - wall_start
+                    cpu += time.thread_time() - cpu_start
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        finally:
+            self.finish(counters, wall, cpu, items, requests)
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def spider_closed(self, spider):
+        for name, counters in self.callbacks.items():
+            for metric, value in counters.items():
+                self.stats.set_value(f"callbacks/{name}/{metric}", round(value, 6) if isinstance(value, float) else value)
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+        ranked = sorted(self.callbacks.items(), key=lambda pair: pair[1]["wall_seconds"], reverse=True)
+        for name, counters in ranked:
+            per_response = counters["wall_seconds"] / counters["responses"] * 1000 if counters["responses"] else 0.0
+            spider.logger.info(
+                f"Callback {name}: {counters['responses']} responses, {counters['wall_seconds']:.3f}s wall "
+                f"({per_response:.2f} ms/response), {counters['cpu_seconds']:.3f}s CPU, "
+                f"{counters['items']} items, {counters['requests']} requests"
+            )
 
-    async def process_start(self, start):
-        # Called with an async iterator over the spider start() method or the
-        # maching method of an earlier spider middleware.
-        async for item_or_request in start:
-            yield item_or_request
+        if self.metrics_file and self.callbacks:
+            path = self.metrics_file % {"name": spider.name}
+            self.write_metrics(path, spider.name)
+            spider.logger.info(f"Callback metrics written to {path}")
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+    def write_metrics(self, path, spider_name):
+        """Write the counters in the Prometheus text exposition format"""
+        lines = []
+        for metric, kind, help_text in CALLBACK_METRICS:
+            full_name = f"teknokent_callback_{metric}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for name, counters in sorted(self.callbacks.items()):
+                lines.append(f'{full_name}{{spider="{spider_name}",callback="{name}"}} {counters[metric]}')
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Written aside and renamed so a collector never reads half a file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
 
 
 class TeknokentScraperDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """Record responses to a ResponseArchive, or answer requests from it.
+
+    ``ARCHIVE_MODE = "record"`` stores every downloaded response under
+    ARCHIVE_DIR/<spider>, keyed by request fingerprint. ``"replay"`` answers
+    each request from there without going to the network or Playwright, so a
+    fixed parser can be re-run over the last crawl in seconds. Requests that
+    were never recorded are dropped, or downloaded with
+    ``ARCHIVE_REPLAY_MISSING = "fetch"``.
+    """
+
+    def __init__(self, crawler, mode, archive, fetch_missing=False):
+        if mode not in ARCHIVE_MODES:
+            raise ValueError(f"ARCHIVE_MODE must be one of {ARCHIVE_MODES}, got {mode!r}")
+        self.fingerprinter = crawler.request_fingerprinter
+        self.stats = crawler.stats
+        self.mode = mode
+        self.archive = archive
+        self.fetch_missing = fetch_missing
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        settings = crawler.settings
+        mode = settings.get("ARCHIVE_MODE")
+        if not mode:
+            raise NotConfigured
+        archive = ResponseArchive(
+            os.path.join(settings.get("ARCHIVE_DIR", ".crawl_state/archive"), crawler.spidercls.name),
+            compression=settings.get("ARCHIVE_COMPRESSION", "gzip"),
+        )
+        s = cls(crawler, mode, archive, fetch_missing=settings.get("ARCHIVE_REPLAY_MISSING") == "fetch")
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
     def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
-        return None
+        if self.mode != "replay":
+            return None
+        response = self.archive.get(self.fingerprinter.fingerprint(request).hex(), request)
+        if response is not None:
+            self.stats.inc_value("archive/hit")
+            return response
+        self.stats.inc_value("archive/miss")
+        if self.fetch_missing:
+            return None
+        raise IgnoreRequest(f"Not in the archive: {request.url}")
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
-
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+        if self.mode != "record" or "archived" in response.flags:
+            return response
+        # A 304 has no body to re-parse; keep the full answer of the last run
+        if response.status == 304:
+            return response
+        if self.archive.put(self.fingerprinter.fingerprint(request).hex(), response):
+            self.stats.inc_value("archive/bodies_stored")
+        self.stats.inc_value("archive/recorded")
         return response
 
-    def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
+    def spider_opened(self, spider):
+        spider.logger.info(f"Archive {self.mode}: {len(self.archive)} responses in {self.archive.path}")
 
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+    def spider_closed(self, spider):
+        self.archive.close()
+        if self.mode == "record":
+            spider.logger.info(f"Archived {len(self.archive)} responses in {self.archive.path}")
 
-    def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+
+class DownloadModeMiddleware:
+    """Send each request either over plain HTTP or through Playwright.
+
+    Plain HTTP is the default (``DOWNLOAD_MODE`` setting). A spider renders
+    all of its requests with ``download_mode = "playwright"`` and a single
+    request opts in with ``meta={"download_mode": "playwright"}``.
+
+    Rendered requests go to one pooled browser context per domain, see
+    playwright_pool.py. Retrying plain HTTP responses through the browser is
+    RenderProbeMiddleware's job.
+    """
+
+    def __init__(self, stats, default_mode="http", storage_state_dir=None):
+        if default_mode not in DOWNLOAD_MODES:
+            raise ValueError(f"DOWNLOAD_MODE must be one of {DOWNLOAD_MODES}, got {default_mode!r}")
+        self.stats = stats
+        self.default_mode = default_mode
+        self.storage_state_dir = storage_state_dir
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler.stats,
+            default_mode=crawler.settings.get("DOWNLOAD_MODE", "http"),
+            storage_state_dir=crawler.settings.get("PLAYWRIGHT_STORAGE_STATE_DIR"),
+        )
+
+    def request_mode(self, request, spider):
+        """Mode for a request: explicit meta first, then the spider, then the setting"""
+        if request.meta.get("playwright"):
+            return "playwright"
+        return request.meta.get("download_mode") or getattr(spider, "download_mode", None) or self.default_mode
+
+    def process_request(self, request, spider):
+        mode = self.request_mode(request, spider)
+        request.meta["download_mode"] = mode
+        request.meta["playwright"] = mode == "playwright"
+        if mode == "playwright":
+            for key, value in context_meta(request, self.storage_state_dir).items():
+                request.meta.setdefault(key, value)
+        self.stats.inc_value(f"download_mode/{mode}")
+        return None
+
+
+class RenderProbeMiddleware:
+    """Retry plain HTTP responses that lack the expected content through Playwright.
+
+    Spiders may declare ``render_probes``, a mapping of callback name to CSS
+    selector. When a plain HTTP response for that callback matches nothing,
+    the request is retried once with ``download_mode = "playwright"``.
+    A request can set its own probe in ``meta["render_probe"]``, or None for
+    no probe.
+
+    Runs below HttpCompressionMiddleware (590), so the probe sees the decoded
+    TextResponse and not the gzip/br encoded body.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("DOWNLOAD_MODE_ESCALATE", True):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_response(self, request, response, spider):
+        if request.meta.get("download_mode") != "http":
+            return response
+        if request.meta.get("download_mode_escalated") or response.status != 200:
+            return response
+        if not isinstance(response, TextResponse):
+            return response
+
+        probe = self.probe_for(request, spider)
+        if not probe or response.css(probe):
+            return response
+
+        spider.logger.info(f"Probe {probe!r} matched nothing on {response.url}, retrying with Playwright")
+        self.stats.inc_value("download_mode/escalated")
+        meta = dict(request.meta, download_mode="playwright", download_mode_escalated=True)
+        return request.replace(meta=meta, dont_filter=True)
+
+    def probe_for(self, request, spider):
+        if "render_probe" in request.meta:
+            return request.meta["render_probe"]
+        probes = getattr(spider, "render_probes", None)
+        if not probes:
+            return None
+        callback = request.callback or getattr(spider, "parse", None)
+        if isinstance(callback, str):
+            name = callback
+        else:
+            name = getattr(callback, "__name__", None)
+        return probes.get(name)
@@ -2,61 +2,205 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+#
+# TeknokentScraperPipeline normalises every item in one pass:
+#
+#   * list values are cleaned one by one and joined with "; "
+#   * strings go through precomputed translation tables: every Unicode space
+#     (NBSP, thin space, ideographic space, line breaks) becomes " ", zero
+#     width characters, soft hyphens and control characters are deleted,
+#     runs of spaces collapse, and non-ASCII text is NFC-normalised so that
+#     a decomposed "İ" (I + combining dot) matches the composed one
+#   * e-mails are lowercased without turning "İ" into "i̇", and all-caps
+#     locations ("İZMİR") get Turkish title case ("İzmir", not "İzmi̇r")
+#   * missing fields get the defaults of ITEM_DEFAULTS for the spider
+#
+# Items are normalised one at a time. With NORMALIZE_BATCH_SIZE above 1 they
+# are collected in batches of that size and released downstream together,
+# after at most NORMALIZE_FLUSH_INTERVAL seconds.
+
+import re
+import unicodedata
 
-import os
-import json
 from itemadapter import ItemAdapter
+from scrapy import Item
+from scrapy.exceptions import DropItem
+from twisted.internet import defer
+
+LIST_SEPARATOR = "; "
+
+# Every field ends up as a string; these are filled in when missing
+BASE_DEFAULTS = {
+    "company_location": "",
+    "company_desc": "",
+    "company_contact_mail": "",
+    "company_phone": "",
+    "company_website": "",
+    "company_area": "",
+}
+
+# Everything str.split() treats as whitespace, plus NBSP and friends
+SPACES = "\t\n\v\f\r\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+# Zero width space/joiners, word joiner, BOM, soft hyphen
+INVISIBLE = "\u200b\u200c\u200d\u2060\ufeff\xad"
+CONTROL = "".join(map(chr, [*range(0x00, 0x09), *range(0x0e, 0x1c), *range(0x7f, 0x85), *range(0x86, 0xa0)]))
+
+CLEANUP_TABLE = str.maketrans({
+    **{char: " " for char in SPACES},
+    **dict.fromkeys(INVISIBLE + CONTROL),
+})
+# Cheaper than translate() for the common case of nothing to clean up
+NEEDS_CLEANUP_RE = re.compile(f"[{re.escape(SPACES + INVISIBLE + CONTROL)}]")
+# str.lower() turns "İ" into "i" + combining dot, and "I" into "i"
+TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+TURKISH_UPPER = str.maketrans({"i": "İ", "ı": "I"})
+EMAIL_LOWER = str.maketrans({"İ": "i"})
+
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def clean_text(value):
+    """Whitespace and Unicode cleanup of one string"""
+    if value.isascii():
+        if not value.isprintable():
+            value = value.translate(CLEANUP_TABLE)
+    else:
+        value = unicodedata.normalize("NFC", value)
+        if NEEDS_CLEANUP_RE.search(value):
+            value = value.translate(CLEANUP_TABLE)
+    if "  " in value:
+        return " ".join(value.split())
+    return value.strip()
+
+
+def turkish_lower(value):
+    return value.translate(TURKISH_LOWER).lower()
+
+
+def _title_word(match):
+    word = match.group()
+    return word[:1].translate(TURKISH_UPPER).upper() + turkish_lower(word[1:])
+
+
+def turkish_title(value):
+    """Title case with the Turkish dotted and dotless i"""
+    return WORD_RE.sub(_title_word, value)
+
+
+def clean_value(value):
+    if isinstance(value, str):
+        return clean_text(value)
+    if isinstance(value, (list, tuple)):
+        parts = (clean_text(str(v)) for v in value)
+        return LIST_SEPARATOR.join(part for part in parts if part)
+    return value
+
+
+# Field-specific steps after the generic cleanup
+FIELD_FIXES = {
+    "company_contact_mail": lambda value: value.translate(EMAIL_LOWER).lower(),
+    "company_location": lambda value: turkish_title(value) if value.isupper() else value,
+}
+
+
+def normalize_item(item, defaults):
+    """Clean every field of an item in place and fill in the defaults, return it"""
+    # Plain dicts and Scrapy items are mappings already
+    fields = item if isinstance(item, (dict, Item)) else ItemAdapter(item)
+    for name, value in list(fields.items()):
+        if not value:
+            continue
+        value = clean_value(value)
+        fix = FIELD_FIXES.get(name)
+        if fix is not None and value:
+            value = fix(value)
+        fields[name] = value
+
+    if not fields.get("company_name"):
+        raise DropItem("Item dropped: missing company_name")
+    for name, default in defaults.items():
+        if not fields.get(name):
+            fields[name] = default
+    return item
 
 
 class TeknokentScraperPipeline:
+    """Normalise items in batches with per-spider defaults"""
+
+    def __init__(self, defaults_table=None, batch_size=1, flush_interval=0.25, stats=None):
+        self.defaults_table = defaults_table or {}
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.stats = stats
+        self.defaults = dict(BASE_DEFAULTS)
+        self.batch = []
+        self.timer = None
+        self.items_scraped = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            defaults_table=settings.getdict("ITEM_DEFAULTS"),
+            batch_size=settings.getint("NORMALIZE_BATCH_SIZE", 1),
+            flush_interval=settings.getfloat("NORMALIZE_FLUSH_INTERVAL", 0.25),
+            stats=crawler.stats,
+        )
+
     def open_spider(self, spider):
         """Called when spider is opened"""
+        self.defaults = {**BASE_DEFAULTS, **self.defaults_table.get(spider.name, {})}
         self.items_scraped = 0
         spider.logger.info(f"Starting {spider.name} spider")
 
     def process_item(self, item, spider):
-        """Process each scraped item"""
-        adapter = ItemAdapter(item)
-        
-        # Clean up fields
-        for field_name, field_value in adapter.items():
-            if field_value:
-                if isinstance(field_value, list):
-                    # Join list values with semicolon
-                    adapter[field_name] = '; '.join([str(v).strip() for v in field_value if str(v).strip()])
-                elif isinstance(field_value, str):
-                    # Clean up string values
-                    adapter[field_name] = field_value.strip()
-        
-        # Ensure required fields have values
-        if not adapter.get('company_name'):
-            spider.logger.warning("Item dropped: missing company_name")
-            return None
-        
-        # Set default values for missing fields
-        if not adapter.get('company_location'):
-            adapter['company_location'] = 'Ankara'
-        
-        if not adapter.get('company_desc'):
-            adapter['company_desc'] = ''
-            
-        if not adapter.get('company_contact_mail'):
-            adapter['company_contact_mail'] = ''
-            
-        if not adapter.get('company_phone'):
-            adapter['company_phone'] = ''
-            
-        if not adapter.get('company_website'):
-            adapter['company_website'] = ''
-            
-        if not adapter.get('company_area'):
-            adapter['company_area'] = ''
-        
+        """Normalise right away, or queue the item for the next batch"""
+        if self.batch_size == 1:
+            return self.normalize(item, spider)
+        deferred = defer.Deferred()
+        self.batch.append((item, deferred))
+        if len(self.batch) >= self.batch_size:
+            self.flush(spider)
+        elif self.timer is None:
+            self.timer = self.schedule_flush(spider)
+        return deferred
+
+    def schedule_flush(self, spider):
+        """Flush a partial batch later, return the delayed call"""
+        from twisted.internet import reactor
+
+        return reactor.callLater(self.flush_interval, self.flush, spider)
+
+    def normalize(self, item, spider):
+        item = normalize_item(item, self.defaults)
         self.items_scraped += 1
-        spider.logger.info(f"Processed item {self.items_scraped}: {adapter.get('company_name')}")
-        
         return item
 
+    def flush(self, spider):
+        """Normalise the queued items and pass them on"""
+        if self.timer is not None:
+            if self.timer.active():
+                self.timer.cancel()
+            self.timer = None
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        if self.stats is not None:
+            self.stats.inc_value("normalize/batches")
+        results = []
+        for item, deferred in batch:
+            try:
+                results.append((deferred, self.normalize(item, spider), None))
+            except DropItem as exc:
+                results.append((deferred, None, exc))
+        # Downstream stages run from callback(), only once the whole batch is done
+        for deferred, item, error in results:
+            if error is not None:
+                deferred.errback(error)
+            else:
+                deferred.callback(item)
+
     def close_spider(self, spider):
         """Called when spider is closed"""
+        self.flush(spider)
         spider.logger.info(f"Spider {spider.name} finished. Total items scraped: {self.items_scraped}")
@@ -0,0 +1,186 @@
+# Browser context pool for the requests that really need Playwright
+#
+# scrapy-playwright does the heavy lifting (contexts, page semaphores, request
+# routing); this module decides how it is used:
+#
+#   * one browser context per domain, capped at PLAYWRIGHT_MAX_PAGES_PER_CONTEXT
+#     pages, with its cookies/local storage saved to PLAYWRIGHT_STORAGE_STATE_DIR
+#     at spider close and loaded again on the next run
+#   * should_abort_request() (PLAYWRIGHT_ABORT_REQUEST) drops images, media,
+#     fonts and third-party analytics before they leave the browser
+#   * PlaywrightPoolStats reports pages/sec and peak Chromium RSS
+
+import os
+import time
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "yandex.ru",
+    "mc.yandex.com",
+    "tiktok.com",
+    "linkedin.com/px",
+)
+
+PAGE_INIT_CALLBACK = "teknokent_scraper.playwright_pool.register_page"
+
+# Contexts seen by register_page, by context name. Names are domains, so the
+# spiders of a multi-spider run never share an entry.
+_contexts = {}
+
+
+def should_abort_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST hook: skip heavy resources and trackers"""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    url = request.url
+    return any(host in url for host in BLOCKED_HOSTS)
+
+
+def context_name(url):
+    """Name of the pooled context used for a URL: its host without www."""
+    host = urlparse(url).hostname or "default"
+    return host[4:] if host.startswith("www.") else host
+
+
+def storage_state_path(state_dir, name):
+    return os.path.join(state_dir, f"{name}.json")
+
+
+def context_meta(request, state_dir=None):
+    """Meta keys routing a Playwright request to its domain's pooled context"""
+    name = request.meta.get("playwright_context") or context_name(request.url)
+    meta = {
+        "playwright_context": name,
+        "playwright_page_init_callback": PAGE_INIT_CALLBACK,
+    }
+    if state_dir and "playwright_context_kwargs" not in request.meta:
+        path = storage_state_path(state_dir, name)
+        if os.path.exists(path):
+            meta["playwright_context_kwargs"] = {"storage_state": path}
+    return meta
+
+
+async def register_page(page, request):
+    """Page init callback: remember the context so its state can be saved later"""
+    _contexts[request.meta.get("playwright_context")] = page.context
+
+
+def chromium_rss_bytes():
+    """Resident memory of all Chromium processes on this machine (Linux only)"""
+    total = 0
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return 0
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read(512)
+            if b"chrom" not in cmdline and b"headless_shell" not in cmdline:
+                continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class PlaywrightPoolStats:
+    """Pages/sec and peak Chromium RSS for rendered pages, plus state persistence"""
+
+    def __init__(self, stats, state_dir, interval):
+        self.stats = stats
+        self.state_dir = state_dir
+        self.interval = interval
+        self.pages = 0
+        self.first_page_at = None
+        self.last_page_at = None
+        self.peak_rss = 0
+        self.context_names = set()
+        self.sampler = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("PLAYWRIGHT_POOL_STATS_ENABLED", True):
+            raise NotConfigured
+        ext = cls(
+            crawler.stats,
+            state_dir=settings.get("PLAYWRIGHT_STORAGE_STATE_DIR"),
+            interval=settings.getfloat("PLAYWRIGHT_RSS_SAMPLE_INTERVAL", 5.0),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.sampler = task.LoopingCall(self.sample_rss)
+        self.sampler.start(self.interval, now=False)
+
+    def response_received(self, response, request, spider):
+        if "playwright" not in response.flags:
+            return
+        now = time.monotonic()
+        if self.first_page_at is None:
+            self.first_page_at = now
+            # The browser is up now, take a first sample
+            self.sample_rss()
+        self.last_page_at = now
+        self.pages += 1
+        self.context_names.add(request.meta.get("playwright_context"))
+
+    def sample_rss(self):
+        if self.first_page_at is None:
+            return
+        self.peak_rss = max(self.peak_rss, chromium_rss_bytes())
+
+    async def spider_closed(self, spider):
+        if self.sampler and self.sampler.running:
+            self.sampler.stop()
+        if not self.pages:
+            return
+
+        self.sample_rss()
+        elapsed = (self.last_page_at - self.first_page_at) or 1.0
+        self.stats.set_value("playwright_pool/pages", self.pages)
+        self.stats.set_value("playwright_pool/pages_per_sec", round(self.pages / elapsed, 2))
+        self.stats.set_value("playwright_pool/peak_chromium_rss_mb", round(self.peak_rss / 2**20, 1))
+        self.stats.set_value("playwright_pool/contexts", len(self.context_names))
+        spider.logger.info(
+            f"Playwright pool: {self.pages} pages at {self.pages / elapsed:.2f} pages/sec, "
+            f"peak Chromium RSS {self.peak_rss / 2**20:.1f} MB"
+        )
+
+        if self.state_dir:
+            await self.save_storage_states(spider)
+
+    async def save_storage_states(self, spider):
+        """Persist cookies and local storage so the next run starts warm"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        for name in self.context_names:
+            context = _contexts.pop(name, None)
+            if context is None:
+                continue
+            try:
+                await context.storage_state(path=storage_state_path(self.state_dir, name))
+            except Exception as e:
+                spider.logger.warning(f"Could not save storage state for context {name}: {e}")
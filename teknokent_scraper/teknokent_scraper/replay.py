@@ -0,0 +1,88 @@
+# Replay download handler for offline end-to-end runs
+#
+# With the settings_replay profile every http/https request is sent to the
+# local replay server (benchmarks/replay_server.py) at REPLAY_SERVER_URL as
+#
+#     https://www.ariteknokent.com.tr/tr/x?page=2 -> <REPLAY_SERVER_URL>/www.ariteknokent.com.tr/tr/x?page=2
+#
+# The answer is handed back with the original URL, so download slots,
+# throttle profiles, response.follow() and the spiders' URL checks behave
+# exactly as against the real sites. Playwright requests are replayed the
+# same way: the recorded fixtures already are the rendered pages.
+#
+# The ReplayOutputs add-on moves every feed of the crawl, including the ones a
+# spider declares in its custom_settings, under REPLAY_OUTPUT_DIR, so that
+# fixture data never ends up next to the production outputs:
+#
+#     outputs/ODTU/odtu_companies.json -> outputs/replay/ODTU/odtu_companies.json
+
+import os
+from pathlib import Path
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import SETTINGS_PRIORITIES
+from scrapy.utils.httpobj import urlparse_cached
+
+
+def replay_url(server_url, request):
+    """URL of a request on the replay server"""
+    parsed = urlparse_cached(request)
+    url = f"{server_url.rstrip('/')}/{parsed.netloc}{parsed.path or '/'}"
+    if parsed.query:
+        url += f"?{parsed.query}"
+    return url
+
+
+class ReplayDownloadHandler:
+    """Download every request from the local replay server"""
+
+    lazy = False
+
+    def __init__(self, crawler, server_url):
+        self.server_url = server_url
+        self.http = HTTP11DownloadHandler.from_crawler(crawler)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        server_url = crawler.settings.get("REPLAY_SERVER_URL")
+        if not server_url:
+            raise NotConfigured("REPLAY_SERVER_URL is not set")
+        return cls(crawler, server_url)
+
+    async def download_request(self, request):
+        local = request.replace(url=replay_url(self.server_url, request))
+        response = await self.http.download_request(local)
+        # download_latency and friends were recorded on the local copy
+        request.meta.update(local.meta)
+        return response.replace(url=request.url, request=request)
+
+    async def close(self):
+        await self.http.close()
+
+
+def replay_feed_uri(uri, output_dir):
+    """The feed URI moved under output_dir, keeping what follows "outputs/" """
+    uri = str(uri.absolute()) if isinstance(uri, Path) else str(uri)
+    path = uri[len("file://"):] if uri.startswith("file://") else uri
+    parts = path.replace("\\", "/").split("/")
+    if "outputs" in parts:
+        parts = parts[len(parts) - parts[::-1].index("outputs"):]
+    else:
+        parts = parts[-1:]
+    return os.path.join(output_dir, *parts)
+
+
+class ReplayOutputs:
+    """Add-on that writes the feeds of a replay crawl under REPLAY_OUTPUT_DIR"""
+
+    def update_settings(self, settings):
+        # Add-ons run after the spider's custom_settings; -s FEEDS=... still wins
+        if settings.getpriority("FEEDS") > SETTINGS_PRIORITIES["spider"]:
+            return
+        output_dir = settings.get("REPLAY_OUTPUT_DIR", "outputs/replay")
+        feeds = {
+            replay_feed_uri(uri, output_dir): options
+            for uri, options in settings.getdict("FEEDS").items()
+        }
+        settings.set("FEEDS", feeds, priority="spider")
@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+from teknokent_scraper import exporters, history
+
 BOT_NAME = "teknokent_scraper"
 
 SPIDER_MODULES = ["teknokent_scraper.spiders"]
@@ -23,9 +25,26 @@ ROBOTSTXT_OBEY = False
 
 # Concurrency and throttling settings
 #CONCURRENT_REQUESTS = 16
-CONCURRENT_REQUESTS_PER_DOMAIN = 1
+# Per-site concurrency and delays come from THROTTLE_PROFILES (see throttle.py);
+# these are only the upper bound the adaptive throttle can raise a slot to
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
 DOWNLOAD_DELAY = 1
 
+THROTTLE_ENABLED = True
+# Sites without a profile: one request at a time, one second apart
+THROTTLE_DEFAULT_PROFILE = {"max_concurrency": 1, "min_delay": 1.0, "target_latency": 1.0}
+THROTTLE_PROFILES = {
+    # getCompanyInformations detail fan-out, small JSON answers
+    "ariteknokent.com.tr": {"max_concurrency": 8, "min_delay": 0.1, "target_latency": 0.5},
+    "firmarehberi.ankarateknokent.com": {"max_concurrency": 4, "min_delay": 0.25, "target_latency": 1.0},
+    "hacettepeteknokent.com.tr": {"max_concurrency": 4, "min_delay": 0.25, "target_latency": 1.0},
+    "cyberpark.com.tr": {"max_concurrency": 4, "min_delay": 0.5, "target_latency": 1.5, "randomize_delay": True},
+    "egeteknopark.com.tr": {"max_concurrency": 1, "min_delay": 2.0, "target_latency": 2.0, "randomize_delay": True},
+    "gaziteknopark.com.tr": {"max_concurrency": 1, "min_delay": 1.0, "target_latency": 2.0},
+    "odtuteknokent.com.tr": {"max_concurrency": 1, "min_delay": 1.0, "target_latency": 2.0},
+    "teknoparkizmir.com.tr": {"max_concurrency": 1, "min_delay": 1.0, "target_latency": 2.0},
+}
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -40,29 +59,125 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "teknokent_scraper.middlewares.TeknokentScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    "teknokent_scraper.coalesce.DetailCoalescingMiddleware": 550,
+    "teknokent_scraper.incremental.IncrementalSpiderMiddleware": 600,
+    # Closest to the spider, so only the callbacks themselves are timed
+    "teknokent_scraper.middlewares.TeknokentScraperSpiderMiddleware": 900,
+}
+
+# Per-callback wall/CPU time and yield counts (TeknokentScraperSpiderMiddleware),
+# in the stats as callbacks/<callback>/... and, at spider close, in a Prometheus
+# text file (%(name)s is the spider name)
+CALLBACK_METRICS_ENABLED = True
+CALLBACK_METRICS_FILE = ".crawl_state/metrics/%(name)s.prom"
 
 
 DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
     'scrapy_user_agents.middlewares.RandomUserAgentMiddleware': 400,
+    'teknokent_scraper.incremental.IncrementalDownloaderMiddleware': 580,
+    # Below HttpCompressionMiddleware (590), so it probes decompressed bodies
+    'teknokent_scraper.middlewares.RenderProbeMiddleware': 585,
+    'teknokent_scraper.middlewares.DownloadModeMiddleware': 950,
+    'teknokent_scraper.middlewares.TeknokentScraperDownloaderMiddleware': 960,
+    # Closest to the download handlers, so only the download itself is measured
+    'teknokent_scraper.download_metrics.DownloadMetricsMiddleware': 970,
 }
 
+# Per-domain latency histograms (HTTP, Playwright network and render time),
+# bytes, status codes and retries (see download_metrics.py). Percentiles go in
+# the stats as download_metrics/<domain>/..., everything in the JSON report
+DOWNLOAD_METRICS_ENABLED = True
+DOWNLOAD_METRICS_REPORT = ".crawl_state/metrics/%(name)s.downloads.json"
+
+# Record/replay archive (see archive.py): "record" stores every response under
+# ARCHIVE_DIR/<spider>, "replay" answers from there without any network or
+# Playwright access, e.g. to re-run the parsers after an extraction fix:
+#     scrapy crawl itu -s ARCHIVE_MODE=record
+#     scrapy crawl itu -s ARCHIVE_MODE=replay
+# Unrecorded requests are dropped on replay unless ARCHIVE_REPLAY_MISSING = "fetch".
+# ARCHIVE_COMPRESSION is "gzip" or "zstd" (Python 3.14+, or the backports-zstd
+# package before that).
+ARCHIVE_MODE = None
+ARCHIVE_DIR = ".crawl_state/archive"
+ARCHIVE_COMPRESSION = "gzip"
+ARCHIVE_REPLAY_MISSING = "ignore"
+
+# Incremental recrawl (see incremental.py): detail requests with a
+# meta["fingerprint_key"] become conditional requests, and unchanged pages
+# reuse the item from the previous run instead of being parsed again
+INCREMENTAL_ENABLED = True
+INCREMENTAL_DIR = ".crawl_state/fingerprints"
+
+# Checkpoint mode (see checkpoint.py): when set, every spider crawls with
+# JOBDIR = CHECKPOINT_DIR/<spider name> and can be resumed after a crash
+CHECKPOINT_DIR = None
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+# RotatingFeedExporter is Scrapy's FeedExporter plus the batch_max_bytes and
+# batch_max_seconds feed options (see history.py)
+EXTENSIONS = {
+    "scrapy.extensions.feedexport.FeedExporter": None,
+    "teknokent_scraper.history.RotatingFeedExporter": 0,
+    "teknokent_scraper.playwright_pool.PlaywrightPoolStats": 500,
+    "teknokent_scraper.throttle.AdaptiveThrottle": 510,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 ITEM_PIPELINES = {
     "teknokent_scraper.pipelines.TeknokentScraperPipeline": 300,
+    "teknokent_scraper.dedup.CompanyDedupPipeline": 400,
+    "teknokent_scraper.storage.CompanyStorePipeline": 500,
+    "teknokent_scraper.changes.ChangeCapturePipeline": 600,
 }
 
+# Field defaults per spider for items that come without them (see pipelines.py);
+# fields not listed here default to ""
+ITEM_DEFAULTS = {
+    "ankara_teknokent_comprehensive": {"company_location": "Ankara"},
+    "bilkent": {"company_location": "Ankara"},
+    "gazi": {"company_location": "Ankara"},
+    "hacettepe": {"company_location": "Ankara"},
+    "odtu": {"company_location": "Ankara"},
+    "itu": {"company_location": "İstanbul"},
+    "ege_teknopark": {"company_location": "İzmir"},
+    "izmir_teknopark": {"company_location": "İzmir"},
+}
+
+# Items are normalised in batches of this size, and a batch that does not fill
+# up is flushed after NORMALIZE_FLUSH_INTERVAL seconds; 1 disables batching.
+# Off by default: batching measured slower (make bench-pipeline), adds latency,
+# and a batched process_item returns Deferreds, which Scrapy deprecates
+NORMALIZE_BATCH_SIZE = 1
+NORMALIZE_FLUSH_INTERVAL = 0.25
+
+# Cross-teknokent dedup (see dedup.py): the items of all spiders are merged by
+# normalised name and website domain into one record per company with the list
+# of teknokents that list it, written to DEDUP_OUTPUT. DEDUP_DB is kept from
+# run to run; -s DEDUP_REBUILD=True starts it afresh
+DEDUP_ENABLED = True
+DEDUP_DB = ".crawl_state/dedup/companies.sqlite3"
+DEDUP_REBUILD = False
+DEDUP_OUTPUT = "outputs/companies_canonical.jsonl"
+
+# SQLite store (see storage.py): every item is upserted into STORAGE_PATH by
+# source teknokent and normalised name, STORAGE_BATCH_SIZE rows per transaction
+STORAGE_ENABLED = True
+STORAGE_PATH = "outputs/companies.sqlite3"
+STORAGE_BATCH_SIZE = 200
+
+# Change data capture (see changes.py): after a crawl, the companies added,
+# removed and changed since the spider's previous run in CHANGES_HISTORY_DIR
+# (the history feed) go to CHANGES_DIR/<spider>/<run start>.jsonl, with a
+# .summary.json of counts next to it
+CHANGES_ENABLED = True
+CHANGES_HISTORY_DIR = "outputs/history"
+CHANGES_DIR = "outputs/changes"
+
 # Feed exports configuration - overwrite existing files
 FEEDS = {
     '/Users/user/Desktop/Projects/teknokent-scraper/teknokent_scraper/teknokent_scraper/outputs/ANKARA_UNI/companies_%(name)s.json': {
@@ -90,8 +205,20 @@ FEEDS = {
         'encoding': 'utf-8',
         'store_empty': False,
         'overwrite': True,
-    }
+    },
+    # One Parquet dataset for all teknokents and runs, and the append-only
+    # history: one directory per run, a new compressed JSON Lines part every
+    # 64 MiB or hour, _COMPLETE once the run has finished
+    **exporters.PARQUET_FEED,
+    **history.HISTORY_FEED,
+}
+
+# Columnar feed format, and the %(teknokent)s / %(run_date)s / %(run_time)s URI
+# parameters of the partitioned and history layouts (see exporters.py)
+FEED_EXPORTERS = {
+    "parquet": "teknokent_scraper.exporters.ParquetItemExporter",
 }
+FEED_URI_PARAMS = "teknokent_scraper.exporters.uri_params"
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -114,7 +241,15 @@ FEEDS = {
 #HTTPCACHE_IGNORE_HTTP_CODES = []
 #HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
 
-# Set settings whose default value is deprecated to a future-proof value
+# The Playwright handler only renders requests with meta["playwright"] set and
+# hands everything else to Scrapy's plain HTTP handler. DownloadModeMiddleware
+# sets that key: plain HTTP unless the spider (download_mode = "playwright") or
+# the request (meta["download_mode"]) asks for the browser, or a spider's
+# render_probes selector finds nothing in the plain HTTP response
+# (RenderProbeMiddleware; DOWNLOAD_MODE_ESCALATE = False turns that off).
+DOWNLOAD_MODE = "http"
+DOWNLOAD_MODE_ESCALATE = True
+
 DOWNLOAD_HANDLERS = {
     "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
@@ -132,6 +267,16 @@ PLAYWRIGHT_LAUNCH_OPTIONS = {
     "args": ["--no-sandbox", "--disable-dev-shm-usage"]
 }
 
+# Browser context pool (see playwright_pool.py): one context per domain with at
+# most this many open pages, cookies/storage kept between runs, and images,
+# media, fonts and analytics aborted inside the browser
+PLAYWRIGHT_MAX_CONTEXTS = 8
+PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = 4
+PLAYWRIGHT_ABORT_REQUEST = "teknokent_scraper.playwright_pool.should_abort_request"
+PLAYWRIGHT_STORAGE_STATE_DIR = ".crawl_state/playwright"
+# How often (seconds) Chromium RSS is sampled for playwright_pool/peak_chromium_rss_mb
+PLAYWRIGHT_RSS_SAMPLE_INTERVAL = 5.0
+
 # Default request headers to mimic a real browser
 DEFAULT_REQUEST_HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
@@ -0,0 +1,52 @@
+# Settings profile for offline end-to-end runs against the replay server
+#
+#     python benchmarks/replay_server.py --port 8765 &
+#     SCRAPY_PROJECT=replay scrapy crawl itu
+#
+# (scrapy.cfg maps the "replay" project to this module; benchmarks/e2e_bench.py
+# starts the server and uses the profile by itself.) Everything else, from the
+# middlewares to the pipeline and the feed exports, is the production setup,
+# except that every output goes under REPLAY_OUTPUT_DIR.
+
+import os
+
+from .settings import *  # noqa: F401,F403
+
+REPLAY_SERVER_URL = os.environ.get("REPLAY_SERVER_URL", "http://127.0.0.1:8765")
+
+# Plain HTTP to the replay server, including requests that would be rendered
+DOWNLOAD_HANDLERS = {
+    "http": "teknokent_scraper.replay.ReplayDownloadHandler",
+    "https": "teknokent_scraper.replay.ReplayDownloadHandler",
+}
+EXTENSIONS = {
+    **EXTENSIONS,  # noqa: F405
+    "teknokent_scraper.playwright_pool.PlaywrightPoolStats": None,
+}
+
+# Measure the crawler, not the politeness delays; pass
+# -s THROTTLE_ENABLED=True -s DOWNLOAD_DELAY=1 to replay with them
+THROTTLE_ENABLED = False
+DOWNLOAD_DELAY = 0
+
+# Fresh crawls every time, with state kept in the working directory
+INCREMENTAL_ENABLED = False
+
+# Fixture data stays out of the production outputs: the feeds (the project's
+# and the spiders' own, the crawl history included) are moved here by the
+# ReplayOutputs add-on, and the stores are kept here too
+REPLAY_OUTPUT_DIR = "outputs/replay"
+ADDONS = {
+    **ADDONS,  # noqa: F405
+    "teknokent_scraper.replay.ReplayOutputs": 0,
+}
+STORAGE_PATH = f"{REPLAY_OUTPUT_DIR}/companies.sqlite3"
+DEDUP_DB = ".crawl_state/replay/dedup/companies.sqlite3"
+DEDUP_REBUILD = True
+DEDUP_OUTPUT = f"{REPLAY_OUTPUT_DIR}/companies_canonical.jsonl"
+
+# A replay is not a run of the sites, so it is never compared with one; with
+# -s CHANGES_ENABLED=True replays are compared with earlier replays only
+CHANGES_ENABLED = False
+CHANGES_HISTORY_DIR = f"{REPLAY_OUTPUT_DIR}/history"
+CHANGES_DIR = f"{REPLAY_OUTPUT_DIR}/changes"
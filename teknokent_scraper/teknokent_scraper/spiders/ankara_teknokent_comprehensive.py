@@ -2,11 +2,16 @@ import scrapy
 import json
 import re
 import os
-from urllib.parse import urljoin, urlencode
+import time
+from urllib.parse import urljoin, urlencode, urlparse, parse_qs
 from scrapy.loader import ItemLoader
 from ..items import CompanyDetailsItem
+from ..checkpoint import CheckpointMixin
+from ..contacts import extract_contacts
 
-class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
+NONCE_RE = re.compile(r'"(?:ajax_nonce|security)":"([^"]+)"')
+
+class AnkaraTeknokentComprehensiveSpider(CheckpointMixin, scrapy.Spider):
     name = "ankara_teknokent_comprehensive"
     
     # Category mappings with their URLs
@@ -18,106 +23,203 @@ class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
         'TIP_ECZACILIK': 'https://firmarehberi.ankarateknokent.com/?type=place&category=tip-ve-eczacilik&sort=latest'
     }
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Create output directory if it doesn't exist
-        self.output_dir = "/Users/user/Desktop/Projects/teknokent-scraper/teknokent_scraper/teknokent_scraper/outputs/ANKARA_UNI"
-        os.makedirs(self.output_dir, exist_ok=True)
-        
+    AJAX_URL = "https://firmarehberi.ankarateknokent.com/"
+
+    # The get_listings nonce is cached here between runs and only refreshed
+    # (from one rendered category page) when the AJAX endpoint rejects it.
+    # WordPress nonces stay valid for 12-24 hours.
+    nonce_cache_path = ".crawl_state/ankara_nonce.json"
+    nonce_max_age = 12 * 3600
+    max_nonce_refreshes = 3
+
+    async def start(self):
+        # Newer Scrapy versions only call start(); older ones call start_requests()
+        for request in self.start_requests():
+            yield request
+
     def start_requests(self):
-        """Start requests for each category"""
-        for category_name, category_url in self.CATEGORIES.items():
-            self.logger.info(f"Starting scraping for category: {category_name}")
-            yield scrapy.Request(
-                category_url,
-                callback=self.parse_category_page,
-                meta={
-                    'category': category_name,
-                    'category_url': category_url,
-                    'dont_cache': True
-                }
-            )
+        """Start with the listings of every category, or with a nonce refresh if none is cached"""
+        nonce = self.current_nonce()
+        if nonce:
+            self.logger.info("Using cached AJAX nonce, skipping the category pages")
+            for category_name in self.CATEGORIES:
+                self.logger.info(f"Starting scraping for category: {category_name}")
+                yield self.listings_request(category_name, nonce, page=0)
+        else:
+            yield from self.refresh_nonce([(category, 0) for category in self.CATEGORIES])
+
+    def current_nonce(self):
+        """Nonce from the spider state, else from the cache file if it is fresh enough"""
+        nonce = self.checkpoint_state.get('nonce')
+        if nonce:
+            return nonce
+        try:
+            with open(self.nonce_cache_path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get('fetched_at', 0) > self.nonce_max_age:
+            return None
+        self.checkpoint_state['nonce'] = cached.get('nonce')
+        return self.checkpoint_state['nonce']
+
+    def store_nonce(self, nonce):
+        self.checkpoint_state['nonce'] = nonce
+        os.makedirs(os.path.dirname(self.nonce_cache_path) or '.', exist_ok=True)
+        with open(self.nonce_cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'nonce': nonce, 'fetched_at': time.time()}, f)
+
+    def forget_nonce(self):
+        self.checkpoint_state.pop('nonce', None)
+        if os.path.exists(self.nonce_cache_path):
+            os.remove(self.nonce_cache_path)
+
+    def refresh_nonce(self, pending):
+        """Queue (category, page) listings until a fresh nonce arrives; load one category page for it"""
+        self.persistent('nonce_pending', list).extend(pending)
+        if self.checkpoint_state.get('nonce_refreshing'):
+            return
+
+        refreshes = self.persistent('nonce_refreshes', int)
+        if refreshes >= self.max_nonce_refreshes:
+            self.logger.error(f"AJAX nonce rejected after {refreshes} refreshes, giving up on {len(self.checkpoint_state['nonce_pending'])} listing pages")
+            return
+        self.checkpoint_state['nonce_refreshes'] = refreshes + 1
+        self.checkpoint_state['nonce_refreshing'] = True
+        self.forget_nonce()
+
+        category_name, _ = pending[0]
+        category_url = self.CATEGORIES[category_name]
+        self.logger.info(f"Fetching a fresh AJAX nonce from category page: {category_name}")
+        yield scrapy.Request(
+            category_url,
+            callback=self.parse_category_page,
+            errback=self.nonce_refresh_failed,
+            meta={
+                'category': category_name,
+                'category_url': category_url,
+                'dont_cache': True,
+                # The listing theme only prints its AJAX nonce once rendered
+                'download_mode': 'playwright'
+            },
+            dont_filter=True
+        )
+
+    def listings_request(self, category, nonce, page, retry=False):
+        """get_listings AJAX request for one page of a category, ``retry`` for one re-issued after a rejection"""
+        category_url = self.CATEGORIES[category]
+        category_slug = parse_qs(urlparse(category_url).query).get('category', [''])[0]
+
+        params = {
+            'mylisting-ajax': '1',
+            'action': 'get_listings',
+            'security': nonce,
+            'form_data[page]': str(page),
+            'form_data[preserve_page]': 'false',
+            'form_data[search_keywords]': '',
+            'form_data[category]': category_slug,
+            'form_data[sort]': 'latest',
+            'listing_type': 'place',
+            'listing_wrap': 'col-md-12 grid-item'
+        }
+
+        return scrapy.Request(
+            f"{self.AJAX_URL}?{urlencode(params)}",
+            callback=self.parse_ajax_listings,
+            headers={
+                'X-Requested-With': 'XMLHttpRequest',
+                'Accept': 'application/json, text/javascript, */*; q=0.01',
+                'Referer': category_url
+            },
+            meta={
+                'category': category,
+                'nonce': nonce,
+                'page': page,
+                'category_slug': category_slug,
+                # A stale nonce is answered with 400/403 "-1"
+                'handle_httpstatus_list': [400, 403]
+            },
+            # The refreshed nonce can be the rejected one again, and the
+            # dupefilter would then drop the page as already seen
+            dont_filter=retry
+        )
     
     def parse_category_page(self, response):
         """Parse category page and extract nonce for AJAX requests"""
         category = response.meta['category']
         self.logger.info(f"Parsing category page for: {category}")
+        self.checkpoint_state['nonce_refreshing'] = False
         
         nonce = None
         
         # Extract nonce from page scripts
-        try:
-            scripts = response.css('script::text').getall()
-        except:
-            response_text = response.body.decode('utf-8', errors='ignore')
-            script_matches = re.findall(r'<script[^>]*>(.*?)</script>', response_text, re.DOTALL | re.IGNORECASE)
-            scripts = script_matches
-        
-        for script in scripts:
+        for script in response.css('script::text').getall():
             if 'ajax_nonce' in script or 'security' in script:
-                nonce_match = re.search(r'"(?:ajax_nonce|security)":"([^"]+)"', script)
+                nonce_match = NONCE_RE.search(script)
                 if nonce_match:
                     nonce = nonce_match.group(1)
                     break
         
         if nonce:
             self.logger.info(f"Found nonce for {category}: {nonce}")
-            
-            # Extract category slug from URL
-            category_slug = None
-            if 'category=' in response.url:
-                category_slug = response.url.split('category=')[1].split('&')[0]
-            
-            # Make AJAX request to get listings
-            ajax_url = "https://firmarehberi.ankarateknokent.com/"
-            
-            params = {
-                'mylisting-ajax': '1',
-                'action': 'get_listings',
-                'security': nonce,
-                'form_data[page]': '0',
-                'form_data[preserve_page]': 'false',
-                'form_data[search_keywords]': '',
-                'form_data[category]': category_slug if category_slug else '',
-                'form_data[sort]': 'latest',
-                'listing_type': 'place',
-                'listing_wrap': 'col-md-12 grid-item'
-            }
-            
-            url_with_params = f"{ajax_url}?{urlencode(params)}"
-            
-            yield scrapy.Request(
-                url_with_params,
-                callback=self.parse_ajax_listings,
-                headers={
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'Accept': 'application/json, text/javascript, */*; q=0.01',
-                    'Referer': response.url
-                },
-                meta={
-                    'category': category,
-                    'nonce': nonce,
-                    'page': 0,
-                    'category_slug': category_slug
-                }
-            )
+            self.store_nonce(nonce)
+
+            # Re-issue everything that waited for the nonce
+            pending = self.checkpoint_state.pop('nonce_pending', [])
+            for pending_category, page in pending:
+                yield self.listings_request(pending_category, nonce, page, retry=True)
         else:
             self.logger.warning(f"Could not find nonce for category: {category}")
+            pending = self.checkpoint_state.pop('nonce_pending', [])
+            if pending:
+                yield from self.refresh_nonce(pending)
+
+    def nonce_refresh_failed(self, failure):
+        """The category page for a new nonce did not load: try again for the waiting listings"""
+        category = failure.request.meta['category']
+        self.logger.warning(f"Could not load category page {category} for a fresh nonce: {failure.value!r}")
+        self.checkpoint_state['nonce_refreshing'] = False
+        pending = self.checkpoint_state.pop('nonce_pending', [])
+        if pending:
+            yield from self.refresh_nonce(pending)
+
+    def nonce_rejected(self, response, data):
+        """True if get_listings refused the request's security nonce"""
+        if response.status in (400, 403):
+            return True
+        if response.body.strip() in (b'-1', b'0'):
+            return True
+        return isinstance(data, dict) and data.get('success') is False and 'html' not in data
     
     def parse_ajax_listings(self, response):
         """Parse AJAX response containing listings"""
         category = response.meta['category']
+        page = response.meta.get('page', 0)
         
-        self.logger.info(f"AJAX Response for {category} - Status: {response.status}")
-        
-        try:
-            response_text = response.text
-        except AttributeError:
-            response_text = response.body.decode('utf-8', errors='ignore')
+        self.logger.info(f"AJAX Response for {category} page {page} - Status: {response.status}")
         
-        # Try to parse as JSON first
+        response_text = response.text
+
         try:
             data = json.loads(response_text)
+        except json.JSONDecodeError:
+            data = None
+
+        if self.nonce_rejected(response, data):
+            nonce = self.current_nonce()
+            if nonce and nonce != response.meta['nonce']:
+                # Another listing already refreshed the nonce while this one was in flight
+                yield self.listings_request(category, nonce, page, retry=True)
+            else:
+                self.logger.warning(f"AJAX nonce rejected for {category} page {page}")
+                yield from self.refresh_nonce([(category, page)])
+            return
+
+        # Page 0 tells us how many pages the category has: request the rest at once
+        if page == 0 and isinstance(data, dict):
+            yield from self.request_remaining_pages(data, category, response.meta['nonce'])
+        
+        if data is not None:
             self.logger.info(f"Successfully parsed JSON response for {category}")
             
             # Handle different JSON response structures
@@ -139,13 +241,31 @@ class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
                 for listing in data:
                     yield from self.parse_listing_json(listing, category)
                     
-        except json.JSONDecodeError:
+        else:
             # Not JSON, try to parse as HTML
-            if response.text.strip():
+            if response_text.strip():
                 self.logger.info(f"Response for {category} is not JSON, parsing as HTML")
-                yield from self.parse_html_listings(response.text, category)
+                yield from self.parse_html_listings(response_text, category)
             else:
                 self.logger.warning(f"Empty AJAX response for category: {category}")
+
+    def request_remaining_pages(self, data, category, nonce):
+        """Issue form_data[page] 1..N-1 for a category once page 0 reported the total"""
+        payload = data.get('data') if isinstance(data.get('data'), dict) else data
+        total_pages = payload.get('max_num_pages')
+        if total_pages is None:
+            # Fall back to the highest page number in the pagination markup
+            page_numbers = [int(n) for n in re.findall(r'data-page="(\d+)"', payload.get('pagination') or '')]
+            total_pages = max(page_numbers) if page_numbers else 1
+
+        try:
+            total_pages = int(total_pages)
+        except (TypeError, ValueError):
+            return
+
+        self.logger.info(f"{category} has {total_pages} listing pages")
+        for page in range(1, total_pages):
+            yield self.listings_request(category, nonce, page)
     
     def parse_html_listings(self, html_content, category):
         """Parse HTML content containing listings"""
@@ -260,7 +380,12 @@ class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
                     'company_name': company_name,
                     'company_phone': phone_list,
                     'company_url': company_url,
-                    'category': category
+                    'category': category,
+                    'fingerprint_key': company_url,
+                    # The item takes these from the listing, not the detail page
+                    'fingerprint_extra': [company_name, phone_list, category],
+                    # Fetched once even if listed under several categories
+                    'coalesce_key': company_url
                 }
             )
         else:
@@ -283,11 +408,13 @@ class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
         
         company_name = response.meta['company_name']
         company_phone = response.meta['company_phone']
-        company_url = response.meta['company_url']
         category = response.meta['category']
         
         self.logger.info(f"Scraping details for: {company_name}")
         
+        # Phone numbers already come from the listing
+        contacts = extract_contacts(response, fields=('websites', 'emails', 'description'))
+        
         loader = ItemLoader(item=CompanyDetailsItem(), response=response)
         
         # Add basic info
@@ -299,225 +426,21 @@ class AnkaraTeknokentComprehensiveSpider(scrapy.Spider):
         if company_phone:
             loader.add_value('company_phone', '; '.join(company_phone))
         
-        # Extract company website URLs
-        websites_found = set()
-        
-        # Strategy 1: Look for website links in common sections
-        website_selectors = [
-            'a[href*="http"]:not([href*="ankarateknokent.com"]):not([href*="mailto:"]):not([href*="tel:"]):not([href*="facebook.com"]):not([href*="twitter.com"]):not([href*="instagram.com"]):not([href*="linkedin.com"]):not([href*="youtube.com"])::attr(href)',
-            '.website a::attr(href)',
-            '.company-website a::attr(href)',
-            '.listing-website a::attr(href)',
-            '[class*="website"] a::attr(href)',
-            '[class*="url"] a::attr(href)',
-            '.contact-info a[href^="http"]::attr(href)',
-            '.company-info a[href^="http"]::attr(href)'
-        ]
-        
-        for selector in website_selectors:
-            urls = response.css(selector).getall()
-            for url in urls:
-                if url and self.is_valid_website_url(url):
-                    websites_found.add(url)
-        
-        # Strategy 2: Look for website patterns in text content
-        all_text = ' '.join(response.css('::text').getall())
-        # Match common website patterns
-        website_patterns = [
-            r'https?://(?:www\.)?[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:/[^\s]*)?',
-            r'www\.[a-zA-Z0-9-]+\.[a-zA-Z]{2,}(?:\.[a-zA-Z]{2,})?(?:/[^\s]*)?'
-        ]
-        
-        for pattern in website_patterns:
-            matches = re.findall(pattern, all_text)
-            for match in matches:
-                if not match.startswith('http'):
-                    match = 'https://' + match
-                if self.is_valid_website_url(match):
-                    websites_found.add(match)
-        
-        # Strategy 3: Look in data attributes
-        data_urls = response.css('[data-url], [data-website], [data-link]').re(r'data-(?:url|website|link)="([^"]*)"')
-        for url in data_urls:
-            if url and self.is_valid_website_url(url):
-                websites_found.add(url)
-        
-        # Add websites to the item
-        if websites_found:
-            # Sort and clean websites
-            clean_websites = []
-            for website in sorted(websites_found):
-                # Clean up the URL
-                website = website.strip()
-                if website and website not in clean_websites:
-                    clean_websites.append(website)
-            
-            if clean_websites:
-                loader.add_value('company_website', '; '.join(clean_websites))
-                self.logger.info(f"Found {len(clean_websites)} websites for {company_name}: {', '.join(clean_websites)}")
-        
-        # Extract email addresses with multiple strategies
-        emails_found = set()
-        
-        # Strategy 1: Check mailto links
-        mailto_links = response.css('a[href^="mailto:"]::attr(href)').getall()
-        for mailto in mailto_links:
-            if mailto.startswith('mailto:'):
-                email = mailto.replace('mailto:', '').strip()
-                if self.is_valid_email(email):
-                    emails_found.add(email)
-        
-        # Strategy 2: Search for email patterns in all text content
-        all_text = ' '.join(response.css('::text').getall())
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_matches = re.findall(email_pattern, all_text)
-        
-        for email in email_matches:
-            if self.is_valid_email(email):
-                emails_found.add(email)
-        
-        # Strategy 3: Look for encoded emails (common anti-spam technique)
-        encoded_emails = re.findall(r'[A-Za-z0-9._%+-]+\s*\[at\]\s*[A-Za-z0-9.-]+\s*\[dot\]\s*[A-Z|a-z]{2,}', all_text)
-        for encoded in encoded_emails:
-            email = encoded.replace('[at]', '@').replace('[dot]', '.').replace(' ', '')
-            if self.is_valid_email(email):
-                emails_found.add(email)
-        
-        # Strategy 4: Look in contact sections specifically
-        contact_sections = response.css('.contact-info, .contact-details, .company-contact, .listing-contact')
-        for section in contact_sections:
-            section_text = ' '.join(section.css('::text').getall())
-            section_emails = re.findall(email_pattern, section_text)
-            for email in section_emails:
-                if self.is_valid_email(email):
-                    emails_found.add(email)
-        
-        # Strategy 5: Look for emails in data attributes
-        data_emails = response.css('[data-email]::attr(data-email)').getall()
-        for email in data_emails:
-            if self.is_valid_email(email):
-                emails_found.add(email)
-        
-        # Strategy 6: Look in script tags for JavaScript-encoded emails
-        scripts = response.css('script::text').getall()
-        for script in scripts:
-            script_emails = re.findall(email_pattern, script)
-            for email in script_emails:
-                if self.is_valid_email(email):
-                    emails_found.add(email)
-        
-        # Strategy 7: Look for obfuscated emails with unicode or HTML entities
-        html_entities = response.css('*::text').re(r'[A-Za-z0-9._%+-]+&#64;[A-Za-z0-9.-]+&#46;[A-Z|a-z]{2,}')
-        for entity in html_entities:
-            email = entity.replace('&#64;', '@').replace('&#46;', '.')
-            if self.is_valid_email(email):
-                emails_found.add(email)
-        
-        # Add emails to the item
-        if emails_found:
-            loader.add_value('company_contact_mail', '; '.join(sorted(emails_found)))
-            self.logger.info(f"Found {len(emails_found)} emails for {company_name}: {', '.join(emails_found)}")
+        if contacts['websites']:
+            loader.add_value('company_website', '; '.join(contacts['websites']))
+            self.logger.info(f"Found {len(contacts['websites'])} websites for {company_name}: {', '.join(contacts['websites'])}")
+        
+        if contacts['emails']:
+            loader.add_value('company_contact_mail', '; '.join(contacts['emails']))
+            self.logger.info(f"Found {len(contacts['emails'])} emails for {company_name}: {', '.join(contacts['emails'])}")
         else:
             self.logger.warning(f"No emails found for {company_name}")
         
-        # Extract company description if available
-        desc_selectors = [
-            '.listing-content p::text',
-            '.company-description::text',
-            '.listing-description::text',
-            '.about-company::text',
-            '[class*="description"] p::text'
-        ]
-        
-        for selector in desc_selectors:
-            descriptions = response.css(selector).getall()
-            if descriptions:
-                clean_desc = ' '.join([desc.strip() for desc in descriptions if desc.strip()])
-                if clean_desc:
-                    loader.add_value('company_desc', clean_desc)
-                    break
+        if contacts['description']:
+            loader.add_value('company_desc', contacts['description'])
         
         yield loader.load_item()
-    
-    def is_valid_email(self, email):
-        """Validate email address"""
-        if not email or '@' not in email:
-            return False
-        
-        # Basic email validation
-        if email.count('@') != 1:
-            return False
-        
-        local, domain = email.split('@')
-        
-        # Check for valid domain
-        if '.' not in domain or len(domain.split('.')) < 2:
-            return False
-        
-        # Check for common invalid patterns
-        invalid_patterns = [
-            'example.com',
-            'test.com',
-            'domain.com',
-            'email.com',
-            'noemail',
-            'no-reply',
-            'noreply'
-        ]
-        
-        for pattern in invalid_patterns:
-            if pattern in email.lower():
-                return False
-        
-        return True
-    
-    def is_valid_website_url(self, url):
-        """Validate website URL"""
-        if not url or not isinstance(url, str):
-            return False
-        
-        url = url.strip()
-        
-        # Check for minimum URL structure
-        if len(url) < 4:
-            return False
-        
-        # Skip social media and other non-business websites
-        skip_domains = [
-            'facebook.com', 'twitter.com', 'instagram.com', 'http://www.schema.org', 
-            'youtube.com', 'tiktok.com', 'pinterest.com', 'whatsapp.com',
-            'telegram.org', 'discord.com', 'reddit.com', 'github.com',
-            'ankarateknokent.com', 'google.com', 'maps.google.com',
-            'goo.gl', 'bit.ly', 't.co', 'ow.ly', 'tinyurl.com'
-        ]
-        
-        for domain in skip_domains:
-            if domain in url.lower():
-                return False
-        
-        # Check for valid URL patterns
-        url_patterns = [
-            r'^https?://',  # starts with http:// or https://
-            r'^www\.',      # starts with www.
-            r'[a-zA-Z0-9-]+\.[a-zA-Z]{2,}'  # has domain.tld pattern
-        ]
-        
-        has_valid_pattern = False
-        for pattern in url_patterns:
-            if re.search(pattern, url):
-                has_valid_pattern = True
-                break
-        
-        if not has_valid_pattern:
-            return False
-        
-        # Ensure it has a valid domain extension
-        if not re.search(r'\.[a-zA-Z]{2,}', url):
-            return False
-        
-        return True
 
     def closed(self, reason):
         """Called when spider is closed"""
         self.logger.info(f"Spider closed: {reason}")
-        self.logger.info(f"Output saved to: {self.output_dir}")
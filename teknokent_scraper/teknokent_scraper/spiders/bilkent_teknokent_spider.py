@@ -1,15 +1,24 @@
 import scrapy
+import re
 from urllib.parse import urljoin
 from scrapy.loader import ItemLoader
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
+from teknokent_scraper.exporters import PARQUET_FEED
+from teknokent_scraper.history import HISTORY_FEED
 
 
-class BilkentSpider(scrapy.Spider):
+class BilkentSpider(CheckpointMixin, scrapy.Spider):
     name = "bilkent"
     allowed_domains = ['cyberpark.com.tr']
     
-    # Generate URLs for all 18 pages
-    start_urls = [f'https://www.cyberpark.com.tr/firma-arsiv/{page}' for page in range(1, 19)]
+    ARCHIVE_URL = 'https://www.cyberpark.com.tr/firma-arsiv/{}'
+
+    # The page count is read from the first page's pagination
+    start_urls = [ARCHIVE_URL.format(1)]
+
+    # Retry through Playwright if the archive list is not in the plain HTML
+    render_probes = {'parse': 'div.e-bulletin-image-box'}
     
     custom_settings = {
         'FEEDS': {
@@ -21,18 +30,35 @@ class BilkentSpider(scrapy.Spider):
                 'format': 'csv',
                 'overwrite': True,
             },
+            **PARQUET_FEED,
+            **HISTORY_FEED,
         },
         'USER_AGENT': 'teknokent-scraper/1.0',
-        'DOWNLOAD_DELAY': 1,
-        'RANDOMIZE_DOWNLOAD_DELAY': True,
     }
 
+    @property
+    def last_scheduled_page(self):
+        return self.persistent('last_scheduled_page', lambda: 1)
+
     def parse(self, response):
         """Parse company listing page"""
-        self.logger.info(f"Parsing page: {response.url}")
+        page = response.meta.get('page', 1)
+        self.logger.info(f"Parsing page {page}: {response.url}")
         
         # Extract all company elements
         company_elements = response.css('div.e-bulletin-image-box')
+
+        stats = self.crawler.stats
+        stats.inc_value('bilkent/pages_fetched')
+        stats.inc_value('bilkent/companies_found', len(company_elements))
+
+        if not company_elements:
+            # Past the end of the archive: nothing to parse and nothing to follow
+            stats.inc_value('bilkent/empty_pages')
+            self.logger.info(f"Page {page} has no companies, not following it further")
+            return
+
+        yield from self.follow_archive_pages(response, page)
         
         for element in company_elements:
             # Extract company name from the title
@@ -76,3 +102,35 @@ class BilkentSpider(scrapy.Spider):
         # Log summary for this page
         total_companies = len(company_elements)
         self.logger.info(f"Page {response.url} processed: {total_companies} companies found")
+
+    def follow_archive_pages(self, response, page):
+        """Schedule every archive page the pagination shows that is not scheduled yet"""
+        page_numbers = [
+            int(number)
+            for number in re.findall(r'firma-arsiv/(\d+)', ' '.join(response.css('a::attr(href)').getall()))
+        ]
+
+        meta = {}
+        if page_numbers:
+            last_page = max(page_numbers)
+        else:
+            # No pagination found: walk forward one page at a time until a page comes back empty.
+            # Past the end the render probe would match nothing and fetch the page again with
+            # Playwright, so the next page is fetched the way this one was, without a probe
+            last_page = page + 1
+            meta = {'render_probe': None, 'download_mode': response.meta.get('download_mode')}
+
+        if last_page <= self.last_scheduled_page:
+            return
+
+        first_page = self.last_scheduled_page + 1
+        self.checkpoint_state['last_scheduled_page'] = last_page
+        self.crawler.stats.max_value('bilkent/page_count', last_page)
+        self.logger.info(f"Scheduling archive pages {first_page}-{last_page}")
+
+        for next_page in range(first_page, last_page + 1):
+            yield scrapy.Request(
+                self.ARCHIVE_URL.format(next_page),
+                callback=self.parse,
+                meta={'page': next_page, **meta}
+            )
@@ -1,16 +1,22 @@
 import scrapy
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
+from teknokent_scraper.exporters import PARQUET_FEED
+from teknokent_scraper.history import HISTORY_FEED
 from scrapy.loader import ItemLoader
 from itemloaders.processors import TakeFirst, MapCompose
 
 
-class EgeTeknoKentSpider(scrapy.Spider):
+class EgeTeknoKentSpider(CheckpointMixin, scrapy.Spider):
     name = "ege_teknopark"
     allowed_domains = ["egeteknopark.com.tr"]
     start_urls = [
         "https://egeteknopark.com.tr/kuluckalik-firmalar/",  # Incubator companies (34)
         "https://egeteknopark.com.tr/ege-teknopark/"         # Main company list (120)
     ]
+
+    # Retry through Playwright if the TablePress tables are not in the plain HTML
+    render_probes = {'parse': 'table.tablepress'}
     
     custom_settings = {
         'FEEDS': {
@@ -22,7 +28,9 @@ class EgeTeknoKentSpider(scrapy.Spider):
             'outputs/EGE_TEKNOKENT/ege_teknopark_companies.csv': {
                 'format': 'csv',
                 'overwrite': True,
-            }
+            },
+            **PARQUET_FEED,
+            **HISTORY_FEED,
         },
         'DEFAULT_REQUEST_HEADERS': {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -30,10 +38,13 @@ class EgeTeknoKentSpider(scrapy.Spider):
             'Accept-Encoding': 'gzip, deflate',
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         },
-        'DOWNLOAD_DELAY': 2,
-        'RANDOMIZE_DOWNLOAD_DELAY': True,
     }
 
+    async def start(self):
+        # Newer Scrapy versions only call start(); older ones call start_requests()
+        for request in self.start_requests():
+            yield request
+
     def start_requests(self):
         """Override start_requests to add custom headers for both URLs"""
         headers = {
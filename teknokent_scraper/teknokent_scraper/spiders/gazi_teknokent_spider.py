@@ -1,9 +1,10 @@
 import scrapy
 import json
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
 
 
-class GaziSpider(scrapy.Spider):
+class GaziSpider(CheckpointMixin, scrapy.Spider):
     name = "gazi"
     
     start_urls = [
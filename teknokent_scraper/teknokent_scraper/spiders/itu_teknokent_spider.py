@@ -2,9 +2,10 @@ import scrapy
 import json
 import re
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
 
 
-class ItuTeknokentSpider(scrapy.Spider):
+class ItuTeknokentSpider(CheckpointMixin, scrapy.Spider):
     name = "itu"
     allowed_domains = ["ariteknokent.com.tr"]
     
@@ -12,48 +13,72 @@ class ItuTeknokentSpider(scrapy.Spider):
         "https://www.ariteknokent.com.tr/tr/teknoloji-firmalari/teknokentli-firmalar"
     ]
 
-    def __init__(self):
-        self.company_ids = set()
-        self.pages_processed = 0
-        self.total_pages = 0
+    # Retry listing pages through Playwright if the company cards are missing;
+    # getCompanyInformations is plain JSON and never needs the browser
+    render_probes = {'parse': '.card[data-row-id]'}
+
+    DETAIL_URL = "https://www.ariteknokent.com.tr/tr/getCompanyInformations?rowID={}"
+
+    # Kept in the spider state so a checkpointed crawl resumes with them
+    @property
+    def company_ids(self):
+        return self.persistent('company_ids', set)
+
+    @property
+    def total_pages(self):
+        return self.persistent('total_pages', int)
+
+    @total_pages.setter
+    def total_pages(self, value):
+        self.checkpoint_state['total_pages'] = value
 
     def parse(self, response):
-        """Parse pagination pages to collect all company IDs."""
-        # Extract company row IDs from current page
+        """Parse a listing page: request its company details right away and schedule the other pages."""
+        # Extract company row IDs from current page and fetch the new ones immediately,
+        # so detail requests overlap with the remaining listing pages
         row_ids = response.css('.card::attr(data-row-id)').getall()
-        
+        new_ids = 0
+
         for row_id in row_ids:
-            if row_id:
+            if row_id and row_id not in self.company_ids:
                 self.company_ids.add(row_id)
-        
-        self.logger.info(f"Found {len(row_ids)} companies on current page. Total collected: {len(self.company_ids)}")
-        
-        # Get pagination info on first page
-        if self.total_pages == 0:
-            pagination_links = response.css('.pagination li a::attr(href)').getall()
-            page_numbers = []
-            for link in pagination_links:
-                match = re.search(r'page=(\d+)', link)
-                if match:
-                    page_numbers.append(int(match.group(1)))
-            
-            if page_numbers:
-                self.total_pages = max(page_numbers)
-                self.logger.info(f"Total pages found: {self.total_pages}")
-        
-        # Follow pagination links
-        next_page_link = response.css('.pagination li a[rel="next"]::attr(href)').get()
-        if next_page_link:
-            yield response.follow(next_page_link, callback=self.parse)
+                new_ids += 1
+                yield self.company_details_request(row_id)
+
+        self.logger.info(f"Found {len(row_ids)} companies ({new_ids} new) on {response.url}. Total collected: {len(self.company_ids)}")
+
+        # Every page's pagination tells us how far the listing goes; fan out all
+        # pages not scheduled yet instead of walking rel="next" one by one
+        page_links = {}
+        for link in response.css('.pagination li a::attr(href)').getall():
+            match = re.search(r'page=(\d+)', link)
+            if match:
+                page_links[int(match.group(1))] = link
+
+        if page_links:
+            last_page = max(page_links)
+            if last_page > self.total_pages:
+                first_new = max(self.total_pages, 1) + 1
+                self.total_pages = last_page
+                self.logger.info(f"Total pages found: {last_page}, scheduling pages {first_new}-{last_page}")
+
+                template = page_links[last_page]
+                for page in range(first_new, last_page + 1):
+                    page_url = re.sub(r'page=\d+', f'page={page}', template)
+                    # Listing pages go ahead of queued detail requests
+                    yield response.follow(page_url, callback=self.parse, meta={'page': page}, priority=1)
         else:
-            # No more pages, start fetching company details
-            self.logger.info(f"Pagination complete. Found {len(self.company_ids)} unique companies. Starting detail fetch...")
-            for company_id in self.company_ids:
-                yield scrapy.Request(
-                    url=f"https://www.ariteknokent.com.tr/tr/getCompanyInformations?rowID={company_id}",
-                    callback=self.parse_company_details,
-                    meta={'company_id': company_id}
-                )
+            # No numbered pagination: fall back to following the next link
+            next_page_link = response.css('.pagination li a[rel="next"]::attr(href)').get()
+            if next_page_link:
+                yield response.follow(next_page_link, callback=self.parse)
+
+    def company_details_request(self, company_id):
+        return scrapy.Request(
+            url=self.DETAIL_URL.format(company_id),
+            callback=self.parse_company_details,
+            meta={'company_id': company_id, 'fingerprint_key': f"itu:{company_id}"}
+        )
 
     def parse_company_details(self, response):
         """Parse individual company details from the AJAX API."""
@@ -1,12 +1,18 @@
 import scrapy
 from scrapy.loader import ItemLoader
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
+from teknokent_scraper.exporters import PARQUET_FEED
+from teknokent_scraper.history import HISTORY_FEED
 import re
 
 
-class IzmirTeknoparkSpider(scrapy.Spider):
+class IzmirTeknoparkSpider(CheckpointMixin, scrapy.Spider):
     name = "izmir_teknopark"
     allowed_domains = ["teknoparkizmir.com.tr"]
+
+    # Retry through Playwright if the company list is not in the plain HTML
+    render_probes = {'parse': 'div.firmaListe.holder'}
     
     custom_settings = {
         'FEEDS': {
@@ -22,10 +28,17 @@ class IzmirTeknoparkSpider(scrapy.Spider):
                 'encoding': 'utf8',
                 'store_empty': False,
                 'overwrite': True,
-            }
+            },
+            **PARQUET_FEED,
+            **HISTORY_FEED,
         }
     }
     
+    async def start(self):
+        # Newer Scrapy versions only call start(); older ones call start_requests()
+        for request in self.start_requests():
+            yield request
+
     def start_requests(self):
         """Generate requests with proper headers to avoid blocking"""
         url = "https://teknoparkizmir.com.tr/tr/firmalar-liste/"
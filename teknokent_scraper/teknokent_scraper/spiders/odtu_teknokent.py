@@ -1,12 +1,18 @@
 import scrapy
 from scrapy.loader import ItemLoader
 from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.checkpoint import CheckpointMixin
+from teknokent_scraper.exporters import PARQUET_FEED
+from teknokent_scraper.history import HISTORY_FEED
 
 
-class OdtuSpider(scrapy.Spider):
+class OdtuSpider(CheckpointMixin, scrapy.Spider):
     name = "odtu"
     start_urls = ["https://odtuteknokent.com.tr/tr/firmalar/tum-firmalar.php"]
 
+    # Retry through Playwright if the company table is not in the plain HTML
+    render_probes = {'parse': 'table.table tbody tr'}
+
     custom_settings = {
         'FEEDS': {
             'outputs/ODTU/odtu_companies.json': {
@@ -18,7 +24,9 @@ class OdtuSpider(scrapy.Spider):
             'outputs/ODTU/odtu_companies.csv': {
                 'format': 'csv',
                 'overwrite': True,
-            }
+            },
+            **PARQUET_FEED,
+            **HISTORY_FEED,
         }
     }
 
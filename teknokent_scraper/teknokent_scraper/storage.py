@@ -0,0 +1,209 @@
+# SQLite store of scraped companies
+#
+# CompanyStorePipeline upserts every item into one table, keyed by source
+# teknokent and normalised company name (see dedup.normalize_name), so a
+# re-crawl updates the rows of the companies it finds again and keeps
+# first_seen. Items are buffered and written STORAGE_BATCH_SIZE at a time with
+# executemany() in a single transaction; the database runs in WAL mode so
+# queries can read while a crawl writes.
+#
+# Indexed columns, besides (source_teknokent, name_key):
+#
+#   name_key         normalised name, for lookups across teknokents
+#   website_domain   host without "www."
+#   website_rdomain  the same host reversed ("rt.moc.emca"), so that a domain
+#                    suffix like ".com.tr" is an index range, not a scan
+#   email_domain     domain of the first contact e-mail
+#
+# CompanyStore.search() builds the common cross-site queries on top of them.
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from itemadapter import ItemAdapter
+from scrapy.exceptions import NotConfigured
+
+from .dedup import FIELDS, normalize_name, website_domain
+from .pipelines import LIST_SEPARATOR, turkish_lower
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,
+    source_teknokent TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    company_name TEXT NOT NULL,
+    company_desc TEXT NOT NULL DEFAULT '',
+    company_contact_mail TEXT NOT NULL DEFAULT '',
+    company_phone TEXT NOT NULL DEFAULT '',
+    company_website TEXT NOT NULL DEFAULT '',
+    company_location TEXT NOT NULL DEFAULT '',
+    company_area TEXT NOT NULL DEFAULT '',
+    website_domain TEXT NOT NULL DEFAULT '',
+    website_rdomain TEXT NOT NULL DEFAULT '',
+    email_domain TEXT NOT NULL DEFAULT '',
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    UNIQUE (source_teknokent, name_key)
+);
+CREATE INDEX IF NOT EXISTS companies_name_key ON companies (name_key);
+CREATE INDEX IF NOT EXISTS companies_website_domain ON companies (website_domain);
+CREATE INDEX IF NOT EXISTS companies_website_rdomain ON companies (website_rdomain);
+CREATE INDEX IF NOT EXISTS companies_email_domain ON companies (email_domain);
+"""
+
+COLUMNS = ("source_teknokent", "name_key", *FIELDS, "website_domain", "website_rdomain", "email_domain", "first_seen", "last_seen")
+
+# An empty value from a later crawl does not wipe out a known one
+UPSERT = f"""
+INSERT INTO companies ({", ".join(COLUMNS)}) VALUES ({", ".join("?" * len(COLUMNS))})
+ON CONFLICT (source_teknokent, name_key) DO UPDATE SET
+    {", ".join(f"{name} = COALESCE(NULLIF(excluded.{name}, ''), companies.{name})" for name in FIELDS)},
+    website_domain = COALESCE(NULLIF(excluded.website_domain, ''), companies.website_domain),
+    website_rdomain = COALESCE(NULLIF(excluded.website_rdomain, ''), companies.website_rdomain),
+    email_domain = COALESCE(NULLIF(excluded.email_domain, ''), companies.email_domain),
+    last_seen = excluded.last_seen
+"""
+
+
+def email_domain(mail):
+    mail = (mail or "").split(LIST_SEPARATOR, 1)[0].strip()
+    return mail.rpartition("@")[2].lower() if "@" in mail else ""
+
+
+def reverse_domain(domain):
+    return domain[::-1]
+
+
+def company_row(item, source, seen):
+    """Values for UPSERT, in COLUMNS order, or None for an item without a name"""
+    adapter = ItemAdapter(item)
+    values = {}
+    for name in FIELDS:
+        value = adapter.get(name) or ""
+        values[name] = LIST_SEPARATOR.join(map(str, value)) if isinstance(value, (list, tuple)) else str(value)
+    name_key = normalize_name(values["company_name"])
+    if not name_key:
+        return None
+    domain = website_domain(values["company_website"])
+    return (
+        source,
+        name_key,
+        *(values[name] for name in FIELDS),
+        domain,
+        reverse_domain(domain),
+        email_domain(values["company_contact_mail"]),
+        seen,
+        seen,
+    )
+
+
+class CompanyStore:
+    """The companies table of one SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode = WAL")
+        # Durable at checkpoints, which is plenty for data that can be crawled again
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("PRAGMA busy_timeout = 5000")
+        self.db.executescript(SCHEMA)
+        # Turkish lower case for search(area=...), so "SAVUNMA" matches "savunma"
+        self.db.create_function("area_key", 1, turkish_lower, deterministic=True)
+
+    def upsert(self, rows):
+        """Write a batch of company_row() values in one transaction"""
+        with self.db:
+            self.db.executemany(UPSERT, rows)
+
+    def search(self, domain_suffix=None, email_suffix=None, area=None, teknokent=None, name=None):
+        """Companies matching every given filter, as sqlite3.Row objects.
+
+        ``domain_suffix`` (".com.tr") and ``name`` (any spelling, normalised
+        like the stored keys) use the indexes; ``area`` is a case-insensitive
+        substring of company_area, checked on the rows the indexes left.
+        """
+        where, params = [], []
+        if domain_suffix:
+            prefix = reverse_domain(domain_suffix.lower().lstrip("."))
+            # rdomain = prefix (the domain itself) or starts with prefix + "."
+            where.append("(website_rdomain = ? OR (website_rdomain >= ? AND website_rdomain < ?))")
+            params += [prefix, prefix + ".", prefix + "/"]
+        if email_suffix:
+            where.append("(email_domain = ? OR email_domain LIKE ?)")
+            suffix = email_suffix.lower().lstrip(".@")
+            params += [suffix, f"%.{suffix}"]
+        if teknokent:
+            where.append("source_teknokent = ?")
+            params.append(teknokent)
+        if name:
+            where.append("name_key = ?")
+            params.append(normalize_name(name))
+        if area:
+            where.append("instr(area_key(company_area), ?) > 0")
+            params.append(turkish_lower(area))
+        sql = "SELECT * FROM companies"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.db.execute(sql + " ORDER BY company_name", params).fetchall()
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+
+class CompanyStorePipeline:
+    """Upsert items into the SQLite store in batches"""
+
+    def __init__(self, path, batch_size=200, stats=None):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.stats = stats
+        self.store = None
+        self.seen = None
+        self.rows = []
+        self.written = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("STORAGE_ENABLED", True):
+            raise NotConfigured
+        return cls(
+            settings.get("STORAGE_PATH", "outputs/companies.sqlite3"),
+            batch_size=settings.getint("STORAGE_BATCH_SIZE", 200),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        self.store = CompanyStore(self.path)
+        self.seen = datetime.now(tz=timezone.utc).replace(microsecond=0).isoformat()
+
+    def process_item(self, item, spider):
+        row = company_row(item, spider.name, self.seen)
+        if row is not None:
+            self.rows.append(row)
+            if len(self.rows) >= self.batch_size:
+                self.flush()
+        return item
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if not rows:
+            return
+        self.store.upsert(rows)
+        self.written += len(rows)
+        if self.stats is not None:
+            self.stats.inc_value("storage/rows", len(rows))
+            self.stats.inc_value("storage/transactions")
+
+    def close_spider(self, spider):
+        self.flush()
+        spider.logger.info(f"Upserted {self.written} companies into {self.path}")
+        self.store.close()
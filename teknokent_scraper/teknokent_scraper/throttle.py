@@ -0,0 +1,169 @@
+# Per-site adaptive throttling
+#
+# Every teknokent site gets a declared profile in THROTTLE_PROFILES (keyed by
+# domain, subdomains inherit it):
+#
+#   max_concurrency  upper bound for parallel requests to the site
+#   min_delay        floor for the delay between requests, in seconds
+#   max_delay        ceiling the delay may back off to, in seconds
+#   target_latency   responses slower than this (seconds) count as pressure
+#   randomize_delay  spread the delay between 0.5x and 1.5x like Scrapy does
+#
+# Each downloader slot starts at one request in flight and min_delay. Fast,
+# healthy responses raise the concurrency by one (additive increase) and
+# shorten the delay; slow responses lower it by one; 429 and 5xx answers halve
+# it and double the delay (multiplicative decrease). The profile and the
+# current values are kept in the crawl stats under throttle/<domain>/.
+#
+# Scrapy drops a downloader slot that has been idle for a minute and creates
+# a new one with the default settings on the next request; the adaptive
+# values are applied again whenever the slot of a key is a new object.
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+DEFAULT_PROFILE = {
+    "max_concurrency": 1,
+    "min_delay": 1.0,
+    "max_delay": 30.0,
+    "target_latency": 1.0,
+    "randomize_delay": False,
+}
+
+BACKOFF_STATUSES = frozenset({429, 500, 502, 503, 504, 520, 521, 522, 524})
+
+
+def profile_for(host, profiles, default=None):
+    """Profile for a host: exact match first, then its parent domains"""
+    base = dict(DEFAULT_PROFILE, **(default or {}))
+    host = (host or "").lower()
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        domain = ".".join(parts[i:])
+        if domain in profiles:
+            return domain, dict(base, **profiles[domain])
+    return host, base
+
+
+class SlotThrottle:
+    """Adaptive state for one downloader slot"""
+
+    def __init__(self, domain, profile):
+        self.domain = domain
+        self.profile = profile
+        self.concurrency = 1
+        self.peak_concurrency = 1
+        self.delay = profile["min_delay"]
+        self.successes = 0
+        self.responses = 0
+        self.backoffs = 0
+
+    def on_response(self, status, latency):
+        """Update concurrency and delay after a response, return True if they changed"""
+        profile = self.profile
+        self.responses += 1
+        old = (self.concurrency, self.delay)
+
+        if status in BACKOFF_STATUSES:
+            self.backoffs += 1
+            self.successes = 0
+            self.concurrency = max(1, self.concurrency // 2)
+            self.delay = min(profile["max_delay"], max(profile["min_delay"], self.delay * 2, 0.5))
+        elif latency is not None and latency > profile["target_latency"]:
+            self.successes = 0
+            self.concurrency = max(1, self.concurrency - 1)
+            self.delay = min(profile["max_delay"], max(profile["min_delay"], self.delay * 1.25))
+        else:
+            self.successes += 1
+            # One window of healthy responses at the current level before growing
+            if self.successes >= self.concurrency:
+                self.successes = 0
+                self.concurrency = min(profile["max_concurrency"], self.concurrency + 1)
+                self.delay = max(profile["min_delay"], self.delay * 0.75)
+
+        self.peak_concurrency = max(self.peak_concurrency, self.concurrency)
+        return (self.concurrency, self.delay) != old
+
+
+class AdaptiveThrottle:
+    """Apply THROTTLE_PROFILES to the downloader slots and adapt them at runtime"""
+
+    def __init__(self, crawler, profiles, default_profile):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.profiles = profiles
+        self.default_profile = default_profile
+        self.slots = {}
+        # key -> the downloader slot the values were last applied to
+        self.configured = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("THROTTLE_ENABLED", True):
+            raise NotConfigured
+        if settings.getbool("AUTOTHROTTLE_ENABLED"):
+            raise NotConfigured("AdaptiveThrottle and AutoThrottle both adjust slot delays")
+        ext = cls(
+            crawler,
+            profiles=settings.getdict("THROTTLE_PROFILES"),
+            default_profile=settings.getdict("THROTTLE_DEFAULT_PROFILE"),
+        )
+        crawler.signals.connect(ext.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(ext.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def downloader_slot(self, request):
+        key = request.meta.get("download_slot")
+        if key is None:
+            return None, None
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def request_reached_downloader(self, request, spider):
+        key, slot = self.downloader_slot(request)
+        if slot is None or self.configured.get(key) is slot:
+            return
+
+        throttle = self.slots.get(key)
+        if throttle is None:
+            domain, profile = profile_for(key, self.profiles, self.default_profile)
+            throttle = self.slots[key] = SlotThrottle(domain, profile)
+            prefix = f"throttle/{domain}"
+            self.stats.set_value(f"{prefix}/profile/max_concurrency", profile["max_concurrency"])
+            self.stats.set_value(f"{prefix}/profile/min_delay", profile["min_delay"])
+            self.stats.set_value(f"{prefix}/profile/target_latency", profile["target_latency"])
+            spider.logger.info(
+                f"Throttle profile for {key}: up to {profile['max_concurrency']} concurrent, "
+                f"min delay {profile['min_delay']}s, target latency {profile['target_latency']}s"
+            )
+        else:
+            self.stats.inc_value(f"throttle/{throttle.domain}/slots_recreated")
+
+        self.configured[key] = slot
+        if throttle.profile["randomize_delay"]:
+            if hasattr(slot, "jitter"):
+                slot.jitter = 0.5
+            else:
+                slot.randomize_delay = True
+        self.apply(slot, throttle)
+
+    def response_downloaded(self, response, request, spider):
+        key, slot = self.downloader_slot(request)
+        throttle = self.slots.get(key)
+        if slot is None or throttle is None:
+            return
+        if throttle.on_response(response.status, request.meta.get("download_latency")):
+            self.apply(slot, throttle)
+
+    def apply(self, slot, throttle):
+        slot.concurrency = throttle.concurrency
+        slot.delay = throttle.delay
+
+    def spider_closed(self, spider):
+        for throttle in self.slots.values():
+            prefix = f"throttle/{throttle.domain}"
+            self.stats.set_value(f"{prefix}/concurrency", throttle.concurrency)
+            self.stats.set_value(f"{prefix}/peak_concurrency", throttle.peak_concurrency)
+            self.stats.set_value(f"{prefix}/delay", round(throttle.delay, 3))
+            self.stats.set_value(f"{prefix}/backoffs", throttle.backoffs)
@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from teknokent_scraper.spiders.ankara_teknokent_comprehensive import AnkaraTeknokentComprehensiveSpider
+
+
+def test_failed_nonce_refresh_is_retried_then_given_up(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spider = get_crawler(AnkaraTeknokentComprehensiveSpider)._create_spider()
+
+    (refresh,) = spider.refresh_nonce([('SAVUNMA', 3)])
+    assert refresh.errback == spider.nonce_refresh_failed
+    # Another rejected page waits for the same refresh
+    assert list(spider.refresh_nonce([('SAVUNMA', 4)])) == []
+
+    for _ in range(spider.max_nonce_refreshes - 1):
+        failure = Failure(ConnectionRefusedError())
+        failure.request = refresh
+        (refresh,) = refresh.errback(failure)
+        assert isinstance(refresh, Request)
+
+    failure = Failure(ConnectionRefusedError())
+    failure.request = refresh
+    assert list(refresh.errback(failure)) == []
+    # Out of refreshes: the pages are kept (and logged), nothing is in flight
+    assert spider.checkpoint_state['nonce_pending'] == [('SAVUNMA', 3), ('SAVUNMA', 4)]
+    assert not spider.checkpoint_state['nonce_refreshing']
+
+
+def make_spider(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return get_crawler(AnkaraTeknokentComprehensiveSpider)._create_spider()
+
+
+def test_nonce_cache_is_written_and_read_back(tmp_path, monkeypatch):
+    spider = make_spider(tmp_path, monkeypatch)
+    assert spider.current_nonce() is None
+
+    spider.store_nonce('abc123')
+    assert os.path.exists(spider.nonce_cache_path)
+
+    # A new run finds it in the cache file
+    spider = make_spider(tmp_path, monkeypatch)
+    assert spider.current_nonce() == 'abc123'
+    assert spider.checkpoint_state['nonce'] == 'abc123'
+
+    spider.forget_nonce()
+    assert spider.current_nonce() is None
+    assert not os.path.exists(spider.nonce_cache_path)
+
+
+def test_stale_cached_nonce_is_ignored(tmp_path, monkeypatch):
+    spider = make_spider(tmp_path, monkeypatch)
+    spider.store_nonce('abc123')
+
+    spider = make_spider(tmp_path, monkeypatch)
+    spider.nonce_max_age = -1
+    assert spider.current_nonce() is None
+    # Without a nonce the crawl starts with a refresh for every category
+    (refresh,) = list(spider.start_requests())
+    assert refresh.callback == spider.parse_category_page
+    assert len(spider.checkpoint_state['nonce_pending']) == len(spider.CATEGORIES)
+
+
+def test_remaining_pages_are_requested_at_once(tmp_path, monkeypatch):
+    spider = make_spider(tmp_path, monkeypatch)
+
+    requests = list(spider.request_remaining_pages({'data': {'max_num_pages': 4}}, 'SAVUNMA', 'abc123'))
+    assert [r.meta['page'] for r in requests] == [1, 2, 3]
+    assert all(r.meta['nonce'] == 'abc123' and r.meta['category'] == 'SAVUNMA' for r in requests)
+    assert all('form_data%5Bpage%5D=' + str(r.meta['page']) in r.url for r in requests)
+
+    # Without max_num_pages the pagination markup gives the count
+    pagination = '<a data-page="1">1</a><a data-page="2">2</a>'
+    requests = list(spider.request_remaining_pages({'pagination': pagination}, 'SAVUNMA', 'abc123'))
+    assert [r.meta['page'] for r in requests] == [1]
+
+    assert list(spider.request_remaining_pages({'max_num_pages': 1}, 'SAVUNMA', 'abc123')) == []
+
+
+def test_listings_reissued_after_refresh_bypass_the_dupefilter(tmp_path, monkeypatch):
+    spider = make_spider(tmp_path, monkeypatch)
+    assert not spider.listings_request('SAVUNMA', 'abc123', 2).dont_filter
+
+    (refresh,) = spider.refresh_nonce([('SAVUNMA', 2)])
+    body = b'<script>var MyListing = {"ajax_nonce":"abc123"};</script>'
+    response = HtmlResponse(refresh.url, body=body, request=refresh)
+    (request,) = spider.parse_category_page(response)
+    # Same nonce as before, so the same URL: only dont_filter gets it through
+    assert request.url == spider.listings_request('SAVUNMA', 'abc123', 2).url
+    assert request.dont_filter
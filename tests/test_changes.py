@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.checkpoint import save_job_run
+from teknokent_scraper.changes import ChangeCapturePipeline, Snapshot, diff, summarize
+from teknokent_scraper.history import COMPLETE_MARKER
+from teknokent_scraper.items import CompanyDetailsItem
+
+
+class OdtuSpider(scrapy.Spider):
+    name = "odtu"
+
+
+BEFORE = [
+    {'company_name': 'Acme Savunma A.Ş.', 'company_phone': '0312 000 00 00', 'company_area': 'Savunma'},
+    {'company_name': 'Beta Yazılım', 'company_website': 'beta.com'},
+    {'company_name': 'Gamma Enerji'},
+    {'company_name': 'Gamma Enerji', 'company_location': 'Ankara'},
+]
+AFTER = [
+    CompanyDetailsItem(company_name='ACME SAVUNMA A.Ş.', company_phone='0312 111 11 11', company_area=['Savunma']),
+    CompanyDetailsItem(company_name='Gamma Enerji'),
+    CompanyDetailsItem(company_name='Delta Medikal'),
+    CompanyDetailsItem(company_name=''),
+]
+
+
+def test_diff_emits_only_the_deltas():
+    old, new = Snapshot(BEFORE), Snapshot(AFTER)
+    changes = list(diff(old, new))
+    by_key = {change['key']: change for change in changes}
+    assert [change['change'] for change in changes] == ['changed', 'added', 'removed', 'removed']
+    # Same key despite the different spelling; the area list is compared as text
+    assert by_key['acme savunma a s']['fields'] == {
+        'company_name': ['Acme Savunma A.Ş.', 'ACME SAVUNMA A.Ş.'],
+        'company_phone': ['0312 000 00 00', '0312 111 11 11'],
+    }
+    assert by_key['delta medikal']['record']['company_name'] == 'Delta Medikal'
+    assert by_key['gamma enerji#2']['record']['company_location'] == 'Ankara'
+    assert by_key['beta yazilim']['change'] == 'removed'
+
+    summary = summarize(changes, old, new)
+    assert summary == {
+        'before': 4, 'after': 3, 'added': 1, 'removed': 2, 'changed': 1, 'unchanged': 1,
+        'changed_fields': {'company_name': 1, 'company_phone': 1},
+    }
+
+
+def write_run(history_dir, run_time, items, finished=True):
+    run_dir = history_dir / 'odtu' / run_time
+    run_dir.mkdir(parents=True)
+    with open(run_dir / 'part-00001.jsonl', 'w', encoding='utf-8') as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    if finished:
+        (run_dir / COMPLETE_MARKER).write_text('{}')
+
+
+def test_pipeline_compares_with_the_previous_history_run(tmp_path):
+    history_dir, changes_dir = tmp_path / 'history', tmp_path / 'changes'
+    write_run(history_dir, '2025-01-30T06-00-00Z', BEFORE)
+    # A run that was killed half way is no baseline
+    write_run(history_dir, '2025-01-30T18-00-00Z', BEFORE[:1], finished=False)
+    # The run in progress writes its own history too, which is not compared
+    write_run(history_dir, '2025-01-31T06-00-00Z', [], finished=False)
+
+    crawler = get_crawler(OdtuSpider, {'CHANGES_HISTORY_DIR': str(history_dir), 'CHANGES_DIR': str(changes_dir)})
+    spider = crawler._create_spider()
+    crawler.stats.set_value('start_time', datetime.datetime(2025, 1, 31, 6, 0, tzinfo=datetime.timezone.utc))
+    pipeline = ChangeCapturePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    for item in AFTER:
+        assert pipeline.process_item(item, spider) is item
+    pipeline.spider_closed(spider, 'finished')
+
+    with open(changes_dir / 'odtu' / '2025-01-31T06-00-00Z.jsonl', encoding='utf-8') as f:
+        assert len(f.readlines()) == 4
+    with open(changes_dir / 'odtu' / '2025-01-31T06-00-00Z.summary.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['previous_run'] == '2025-01-30T06-00-00Z'
+    assert crawler.stats.get_value('changes/removed') == 2
+
+
+def test_first_run_has_nothing_to_compare(tmp_path):
+    crawler = get_crawler(OdtuSpider, {'CHANGES_HISTORY_DIR': str(tmp_path / 'history'), 'CHANGES_DIR': str(tmp_path / 'changes')})
+    spider = crawler._create_spider()
+    pipeline = ChangeCapturePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    pipeline.process_item(AFTER[0], spider)
+    pipeline.spider_closed(spider, 'finished')
+    assert not (tmp_path / 'changes').exists()
+
+
+def test_resumed_job_continues_its_run(tmp_path):
+    history_dir, changes_dir, jobdir = tmp_path / 'history', tmp_path / 'changes', tmp_path / 'job'
+    write_run(history_dir, '2025-01-30T06-00-00Z', BEFORE)
+    # The first attempt got as far as Acme and Gamma before it was stopped
+    started = datetime.datetime(2025, 1, 31, 6, 0, tzinfo=datetime.timezone.utc)
+    save_job_run(str(jobdir), started)
+    write_run(history_dir, '2025-01-31T06-00-00Z', [BEFORE[0], BEFORE[2]], finished=False)
+
+    crawler = get_crawler(OdtuSpider, {
+        'CHANGES_HISTORY_DIR': str(history_dir), 'CHANGES_DIR': str(changes_dir), 'JOBDIR': str(jobdir),
+    })
+    spider = crawler._create_spider()
+    crawler.stats.set_value('start_time', datetime.datetime(2025, 1, 31, 9, 0, tzinfo=datetime.timezone.utc))
+    pipeline = ChangeCapturePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    # The resumed attempt re-yields Gamma and crawls the rest
+    for item in BEFORE[1:]:
+        pipeline.process_item(item, spider)
+    pipeline.spider_closed(spider, 'finished')
+
+    with open(changes_dir / 'odtu' / '2025-01-31T06-00-00Z.summary.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['previous_run'] == '2025-01-30T06-00-00Z'
+    assert (summary['after'], summary['unchanged']) == (4, 4)
+
+
+def test_duplicate_names_do_not_depend_on_item_order():
+    assert list(diff(Snapshot(BEFORE), Snapshot(reversed(BEFORE)))) == []
+
+
+def test_run_cut_short_is_not_compared(tmp_path):
+    history_dir, changes_dir = tmp_path / 'history', tmp_path / 'changes'
+    write_run(history_dir, '2025-01-30T06-00-00Z', BEFORE)
+    crawler = get_crawler(OdtuSpider, {'CHANGES_HISTORY_DIR': str(history_dir), 'CHANGES_DIR': str(changes_dir)})
+    spider = crawler._create_spider()
+    crawler.stats.set_value('start_time', datetime.datetime(2025, 1, 31, 6, 0, tzinfo=datetime.timezone.utc))
+    pipeline = ChangeCapturePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    pipeline.process_item(AFTER[0], spider)
+    pipeline.spider_closed(spider, 'shutdown')
+    assert not changes_dir.exists()
@@ -0,0 +1,70 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.extensions.spiderstate import SpiderState
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.checkpoint import CheckpointMixin, end_job_run, job_run_started, save_job_run
+
+
+class CheckpointSpider(CheckpointMixin, scrapy.Spider):
+    name = "checkpoint"
+
+
+def test_jobdir_is_derived_from_checkpoint_dir(tmp_path):
+    crawler = get_crawler(CheckpointSpider, {'CHECKPOINT_DIR': str(tmp_path)})
+    assert crawler.settings.get('JOBDIR') == os.path.join(str(tmp_path), 'checkpoint')
+
+    # An explicit JOBDIR wins, and without CHECKPOINT_DIR there is none
+    crawler = get_crawler(CheckpointSpider, {'CHECKPOINT_DIR': str(tmp_path), 'JOBDIR': str(tmp_path / 'own')})
+    assert crawler.settings.get('JOBDIR') == str(tmp_path / 'own')
+    assert get_crawler(CheckpointSpider).settings.get('JOBDIR') is None
+
+
+def open_spider(settings):
+    """Spider of a new crawler with its state loaded like SpiderState does at spider_opened"""
+    crawler = get_crawler(CheckpointSpider, settings)
+    spider = crawler._create_spider()
+    extension = SpiderState.from_crawler(crawler)
+    extension.spider_opened(spider)
+    return spider, extension
+
+
+def test_persistent_state_survives_a_restart(tmp_path):
+    settings = {'CHECKPOINT_DIR': str(tmp_path)}
+    spider, extension = open_spider(settings)
+    spider.persistent('seen_ids', set).update({'a1', 'b2'})
+    spider.checkpoint_state['nonce'] = 'abc123'
+    extension.spider_closed(spider)
+
+    spider, _ = open_spider(settings)
+    assert spider.persistent('seen_ids', set) == {'a1', 'b2'}
+    assert spider.checkpoint_state['nonce'] == 'abc123'
+    # Keys not stored before are still created on first use
+    assert spider.persistent('page', int) == 0
+
+
+def test_state_without_jobdir_is_in_memory():
+    spider = get_crawler(CheckpointSpider)._create_spider()
+    spider.persistent('seen_ids', set).add('a1')
+    assert spider.checkpoint_state == {'seen_ids': {'a1'}}
+    assert get_crawler(CheckpointSpider)._create_spider().checkpoint_state == {}
+
+
+def test_job_run_is_kept_until_the_job_ends(tmp_path):
+    jobdir = str(tmp_path / 'job')
+    assert job_run_started(jobdir) is None
+
+    started = datetime(2024, 5, 1, 12, 30)
+    save_job_run(jobdir, started)
+    assert job_run_started(jobdir) == started
+
+    end_job_run(jobdir)
+    assert job_run_started(jobdir) is None
+    end_job_run(jobdir)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.coalesce import DetailCoalescingMiddleware
+from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.spiders.hacettepe_teknokent_spider import HacettepeSpider
+
+DETAIL_URL = "https://www.hacettepeteknokent.com.tr/tr/firma/acme"
+
+
+def listing_response(category):
+    body = f'<div class="firma"><div class="firma_adi"><a href="{DETAIL_URL}">ACME</a></div></div>'
+    url = HacettepeSpider.CATEGORIES[category]
+    return HtmlResponse(url, body=body.encode(), request=Request(url, meta={'category': category}))
+
+
+def test_detail_fetched_once_and_categories_merged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    crawler = get_crawler(HacettepeSpider)
+    spider = crawler._create_spider()
+    mw = DetailCoalescingMiddleware(crawler.stats)
+
+    def listing(category):
+        response = listing_response(category)
+        return list(mw.process_spider_output(response, spider.parse_category_page(response), spider))
+
+    requests = listing('YAZILIM') + listing('SAVUNMA') + listing('YAZILIM')
+    assert [r.url for r in requests] == [DETAIL_URL]
+    assert crawler.stats.get_value('coalesce/duplicate_fetches_avoided') == 2
+    # After the listings, so the categories are known when the details come in
+    assert requests[0].priority == DetailCoalescingMiddleware.DETAIL_PRIORITY
+
+    # The detail item goes out at once, with every category so far
+    detail = requests[0]
+    item = CompanyDetailsItem(company_name=['ACME'], company_area=['YAZILIM'])
+    response = HtmlResponse(DETAIL_URL, body=b'<html></html>', request=detail)
+    assert list(mw.process_spider_output(response, [item], spider)) == [item]
+    assert item['company_area'] == ['YAZILIM', 'SAVUNMA']
+
+    # A category seen only afterwards is reported
+    assert listing('SAVUNMA') + listing('ENERJI') == []
+    assert crawler.stats.get_value('coalesce/late_categories') == 1
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse, Request
+
+from teknokent_scraper.contacts import extract_contacts, is_valid_website_url
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture_response(site, name, meta=None):
+    url = f"https://example.org/{site}/{name}"
+    with open(os.path.join(FIXTURES, site, name), 'rb') as f:
+        body = f.read()
+    return HtmlResponse(url, body=body, encoding='utf-8', request=Request(url, meta=meta or {}))
+
+
+def html_response(body):
+    return HtmlResponse("https://example.org/firma", body=body.encode(), encoding='utf-8')
+
+
+def test_mailto_and_website_links():
+    contacts = extract_contacts(fixture_response('ankara', 'detail_aselsis.html'))
+    assert contacts['emails'] == ['info@aselsis.com.tr']
+    # Navigation, footer and social links are not company websites
+    assert contacts['websites'] == ['https://www.aselsis.com.tr']
+    assert contacts['phones'] == ['0312 555 12 34']
+    assert contacts['description'].startswith('Ar-ge')
+
+
+@pytest.mark.parametrize('markup, email', [
+    ('<p>iletisim [at] firma [dot] com</p>', 'iletisim@firma.com'),
+    ('<p>info(at)firma.com.tr</p>', 'info@firma.com.tr'),
+    ('<p>destek&amp;#64;firma&amp;#46;com.tr</p>', 'destek@firma.com.tr'),
+    ('<p>satis &#64; firma.com</p>', 'satis@firma.com'),
+    ('<span data-email="ik@firma.com.tr">E-posta</span>', 'ik@firma.com.tr'),
+    ('<a href="mailto:bilgi@firma.com?subject=Merhaba">Yazın</a>', 'bilgi@firma.com'),
+])
+def test_email_obfuscation(markup, email):
+    assert extract_contacts(html_response(f'<html><body>{markup}</body></html>'))['emails'] == [email]
+
+
+def test_early_exit_skips_text_search():
+    page = html_response(
+        '<html><body><a href="mailto:info@firma.com">info</a><p>Eski adres: eski@firma.com</p></body></html>'
+    )
+    assert extract_contacts(page)['emails'] == ['info@firma.com']
+    assert extract_contacts(page, early_exit=False)['emails'] == ['eski@firma.com', 'info@firma.com']
+
+
+def test_phone_elements_win_over_page_text():
+    contacts = extract_contacts(fixture_response('hacettepe', 'detail_biyonik.html'))
+    # The fax and footer numbers are only found by the text scan
+    assert contacts['phones'] == ['0312 297 10 20']
+    assert contacts['websites'] == ['http://www.biyonik.com.tr']
+
+
+def test_only_requested_fields():
+    contacts = extract_contacts(fixture_response('hacettepe', 'detail_kuantum.html'), fields=('emails',))
+    assert contacts == {'websites': [], 'emails': ['kuantum@kuantumyazilim.com'], 'phones': [], 'description': None}
+
+
+def test_is_valid_website_url():
+    assert is_valid_website_url('https://firma.com.tr')
+    assert not is_valid_website_url('https://www.linkedin.com/company/firma')
+    assert not is_valid_website_url('mailto:info@firma.com')
+    assert not is_valid_website_url('/tr/iletisim')
+
+
+def test_spiders_use_the_shared_extraction():
+    from teknokent_scraper.spiders.ankara_teknokent_comprehensive import AnkaraTeknokentComprehensiveSpider
+    from teknokent_scraper.spiders.hacettepe_teknokent_spider import HacettepeSpider
+
+    meta = {'company_name': 'Veritas', 'company_phone': ['0312 444 55 66'], 'company_url': 'u', 'category': 'YAZILIM'}
+    [item] = AnkaraTeknokentComprehensiveSpider().parse_company_detail(
+        fixture_response('ankara', 'detail_veritas.html', meta)
+    )
+    assert item['company_contact_mail'] == ['iletisim@veritas-analitik.com']
+    assert item['company_phone'] == ['0312 444 55 66']
+
+    [item] = HacettepeSpider().parse_company_detail(fixture_response('hacettepe', 'detail_enerjitek.html', meta))
+    assert item['company_contact_mail'] == ['bilgi@enerjitek.com.tr']
+    assert item['company_phone'] == ['+90 312 888 77 66']
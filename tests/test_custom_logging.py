@@ -0,0 +1,78 @@
+import os
+import sys
+import logging
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from custom_logging.logger import SamplingFilter, SinkHandler
+
+
+def make_record(msg, level=logging.INFO, lineno=10, spider=None, name="teknokent_scraper.pipelines"):
+    record = logging.LogRecord(name, level, "pipelines.py", lineno, msg, None, None)
+    if spider is not None:
+        record.spider = spider
+    return record
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampling_per_call_site():
+    clock = FakeClock()
+    sampler = SamplingFilter(burst=3, interval=60, clock=clock)
+    passed = [sampler.filter(make_record(f"Processed item {i}")) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    # Another call site has its own budget, warnings are never sampled
+    assert sampler.filter(make_record("Other line", lineno=20))
+    assert all(sampler.filter(make_record("Dropped", level=logging.WARNING)) for _ in range(10))
+
+    clock.now = 61
+    record = make_record("Processed item 10")
+    assert sampler.filter(record)
+    assert record.getMessage() == "Processed item 10 [7 similar messages suppressed]"
+
+
+def test_sink_per_spider_and_component(tmp_path):
+    class Spider:
+        name = "itu"
+
+    handler = SinkHandler(str(tmp_path))
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.handle(make_record("from the spider", spider=Spider()))
+    handler.handle(make_record("from the pipeline"))
+    handler.handle(make_record("from the inbox", name="email_automation.inbox_scraper"))
+    handler.close()
+
+    assert (tmp_path / 'spiders' / 'itu.log').read_text() == "from the spider\n"
+    assert (tmp_path / 'components' / 'teknokent_scraper.log').read_text() == "from the pipeline\n"
+    assert (tmp_path / 'components' / 'email_automation.log').read_text() == "from the inbox\n"
+
+
+def test_lazy_configuration_and_queued_output(tmp_path):
+    # A fresh interpreter: the module keeps one listener per process
+    script = (
+        "import os, logging, custom_logging\n"
+        "assert not os.path.exists('logs'), 'import created the log directory'\n"
+        "assert not logging.getLogger().handlers\n"
+        "from custom_logging.logger import logger\n"
+        "assert not os.path.exists('logs'), 'getting the logger created the log directory'\n"
+        "custom_logging.configure(stdout=False, sample_burst=5)\n"
+        "for i in range(50):\n"
+        "    logger.info(f'Processed item {i}')\n"
+        "logger.error('boom')\n"
+        "custom_logging.stop()\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+    subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, check=True)
+
+    lines = (tmp_path / 'logs' / 'logging.log').read_text().splitlines()
+    assert len(lines) == 6
+    assert "ERROR" in lines[-1]
+    assert (tmp_path / 'logs' / 'components' / 'teknokent-scraper-logger.log').exists()
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.dedup import CompanyDedupPipeline, CompanyIndex, normalize_name, website_domain
+from teknokent_scraper.items import CompanyDetailsItem
+
+
+class OdtuSpider(scrapy.Spider):
+    name = "odtu"
+
+
+class HacettepeSpider(scrapy.Spider):
+    name = "hacettepe"
+
+
+def test_key_normalisation():
+    assert normalize_name("  ACME Yazılım\xa0A.Ş. ") == "acme yazilim a s"
+    assert normalize_name("İLERİ Teknoloji") == normalize_name("ileri teknoloji")
+    assert website_domain("https://www.Acme.com.tr/iletisim") == "acme.com.tr"
+    assert website_domain("acme.com.tr; https://other.com") == "acme.com.tr"
+    assert website_domain("") == ""
+
+
+def test_merges_by_name_and_domain():
+    index = CompanyIndex(":memory:")
+    assert index.add({'company_name': 'Acme Yazılım', 'company_website': 'http://acme.com.tr'}, 'odtu')
+    assert not index.add({'company_name': 'ACME YAZILIM', 'company_website': 'https://www.acme.com.tr',
+                          'company_phone': '0312 555 12 34'}, 'hacettepe')
+    # Same name, another domain: another company
+    assert index.add({'company_name': 'Acme Yazılım', 'company_website': 'https://acme.io'}, 'itu')
+    # No website: joins the first record of that name
+    assert not index.add({'company_name': 'Acme Yazilim'}, 'gazi')
+
+    records = list(index.records())
+    assert len(records) == 2
+    assert records[0]['sources'] == ['odtu', 'hacettepe', 'gazi']
+    assert records[0]['company_phone'] == '0312 555 12 34'
+    assert records[0]['company_website'] == 'http://acme.com.tr'
+    assert records[1]['sources'] == ['itu']
+
+
+def test_website_claims_a_record_without_one():
+    index = CompanyIndex(":memory:")
+    index.add({'company_name': 'Beta Ar-Ge'}, 'bilkent')
+    assert not index.add({'company_name': 'Beta AR-GE', 'company_website': 'beta.com'}, 'odtu')
+    assert not index.add({'company_name': 'Beta Ar-Ge', 'company_website': 'www.beta.com'}, 'gazi')
+    assert index.add({'company_name': 'Beta Ar-Ge', 'company_website': 'beta.org'}, 'itu')
+    assert [r['sources'] for r in index.records()] == [['bilkent', 'odtu', 'gazi'], ['itu']]
+
+
+def test_pipeline_shares_the_index_between_crawlers(tmp_path):
+    settings = {
+        'DEDUP_DB': str(tmp_path / 'dedup.sqlite3'),
+        'DEDUP_OUTPUT': str(tmp_path / 'canonical.jsonl'),
+    }
+    pipelines = {}
+    for spidercls in (OdtuSpider, HacettepeSpider):
+        crawler = get_crawler(spidercls, settings)
+        crawler.spider = crawler._create_spider()
+        pipelines[spidercls.name] = (crawler, CompanyDedupPipeline.from_crawler(crawler))
+    assert pipelines['odtu'][1].index is pipelines['hacettepe'][1].index
+
+    for name, (crawler, pipeline) in pipelines.items():
+        item = CompanyDetailsItem(company_name='Gamma Enerji', company_website='gamma.com.tr')
+        assert pipeline.process_item(item, crawler.spider) is item
+        pipeline.spider_closed(crawler.spider, 'finished')
+
+    lines = (tmp_path / 'canonical.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['sources'] for line in lines] == [['odtu', 'hacettepe']]
+    assert pipelines['odtu'][0].stats.get_value('dedup/unique') == 1
+    assert pipelines['hacettepe'][0].stats.get_value('dedup/merged') == 1
+
+
+def test_index_is_kept_across_processes(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite3')
+    index = CompanyIndex(path)
+    index.add({'company_name': 'Acme Yazılım', 'company_website': 'acme.com.tr'}, 'odtu')
+    index.add({'company_name': 'Beta Ar-Ge'}, 'bilkent')
+    index.write(str(tmp_path / 'canonical.jsonl'))
+
+    # Another process, e.g. the next spider of run-sequential
+    index = CompanyIndex(path)
+    assert not index.add({'company_name': 'ACME YAZILIM', 'company_website': 'www.acme.com.tr'}, 'hacettepe')
+    assert not index.add({'company_name': 'Beta AR-GE', 'company_website': 'beta.com'}, 'odtu')
+    assert [r['sources'] for r in index.records()] == [['odtu', 'hacettepe'], ['bilkent', 'odtu']]
+
+    assert len(CompanyIndex(path, rebuild=True)) == 0
+
+
+def test_later_runs_update_and_drop_records(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite3')
+    index = CompanyIndex(path)
+    index.add({'company_name': 'Acme Yazılım', 'company_phone': '0312 000 00 00'}, 'odtu', 'run-1')
+    index.add({'company_name': 'Beta Ar-Ge'}, 'odtu', 'run-1')
+    index.add({'company_name': 'Beta Ar-Ge'}, 'bilkent', 'run-1')
+    index.add({'company_name': 'Gamma Enerji'}, 'odtu', 'run-1')
+    index.db.commit()
+
+    index = CompanyIndex(path)
+    index.add({'company_name': 'Acme Yazılım', 'company_phone': '0312 111 11 11'}, 'odtu', 'run-2')
+    # Only the first item of the run overwrites, later ones fill gaps
+    index.add({'company_name': 'Acme Yazılım', 'company_phone': '0312 222 22 22'}, 'gazi', 'run-2')
+    assert index.prune('odtu', 'run-2') == 1
+    records = {r['company_name']: r for r in index.records()}
+    assert records['Acme Yazılım']['company_phone'] == '0312 111 11 11'
+    # Beta is still listed by bilkent, Gamma by nobody
+    assert records['Beta Ar-Ge']['sources'] == ['bilkent']
+    assert 'Gamma Enerji' not in records
+    assert index.add({'company_name': 'Gamma Enerji'}, 'odtu', 'run-2')
+
+
+def test_run_cut_short_drops_nothing(tmp_path):
+    settings = {'DEDUP_DB': str(tmp_path / 'dedup.sqlite3'), 'DEDUP_OUTPUT': str(tmp_path / 'canonical.jsonl')}
+    crawler = get_crawler(OdtuSpider, settings)
+    spider = crawler._create_spider()
+    pipeline = CompanyDedupPipeline(CompanyIndex(settings['DEDUP_DB']), settings['DEDUP_OUTPUT'], crawler.stats)
+    pipeline.index.add({'company_name': 'Gamma Enerji'}, 'odtu', 'an-earlier-run')
+    pipeline.process_item(CompanyDetailsItem(company_name='Acme'), spider)
+    pipeline.spider_closed(spider, 'shutdown')
+    assert len((tmp_path / 'canonical.jsonl').read_text(encoding='utf-8').splitlines()) == 2
+    pipeline.spider_closed(spider, 'finished')
+    assert len((tmp_path / 'canonical.jsonl').read_text(encoding='utf-8').splitlines()) == 1
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.download_metrics import (
+    EVENT_HANDLER_KEY,
+    NETWORK_TIME_KEY,
+    DownloadMetricsMiddleware,
+    LatencyHistogram,
+)
+
+
+class MetricsSpider(scrapy.Spider):
+    name = "metrics"
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    crawler = get_crawler(MetricsSpider, {'DOWNLOAD_METRICS_REPORT': str(tmp_path / '%(name)s.json')})
+    crawler.spider = crawler._create_spider()
+    return crawler
+
+
+def download(mw, spider, url, latency, status=200, body=b'<html></html>', flags=None, network=None, **meta):
+    request = Request(url, meta=meta)
+    mw.process_request(request, spider)
+    request.meta['download_latency'] = latency
+    if network is not None:
+        request.meta[NETWORK_TIME_KEY] = network
+    response = HtmlResponse(url, status=status, body=body, flags=flags, request=request)
+    return request, mw.process_response(request, response, spider)
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.count == 1000
+    for percent in (50, 90, 99):
+        value = histogram.percentile(percent)
+        assert percent / 100 <= value <= percent / 100 * 1.1
+    assert histogram.percentile(100) == 1.0
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_records_http_and_playwright_per_domain(crawler, tmp_path):
+    mw = DownloadMetricsMiddleware.from_crawler(crawler)
+    spider = crawler.spider
+    download(mw, spider, "https://a.example/1", 0.05, body=b'x' * 100)
+    download(mw, spider, "https://a.example/2", 0.15, status=503, body=b'x' * 300)
+    download(mw, spider, "https://a.example/2", 0.05, retry_times=1)
+    request, _ = download(mw, spider, "https://b.example/", 2.0, flags=['playwright'], network=0.5, playwright=True)
+    # The page handler is gone once the response is back
+    assert EVENT_HANDLER_KEY not in request.meta
+    download(mw, spider, "https://b.example/cached", 0.01, flags=['archived'])
+    mw.spider_closed(spider, 'finished')
+
+    report = json.loads((tmp_path / 'metrics.json').read_text())
+    a = report['domains']['a.example']
+    assert (a['requests'], a['responses'], a['retries']) == (3, 3, 1)
+    assert a['status'] == {'200': 2, '503': 1}
+    assert a['max_bytes'] == 300
+    assert a['latency']['http']['count'] == 3
+    b = report['domains']['b.example']
+    assert b['responses'] == 1
+    assert set(b['latency']) == {'playwright_network', 'playwright_render', 'playwright_total'}
+    assert b['latency']['playwright_render']['max_ms'] == 1500.0
+
+    stats = crawler.stats
+    assert stats.get_value('download_metrics/a.example/retries') == 1
+    assert stats.get_value('download_metrics/b.example/playwright_total/p50_ms') == 2000.0
+
+
+def test_playwright_requests_get_a_page_handler(crawler):
+    mw = DownloadMetricsMiddleware.from_crawler(crawler)
+
+    def own_handler(response):
+        pass
+
+    request = Request("https://b.example/", meta={'playwright': True, EVENT_HANDLER_KEY: {'response': own_handler}})
+    mw.process_request(request, crawler.spider)
+    handler = request.meta[EVENT_HANDLER_KEY]['requestfinished']
+
+    class Frame:
+        parent_frame = None
+
+    class PlaywrightRequest:
+        frame = Frame()
+        timing = {'startTime': 0, 'responseEnd': 420.0}
+
+        def is_navigation_request(self):
+            return True
+
+    handler(PlaywrightRequest())
+    assert request.meta[NETWORK_TIME_KEY] == 0.42
+
+    mw.process_exception(request, TimeoutError(), crawler.spider)
+    assert request.meta[EVENT_HANDLER_KEY] == {'response': own_handler}
+    assert mw.domains['b.example'].exceptions == {'TimeoutError': 1}
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("numpy")
+from utils.entity_resolution import canonical_name, resolve
+
+
+def test_legal_forms_are_stripped():
+    assert canonical_name("3DTİM ELEKTRONİK ANONİM ŞİRKETİ") == "3dtim elektronik"
+    assert canonical_name("3DTIM Elektronik A.Ş.") == "3dtim elektronik"
+    assert canonical_name("Acme Yazılım San. ve Tic. Ltd. Şti.") == "acme yazilim"
+    # Only from the end, and never the whole name
+    assert canonical_name("AS Ve Ortakları") == "as ve ortaklari"
+    assert canonical_name("A.Ş.") == "a"
+
+
+def test_clusters_with_confidence():
+    names = [
+        "3DTİM ELEKTRONİK ANONİM ŞİRKETİ",
+        "Beta Enerji Ltd. Şti.",
+        "3DTIM Elektronik A.Ş.",
+        "Gamma Savunma Sistemleri A.Ş.",
+        "Gama Savunma Sistemleri",
+        "Beta Medikal",
+    ]
+    clusters = {tuple(cluster["members"]): cluster for cluster in resolve(names)}
+    assert set(clusters) == {(0, 2), (1,), (3, 4), (5,)}
+    assert clusters[(0, 2)]["confidence"] == 1.0
+    assert clusters[(0, 2)]["canonical_name"] == "3dtim elektronik"
+    assert 0.7 <= clusters[(3, 4)]["confidence"] < 1.0
+
+
+def test_many_names_stay_apart():
+    names = [f"Firma {i:05d} Bilişim A.Ş." for i in range(3000)]
+    names.append("FİRMA 01234 BİLİŞİM ANONİM ŞİRKETİ")
+    clusters = resolve(names)
+    assert len(clusters) == 3000
+    assert [c["members"] for c in clusters if len(c["members"]) > 1] == [[1234, 3000]]
+
+
+def test_merge_keeps_one_row_per_company():
+    pd = pytest.importorskip("pandas")
+    from utils.merge_csv_files import resolve_companies
+
+    df = pd.DataFrame({
+        'company_name': ["3DTİM ELEKTRONİK ANONİM ŞİRKETİ", "3DTIM Elektronik A.Ş.", "Beta Enerji"],
+        'company_location': ["Ankara", "İzmir", "Ankara"],
+        'source_teknokent': ["ODTU", "EGE_TEKNOKENT", "ODTU"],
+    })
+    resolved = resolve_companies(df)
+    assert list(resolved['company_name']) == ["3DTİM ELEKTRONİK ANONİM ŞİRKETİ", "Beta Enerji"]
+    assert list(resolved['source_teknokent']) == ["ODTU; EGE_TEKNOKENT", "ODTU"]
+    assert list(resolved['match_confidence']) == [1.0, 1.0]
+
+
+def test_merge_reads_csv_only_for_teknokents_missing_from_parquet(tmp_path):
+    pytest.importorskip("pandas")
+    from utils.merge_csv_files import csv_files_to_merge
+
+    for directory in ("ODTU", "EGE_TEKNOKENT"):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "companies.csv").write_text("company_name\nAcme\n")
+    files = csv_files_to_merge(str(tmp_path), {"ODTU"})
+    assert files == [str(tmp_path / "EGE_TEKNOKENT" / "companies.csv")]
@@ -0,0 +1,70 @@
+import os
+import sys
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+pytest.importorskip("pyarrow")
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.exporters import ParquetItemExporter, read_companies, uri_params
+from teknokent_scraper.items import CompanyDetailsItem
+
+
+class ItuSpider(scrapy.Spider):
+    name = "itu"
+
+
+def export(path, items, **kwargs):
+    with open(path, 'wb') as f:
+        exporter = ParquetItemExporter(f, **kwargs)
+        exporter.start_exporting()
+        for item in items:
+            exporter.export_item(item)
+        exporter.finish_exporting()
+        # The feed storage closes the file, not the exporter
+        assert not f.closed
+
+
+def test_row_groups_and_types(tmp_path):
+    items = [
+        CompanyDetailsItem(company_name=f"Firma {i}", company_location="Ankara", company_area=["Yazılım", "Savunma"])
+        for i in range(25)
+    ]
+    items.append({'company_name': 'Dict', 'company_phone': 312})
+    path = tmp_path / 'companies.parquet'
+    export(path, items, row_group_size=10)
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.num_rows == 26
+    assert str(table.schema.field('company_location').type) == 'dictionary<values=string, indices=int32, ordered=0>'
+    assert table.schema.field('scraped_at').type.tz == 'UTC'
+    rows = table.to_pylist()
+    assert rows[0]['company_area'] == 'Yazılım; Savunma'
+    assert rows[-1]['company_phone'] == '312'
+    assert rows[-1]['company_location'] is None
+
+
+def test_partitioned_feed_reads_back_as_one_table(tmp_path):
+    crawler = get_crawler(ItuSpider)
+    spider = crawler._create_spider()
+    params = uri_params({'name': spider.name}, spider)
+    assert params['teknokent'] == 'itu'
+
+    for teknokent, run_date, count in (('itu', '2025-01-30', 3), ('itu', params['run_date'], 2), ('odtu', '2025-01-30', 4)):
+        partition = tmp_path / f'teknokent={teknokent}' / f'run_date={run_date}'
+        partition.mkdir(parents=True)
+        export(partition / 'companies.parquet', [{'company_name': f'{teknokent} {i}'} for i in range(count)])
+
+    table = read_companies(str(tmp_path))
+    assert table.num_rows == 9
+    assert str(table.schema.field('run_date').type) == 'date32[day]'
+    latest = read_companies(str(tmp_path), columns=['company_name'], filter=ds.field('run_date') > datetime.date(2025, 1, 30))
+    assert sorted(latest.column('company_name').to_pylist()) == ['itu 0', 'itu 1']
@@ -0,0 +1,110 @@
+import os
+import sys
+import gzip
+import json
+import asyncio
+import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper import history
+from teknokent_scraper.history import RotatingFeedExporter, iter_history
+
+
+class ItuSpider(scrapy.Spider):
+    name = "itu"
+
+
+STARTED = datetime.datetime(2025, 1, 31, 6, 0, tzinfo=datetime.timezone.utc)
+
+
+def crawl(tmp_path, items, postprocessing, extension, reason=None, **feed_options):
+    """Feed ``items`` through a RotatingFeedExporter writing under tmp_path"""
+    uri = str(tmp_path / f'%(name)s/%(run_time)s/part-%(batch_id)05d.jsonl{extension}')
+    crawler = get_crawler(ItuSpider, {
+        'FEEDS': {uri: {'format': 'jsonlines', 'postprocessing': postprocessing, **feed_options}},
+        'FEED_URI_PARAMS': 'teknokent_scraper.exporters.uri_params',
+    })
+    spider = crawler._create_spider()
+    crawler.stats.set_value('start_time', STARTED)
+
+    async def run():
+        exporter = RotatingFeedExporter.from_crawler(crawler)
+        exporter.open_spider(spider)
+        for item in items:
+            exporter.item_scraped(item, spider)
+        await exporter.close_spider(spider, reason)
+
+    asyncio.run(run())
+    return sorted(os.listdir(tmp_path / 'itu' / '2025-01-31T06-00-00Z'))
+
+
+def company(i):
+    # Random descriptions, so the compressed size grows with the item count
+    return {'company_name': f'Firma {i}', 'company_desc': os.urandom(40).hex()}
+
+
+def test_rotates_by_size_and_reads_back_in_order(tmp_path):
+    if history.zstd is None:
+        pytest.skip("zstd needs Python 3.14+ or backports.zstd")
+    items = [company(i) for i in range(5000)]
+    parts = crawl(tmp_path, items, ['teknokent_scraper.history.ZstdPlugin'], '.zst', batch_max_bytes=100_000)
+    assert parts[0] == 'part-00001.jsonl.zst'
+    assert len(parts) >= 2
+    with open(tmp_path / 'itu' / '2025-01-31T06-00-00Z' / parts[0], 'rb') as f:
+        assert f.read(4) == b'\x28\xb5\x2f\xfd'  # zstd frame magic
+    assert list(iter_history(str(tmp_path))) == items
+
+
+def test_rotates_by_age(tmp_path, monkeypatch):
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(history, 'monotonic', lambda: next(clock))
+    items = [company(i) for i in range(5)]
+    # Every part is 10 "seconds" old by the time its first item is written
+    parts = crawl(tmp_path, items, ['scrapy.extensions.postprocessing.GzipPlugin'], '.gz', batch_max_seconds=5)
+    assert parts == [f'part-0000{i}.jsonl.gz' for i in range(1, 6)]
+    with gzip.open(tmp_path / 'itu' / '2025-01-31T06-00-00Z' / parts[0], 'rt', encoding='utf-8') as f:
+        assert json.loads(f.readline()) == items[0]
+    assert list(iter_history(str(tmp_path / 'itu'))) == items
+
+
+def test_project_feeds_use_the_history_feed():
+    from teknokent_scraper import settings
+
+    assert history.HISTORY_FEED.items() <= settings.FEEDS.items()
+
+
+def test_rotation_needs_a_batch_parameter(tmp_path):
+    crawler = get_crawler(ItuSpider, {
+        'FEEDS': {str(tmp_path / 'history.jsonl'): {'format': 'jsonlines', 'batch_max_seconds': 60}},
+    })
+    with pytest.raises(scrapy.exceptions.NotConfigured):
+        RotatingFeedExporter.from_crawler(crawler)
+
+
+def test_unfinished_attempts_are_continued_and_the_finished_run_is_marked(tmp_path):
+    gz = ['scrapy.extensions.postprocessing.GzipPlugin']
+    items = [company(i) for i in range(4)]
+    marker = {'complete_marker': history.COMPLETE_MARKER}
+    # Killed: no marker, and the next attempt does not append to its part
+    assert crawl(tmp_path, items[:2], gz, '.gz', reason='shutdown', **marker) == ['part-00001.jsonl.gz']
+    parts = crawl(tmp_path, items[2:], gz, '.gz', reason='finished', **marker)
+    assert parts == ['_COMPLETE', 'part-00001.jsonl.gz', 'part-00002.jsonl.gz']
+    assert history.is_complete(str(tmp_path / 'itu' / '2025-01-31T06-00-00Z'))
+    assert list(iter_history(str(tmp_path))) == items
+
+
+def test_a_part_cut_short_does_not_stop_the_reading(tmp_path):
+    run_dir = tmp_path / 'itu' / '2025-01-31T06-00-00Z'
+    run_dir.mkdir(parents=True)
+    items = [company(i) for i in range(200)]
+    data = gzip.compress(''.join(json.dumps(item) + '\n' for item in items).encode())
+    (run_dir / 'part-00001.jsonl.gz').write_bytes(data[:len(data) // 2])
+    (run_dir / 'part-00002.jsonl.gz').write_bytes(gzip.compress(json.dumps(items[0]).encode() + b'\n'))
+    # The next part is still read
+    assert list(iter_history(str(run_dir)))[-1:] == items[:1]
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.incremental import (
+    FingerprintStore,
+    IncrementalDownloaderMiddleware,
+    IncrementalSpiderMiddleware,
+)
+from teknokent_scraper.items import CompanyDetailsItem
+
+DETAIL_URL = "https://example.org/firma/acme"
+
+
+class DetailSpider(scrapy.Spider):
+    name = "detail"
+
+    def parse(self, response):
+        self.parsed += 1
+        yield CompanyDetailsItem(company_name=response.css('h1::text').get())
+
+
+def crawl_detail(store_path, body, status=200, headers=None, extra=None):
+    """Push one detail request through both middlewares, return (items, spider, request)"""
+    crawler = get_crawler(DetailSpider)
+    spider = crawler._create_spider()
+    spider.parsed = 0
+    store = FingerprintStore(store_path)
+    downloader_mw = IncrementalDownloaderMiddleware(store, crawler.stats)
+    spider_mw = IncrementalSpiderMiddleware(store, crawler.stats)
+
+    request = Request(DETAIL_URL, callback=spider.parse, meta={'fingerprint_key': DETAIL_URL, 'fingerprint_extra': extra})
+    downloader_mw.process_request(request, spider)
+    response = HtmlResponse(DETAIL_URL, status=status, body=body, headers=headers, request=request)
+    response = downloader_mw.process_response(request, response, spider)
+    items = list(spider_mw.process_spider_output(response, spider.parse(response), spider))
+    store.save()
+    return items, spider, request
+
+
+def test_unchanged_page_reuses_previous_item(tmp_path):
+    store_path = str(tmp_path / "detail.json")
+    body = b"<h1>ACME</h1><script>var nonce = 'a1';</script>"
+
+    items, spider, _ = crawl_detail(store_path, body, headers={'ETag': '"v1"'})
+    assert [i['company_name'] for i in items] == ['ACME']
+    assert spider.parsed == 1
+
+    # Same content, different nonce: the callback is skipped
+    items, spider, request = crawl_detail(store_path, body.replace(b"a1", b"b2"))
+    assert request.headers['If-None-Match'] == b'"v1"'
+    assert [i['company_name'] for i in items] == ['ACME']
+    assert spider.parsed == 0
+
+
+def test_not_modified_reuses_previous_item(tmp_path):
+    store_path = str(tmp_path / "detail.json")
+    crawl_detail(store_path, b"<h1>ACME</h1>", headers={'ETag': '"v1"'})
+
+    items, spider, request = crawl_detail(store_path, b"", status=304)
+    assert 304 in request.meta['handle_httpstatus_list']
+    assert [i['company_name'] for i in items] == ['ACME']
+    assert spider.parsed == 0
+
+
+def test_changed_page_is_parsed_again(tmp_path):
+    store_path = str(tmp_path / "detail.json")
+    crawl_detail(store_path, b"<h1>ACME</h1>")
+
+    items, spider, _ = crawl_detail(store_path, b"<h1>ACME Teknoloji</h1>")
+    assert [i['company_name'] for i in items] == ['ACME Teknoloji']
+    assert spider.parsed == 1
+
+
+def test_changed_listing_fields_are_parsed_again(tmp_path):
+    store_path = str(tmp_path / "detail.json")
+    crawl_detail(store_path, b"<h1>ACME</h1>", headers={'ETag': '"v1"'}, extra=['ACME', ['0312 000 00 00']])
+
+    items, spider, request = crawl_detail(store_path, b"<h1>ACME</h1>", extra=['ACME', ['0312 000 00 00']])
+    assert spider.parsed == 0
+
+    # Same detail page, new phone number on the listing: no conditional
+    # request, and the callback runs to pick the number up
+    items, spider, request = crawl_detail(store_path, b"<h1>ACME</h1>", extra=['ACME', ['0312 111 11 11']])
+    assert 'If-None-Match' not in request.headers
+    assert spider.parsed == 1
+
+    items, spider, _ = crawl_detail(store_path, b"<h1>ACME</h1>", extra=['ACME', ['0312 111 11 11']])
+    assert spider.parsed == 0
@@ -0,0 +1,40 @@
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.spiders.itu_teknokent_spider import ItuTeknokentSpider
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'itu')
+
+
+def listing_response(filename, page):
+    with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+        body = f.read()
+    url = f"{ItuTeknokentSpider.start_urls[0]}?page={page}"
+    return HtmlResponse(url, body=body, encoding='utf-8')
+
+
+def test_each_company_id_gets_one_detail_request():
+    spider = get_crawler(ItuTeknokentSpider)._create_spider()
+
+    # Page 2 repeats two companies of page 1 and lists one company twice
+    requests = list(spider.parse(listing_response('listing_page1.html', 1)))
+    requests += list(spider.parse(listing_response('listing_page2.html', 2)))
+
+    details = [r for r in requests if r.callback == spider.parse_company_details]
+    ids = Counter(r.meta['company_id'] for r in details)
+    assert set(ids.values()) == {1}
+    assert sorted(ids) == [str(row_id) for row_id in range(5100, 5114)]
+    assert all(r.url == spider.DETAIL_URL.format(r.meta['company_id']) for r in details)
+
+    # The listing pages are scheduled once too, by the first page that shows them
+    pages = [r.meta['page'] for r in requests if r.callback == spider.parse]
+    assert pages == list(range(2, 43))
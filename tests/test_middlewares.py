@@ -0,0 +1,269 @@
+import os
+import sys
+import gzip
+import asyncio
+
+import pytest
+
+# The Scrapy project package lives one level down, next to scrapy.cfg
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.downloadermiddlewares.httpcompression import HttpCompressionMiddleware
+from scrapy.http import HtmlResponse, Request, Response
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.archive import ResponseArchive
+from teknokent_scraper.middlewares import (
+    DownloadModeMiddleware,
+    RenderProbeMiddleware,
+    TeknokentScraperDownloaderMiddleware,
+    TeknokentScraperSpiderMiddleware,
+)
+from teknokent_scraper.playwright_pool import should_abort_request
+
+
+class ProbeSpider(scrapy.Spider):
+    name = "probe"
+    render_probes = {'parse': 'div.company'}
+
+    def parse(self, response):
+        pass
+
+
+@pytest.fixture
+def crawler():
+    crawler = get_crawler(ProbeSpider)
+    crawler.spider = crawler._create_spider()
+    return crawler
+
+
+class TestDownloadModeMiddleware:
+
+    def test_plain_http_by_default(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        request = Request("https://example.org/")
+        mw.process_request(request, crawler.spider)
+        assert request.meta['download_mode'] == 'http'
+        assert request.meta['playwright'] is False
+
+    def test_request_can_ask_for_playwright(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        request = Request("https://example.org/", meta={'download_mode': 'playwright'})
+        mw.process_request(request, crawler.spider)
+        assert request.meta['playwright'] is True
+
+    def test_playwright_requests_share_a_context_per_domain(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        first = Request("https://www.example.org/a", meta={'download_mode': 'playwright'})
+        second = Request("https://example.org/b", meta={'download_mode': 'playwright'})
+        mw.process_request(first, crawler.spider)
+        mw.process_request(second, crawler.spider)
+        assert first.meta['playwright_context'] == second.meta['playwright_context'] == 'example.org'
+
+    def test_failed_probe_escalates_once(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        probe = RenderProbeMiddleware.from_crawler(crawler)
+        spider = crawler.spider
+        request = Request("https://example.org/", callback=spider.parse)
+        mw.process_request(request, spider)
+        response = HtmlResponse(request.url, body=b"<html><body></body></html>", request=request)
+
+        retry = probe.process_response(request, response, spider)
+        assert isinstance(retry, Request)
+        assert retry.dont_filter
+        mw.process_request(retry, spider)
+        assert retry.meta['playwright'] is True
+
+        # The rendered response is returned as is, even if the probe still fails
+        rendered = HtmlResponse(retry.url, body=b"<html></html>", request=retry)
+        assert probe.process_response(retry, rendered, spider) is rendered
+        assert crawler.stats.get_value('download_mode/escalated') == 1
+
+    def test_matching_probe_keeps_http_response(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        probe = RenderProbeMiddleware.from_crawler(crawler)
+        spider = crawler.spider
+        request = Request("https://example.org/", callback=spider.parse)
+        mw.process_request(request, spider)
+        response = HtmlResponse(request.url, body=b'<div class="company">A</div>', request=request)
+        assert probe.process_response(request, response, spider) is response
+
+    def test_request_can_turn_the_probe_off(self, crawler, tmp_path, monkeypatch):
+        from teknokent_scraper.spiders.bilkent_teknokent_spider import BilkentSpider
+
+        monkeypatch.chdir(tmp_path)
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        probe = RenderProbeMiddleware.from_crawler(crawler)
+        bilkent = get_crawler(BilkentSpider)._create_spider()
+        # A page without pagination: the next one may be past the end of the archive
+        page = Request(BilkentSpider.ARCHIVE_URL.format(1), meta={'page': 1, 'download_mode': 'http'})
+        body = b'<div class="e-bulletin-image-box"><h3 class="title">Acme</h3></div>'
+        (request,) = [r for r in bilkent.parse(HtmlResponse(page.url, body=body, request=page)) if isinstance(r, Request)]
+        assert request.meta['render_probe'] is None
+
+        mw.process_request(request, bilkent)
+        empty = HtmlResponse(request.url, body=b"<html><body></body></html>", request=request)
+        assert probe.process_response(request, empty, bilkent) is empty
+
+    def test_probe_sees_decompressed_responses(self, crawler):
+        mw = DownloadModeMiddleware.from_crawler(crawler)
+        probe = RenderProbeMiddleware.from_crawler(crawler)
+        compression = HttpCompressionMiddleware.from_crawler(crawler)
+        spider = crawler.spider
+        request = Request("https://example.org/", callback=spider.parse)
+        mw.process_request(request, spider)
+        encoded = Response(
+            request.url,
+            body=gzip.compress(b"<html><body>rendered by script</body></html>"),
+            headers={'Content-Type': 'text/html', 'Content-Encoding': 'gzip'},
+            request=request,
+        )
+        # Responses pass the middlewares from the highest priority down:
+        # 590 decompresses before 585 probes
+        decoded = compression.process_response(request, encoded, spider)
+        assert isinstance(probe.process_response(request, decoded, spider), Request)
+        assert crawler.stats.get_value('download_mode/escalated') == 1
+
+    def test_probe_runs_below_http_compression(self):
+        from scrapy.settings import Settings
+        from teknokent_scraper import settings as project_settings
+
+        settings = Settings()
+        settings.setmodule(project_settings)
+        order = settings.getwithbase('DOWNLOADER_MIDDLEWARES')
+        compression = order['scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware']
+        assert order['teknokent_scraper.middlewares.RenderProbeMiddleware'] < compression
+
+    def test_escalation_can_be_switched_off(self):
+        crawler = get_crawler(ProbeSpider, {'DOWNLOAD_MODE_ESCALATE': False})
+        with pytest.raises(NotConfigured):
+            RenderProbeMiddleware.from_crawler(crawler)
+
+
+class FakePlaywrightRequest:
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.resource_type = resource_type
+
+
+@pytest.mark.parametrize("url, resource_type, aborted", [
+    ("https://example.org/logo.png", "image", True),
+    ("https://example.org/font.woff2", "font", True),
+    ("https://www.google-analytics.com/analytics.js", "script", True),
+    ("https://example.org/wp-admin/admin-ajax.php", "xhr", False),
+    ("https://example.org/", "document", False),
+])
+def test_should_abort_request(url, resource_type, aborted):
+    assert should_abort_request(FakePlaywrightRequest(url, resource_type)) is aborted
+
+
+class TestArchiveMiddleware:
+
+    def make(self, tmp_path, mode, **settings):
+        crawler = get_crawler(ProbeSpider, {'ARCHIVE_MODE': mode, 'ARCHIVE_DIR': str(tmp_path), **settings})
+        crawler.spider = crawler._create_spider()
+        return TeknokentScraperDownloaderMiddleware.from_crawler(crawler), crawler
+
+    def test_disabled_without_mode(self):
+        with pytest.raises(NotConfigured):
+            TeknokentScraperDownloaderMiddleware.from_crawler(get_crawler(ProbeSpider))
+
+    def test_record_then_replay(self, tmp_path):
+        mw, crawler = self.make(tmp_path, 'record')
+        body = b'<div class="company">ACME</div>'
+        for page in (1, 2):
+            request = Request(f"https://example.org/list?page={page}")
+            response = HtmlResponse(request.url, body=body, headers={'ETag': '"v1"'}, request=request)
+            assert mw.process_response(request, response, crawler.spider) is response
+        mw.spider_closed(crawler.spider)
+        # Both pages share one stored body
+        assert crawler.stats.get_value('archive/recorded') == 2
+        assert crawler.stats.get_value('archive/bodies_stored') == 1
+
+        mw, crawler = self.make(tmp_path, 'replay')
+        request = Request("https://example.org/list?page=2")
+        response = mw.process_request(request, crawler.spider)
+        assert isinstance(response, HtmlResponse)
+        assert response.body == body
+        assert response.headers['ETag'] == b'"v1"'
+        assert response.request is request
+        assert 'archived' in response.flags
+        assert crawler.stats.get_value('archive/hit') == 1
+
+    def test_latest_response_wins(self, tmp_path):
+        mw, crawler = self.make(tmp_path, 'record')
+        request = Request("https://example.org/")
+        mw.process_response(request, HtmlResponse(request.url, status=503, body=b'busy'), crawler.spider)
+        mw.process_response(request, HtmlResponse(request.url, body=b'ok'), crawler.spider)
+        mw.spider_closed(crawler.spider)
+
+        archive = ResponseArchive(os.path.join(tmp_path, 'probe'))
+        assert len(archive) == 1
+        assert archive.get(next(iter(archive.entries)), request).body == b'ok'
+        with open(archive.index_path) as f:
+            assert len(f.readlines()) == 1
+
+    def test_replay_miss(self, tmp_path):
+        mw, crawler = self.make(tmp_path, 'replay')
+        with pytest.raises(IgnoreRequest):
+            mw.process_request(Request("https://example.org/missing"), crawler.spider)
+
+        mw, crawler = self.make(tmp_path, 'replay', ARCHIVE_REPLAY_MISSING='fetch')
+        assert mw.process_request(Request("https://example.org/missing"), crawler.spider) is None
+        assert crawler.stats.get_value('archive/miss') == 1
+
+
+class TestCallbackMetrics:
+
+    def test_times_and_counts_per_callback(self, tmp_path):
+        crawler = get_crawler(ProbeSpider, {'CALLBACK_METRICS_FILE': str(tmp_path / '%(name)s.prom')})
+        crawler.spider = crawler._create_spider()
+        mw = TeknokentScraperSpiderMiddleware.from_crawler(crawler)
+        spider = crawler.spider
+        request = Request("https://example.org/", callback=spider.parse)
+        response = HtmlResponse(request.url, body=b'', request=request)
+
+        def callback():
+            yield {'company_name': 'ACME'}
+            yield Request("https://example.org/a")
+            yield Request("https://example.org/b")
+
+        for _ in range(2):
+            assert len(list(mw.process_spider_output(response, callback(), spider))) == 3
+        mw.spider_closed(spider)
+
+        assert crawler.stats.get_value('callbacks/parse/responses') == 2
+        assert crawler.stats.get_value('callbacks/parse/items') == 2
+        assert crawler.stats.get_value('callbacks/parse/requests') == 4
+        assert crawler.stats.get_value('callbacks/parse/wall_seconds') >= 0
+        metrics = (tmp_path / 'probe.prom').read_text()
+        assert '# TYPE teknokent_callback_requests_total counter' in metrics
+        assert 'teknokent_callback_requests_total{spider="probe",callback="parse"} 4' in metrics
+
+    def test_async_output_and_errors(self, crawler):
+        mw = TeknokentScraperSpiderMiddleware.from_crawler(crawler)
+
+        def parse_detail(response):
+            pass
+
+        response = HtmlResponse("https://example.org/", body=b'', request=Request("https://example.org/", callback=parse_detail))
+
+        async def callback():
+            yield {'company_name': 'ACME'}
+
+        async def consume():
+            return [output async for output in mw.process_spider_output_async(response, callback(), crawler.spider)]
+
+        assert len(asyncio.run(consume())) == 1
+
+        def failing():
+            yield {'company_name': 'ACME'}
+            raise ValueError("broken page")
+
+        with pytest.raises(ValueError):
+            list(mw.process_spider_output(response, failing(), crawler.spider))
+        # The failed response is still counted
+        assert mw.callbacks['parse_detail']['responses'] == 2
+        assert mw.callbacks['parse_detail']['items'] == 2
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+scrapy = pytest.importorskip("scrapy")
+
+from benchmarks import parse_bench
+
+
+def test_every_fixture_case_parses_like_the_baseline():
+    results = parse_bench.run(rounds=1)
+    baseline = parse_bench.load_baseline()
+
+    assert set(results) == {case['name'] for case in parse_bench.CASES}
+    for name, metrics in results.items():
+        assert metrics['items'] or metrics['requests'], name
+        expected = baseline['cases'][name]
+        assert (metrics['items'], metrics['requests']) == (expected['items'], expected['requests']), name
+
+
+def test_spiders_are_created_without_touching_the_file_system(monkeypatch):
+    from scrapy.utils.test import get_crawler
+
+    def makedirs(*args, **kwargs):
+        raise PermissionError(args[0])
+
+    monkeypatch.setattr(os, 'makedirs', makedirs)
+    for case in parse_bench.CASES:
+        get_crawler(case['spider'])._create_spider()
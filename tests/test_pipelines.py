@@ -0,0 +1,81 @@
+import os
+import sys
+import unicodedata
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.pipelines import TeknokentScraperPipeline, clean_text, normalize_item, turkish_title
+from teknokent_scraper.settings import ITEM_DEFAULTS
+
+
+class ItuSpider(scrapy.Spider):
+    name = "itu"
+
+
+def make_pipeline(**settings):
+    crawler = get_crawler(ItuSpider, {'ITEM_DEFAULTS': ITEM_DEFAULTS, **settings})
+    spider = crawler._create_spider()
+    pipeline = TeknokentScraperPipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    return crawler, spider, pipeline
+
+
+def test_clean_text_unicode_spaces_and_invisibles():
+    assert clean_text("  Acme\xa0Yazılım​  A.Ş.　") == "Acme Yazılım A.Ş."
+    assert clean_text("Tel:\t0312\r\n555\x00 12 34") == "Tel: 0312 555 12 34"
+    assert clean_text(unicodedata.normalize("NFD", "İzmir")) == "İzmir"
+
+
+def test_turkish_case_rules():
+    assert turkish_title("İZMİR") == "İzmir"
+    assert turkish_title("ISPARTA KIRIKKALE") == "Isparta Kırıkkale"
+    item = normalize_item({
+        'company_name': ['Acme ', '', ' Ltd'],
+        'company_contact_mail': 'İNFO@ACME.COM.TR',
+        'company_location': 'SARIYER, İSTANBUL',
+    }, {})
+    assert item['company_name'] == 'Acme; Ltd'
+    assert item['company_contact_mail'] == 'info@acme.com.tr'
+    assert item['company_location'] == 'Sarıyer, İstanbul'
+
+
+def test_per_spider_defaults_and_drop():
+    # Unbatched by default: the item comes straight back
+    _, spider, pipeline = make_pipeline()
+    item = pipeline.process_item(CompanyDetailsItem(company_name='Acme'), spider)
+    assert item['company_location'] == 'İstanbul'
+    assert item['company_phone'] == ''
+    with pytest.raises(DropItem):
+        pipeline.process_item(CompanyDetailsItem(company_name=' \xa0'), spider)
+
+
+class PendingCall:
+    def active(self):
+        return False
+
+
+def test_batches_fire_when_full_and_on_close(monkeypatch):
+    crawler, spider, pipeline = make_pipeline(NORMALIZE_BATCH_SIZE=2)
+    scheduled = []
+    monkeypatch.setattr(pipeline, 'schedule_flush', lambda spider: scheduled.append(spider) or PendingCall())
+
+    results, errors = [], []
+    for name in ('A', 'B', '', 'C', 'D'):
+        deferred = pipeline.process_item({'company_name': name}, spider)
+        deferred.addCallbacks(results.append, lambda failure: errors.append(failure.value))
+    # Two full batches went out, the empty name was dropped with its batch
+    assert [item['company_name'] for item in results] == ['A', 'B', 'C']
+    assert len(errors) == 1 and isinstance(errors[0], DropItem)
+    # A timer for every batch that started, the last one is still pending
+    assert len(scheduled) == 3
+
+    pipeline.close_spider(spider)
+    assert [item['company_name'] for item in results] == ['A', 'B', 'C', 'D']
+    assert crawler.stats.get_value('normalize/batches') == 3
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.http import Request
+
+from replay_server import start_server
+from teknokent_scraper.replay import replay_url
+
+
+@pytest.fixture
+def server():
+    server = start_server(seed=1)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_replay_url_keeps_host_path_and_query():
+    request = Request("https://www.ariteknokent.com.tr/tr/getCompanyInformations?rowID=42")
+    assert replay_url("http://127.0.0.1:8765/", request) == (
+        "http://127.0.0.1:8765/www.ariteknokent.com.tr/tr/getCompanyInformations?rowID=42"
+    )
+
+
+def test_listing_links_vary_per_page(server):
+    base = f"{server.url}/www.ariteknokent.com.tr/tr/teknoloji-firmalari/teknokentli-firmalar"
+    first = urlopen(f"{base}?page=1").read()
+    second = urlopen(f"{base}?page=2").read()
+    assert b'data-row-id="51000"' in first
+    assert b'data-row-id="51001"' in second
+    # The same URL always gets the same links
+    assert urlopen(f"{base}?page=1").read() == first
+
+
+def test_json_fixture_and_unknown_url(server):
+    with urlopen(f"{server.url}/api.gaziteknopark.com.tr/Unit/GetUnitByPaginationAll") as response:
+        assert response.headers['Content-Type'].startswith('application/json')
+        assert json.load(response)['data']['unitUi']
+
+    with pytest.raises(HTTPError) as error:
+        urlopen(f"{server.url}/example.org/")
+    assert error.value.code == 404
+    assert server.counts['not_found'] == 1
+
+
+def test_injected_errors():
+    server = start_server(error_rate=1.0, seed=1)
+    try:
+        with pytest.raises(HTTPError) as error:
+            urlopen(f"{server.url}/odtuteknokent.com.tr/tr/firmalar/tum-firmalar.php")
+        assert error.value.code == 503
+        assert server.counts['errors'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_replay_feed_uri():
+    from teknokent_scraper.replay import replay_feed_uri
+
+    assert replay_feed_uri('outputs/ODTU/odtu_companies.json', 'outputs/replay') == 'outputs/replay/ODTU/odtu_companies.json'
+    assert replay_feed_uri(
+        '/Users/user/teknokent_scraper/teknokent_scraper/outputs/ITU_TEKNOKENT/companies_%(name)s.csv', 'replay'
+    ) == 'replay/ITU_TEKNOKENT/companies_%(name)s.csv'
+    assert replay_feed_uri('file:///tmp/companies.jsonl', 'replay') == 'replay/companies.jsonl'
+
+
+def replay_crawler(spidercls, **settings):
+    from scrapy.crawler import Crawler
+    from scrapy.settings import Settings
+    from teknokent_scraper import settings_replay
+
+    project = Settings()
+    project.setmodule(settings_replay)
+    for name, value in settings.items():
+        project.set(name, value, priority='cmdline')
+    crawler = Crawler(spidercls, project)
+    # The add-on step of Crawler._apply_settings(), without a reactor
+    crawler.addons.load_settings(crawler.settings)
+    return crawler
+
+
+def test_replay_profile_moves_the_spiders_own_outputs():
+    from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+    settings = replay_crawler(OdtuSpider).settings
+    feeds = settings.getdict('FEEDS')
+    assert 'outputs/replay/ODTU/odtu_companies.json' in feeds
+    assert all(uri.startswith('outputs/replay/') for uri in feeds)
+    assert settings['STORAGE_PATH'].startswith('outputs/replay/')
+    assert settings['DEDUP_OUTPUT'].startswith('outputs/replay/')
+    assert not settings.getbool('CHANGES_ENABLED')
+
+
+def test_replay_changes_compare_replays_only():
+    from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+    settings = replay_crawler(OdtuSpider, CHANGES_ENABLED=True).settings
+    history_uri = next(uri for uri in settings.getdict('FEEDS') if '%(run_time)s' in uri)
+    assert history_uri.startswith(settings['CHANGES_HISTORY_DIR'] + '/%(name)s/')
+    assert settings['CHANGES_DIR'].startswith('outputs/replay/')
+
+
+def test_replay_history_is_kept_apart():
+    from teknokent_scraper.history import HISTORY_FEED
+    from teknokent_scraper.spiders.itu_teknokent_spider import ItuTeknokentSpider
+    from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+    (uri, options), = HISTORY_FEED.items()
+    feeds = replay_crawler(OdtuSpider).settings.getdict('FEEDS')
+    assert feeds['outputs/replay/' + uri[len('outputs/'):]] == options
+    # The project's history feed, used by the spiders without their own FEEDS
+    feeds = replay_crawler(ItuTeknokentSpider).settings.getdict('FEEDS')
+    assert any(uri.startswith('outputs/replay/history/') for uri in feeds)
+    assert not any(uri.startswith('outputs/history/') for uri in feeds)
+
+
+def test_command_line_feeds_are_kept():
+    from teknokent_scraper.spiders.odtu_teknokent import OdtuSpider
+
+    settings = replay_crawler(OdtuSpider, FEEDS={'/tmp/odtu.jsonl': {'format': 'jsonlines'}}).settings
+    assert list(settings.getdict('FEEDS')) == ['/tmp/odtu.jsonl']
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+scrapy = pytest.importorskip("scrapy")
+from scrapy.utils.test import get_crawler
+
+from teknokent_scraper.items import CompanyDetailsItem
+from teknokent_scraper.storage import CompanyStore, CompanyStorePipeline
+
+
+class OdtuSpider(scrapy.Spider):
+    name = "odtu"
+
+
+def crawl(path, items, batch_size=2):
+    crawler = get_crawler(OdtuSpider, {'STORAGE_PATH': str(path), 'STORAGE_BATCH_SIZE': batch_size})
+    spider = crawler._create_spider()
+    pipeline = CompanyStorePipeline.from_crawler(crawler)
+    pipeline.open_spider(spider)
+    for item in items:
+        assert pipeline.process_item(item, spider) is item
+    pipeline.close_spider(spider)
+    return crawler.stats
+
+
+def test_batched_upserts_keep_known_values(tmp_path):
+    path = tmp_path / 'companies.sqlite3'
+    stats = crawl(path, [
+        CompanyDetailsItem(company_name='Acme Savunma A.Ş.', company_website='https://www.acme.com.tr',
+                           company_contact_mail='info@acme.com.tr', company_area='Savunma Sanayi'),
+        CompanyDetailsItem(company_name='Beta Yazılım', company_website='beta.com', company_area='Yazılım'),
+        CompanyDetailsItem(company_name='Gamma', company_website='gamma.com.tr', company_area='SAVUNMA'),
+        CompanyDetailsItem(company_name=''),
+    ])
+    assert stats.get_value('storage/rows') == 3
+    assert stats.get_value('storage/transactions') == 2
+
+    # A later crawl finds Acme again, without a website this time
+    crawl(path, [CompanyDetailsItem(company_name='ACME SAVUNMA A.Ş.', company_phone='0312 555 00 00')])
+
+    store = CompanyStore(str(path))
+    assert store.db.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert len(store) == 3
+    (acme,) = store.search(name='Acme Savunma A.Ş.')
+    assert acme['company_website'] == 'https://www.acme.com.tr'
+    assert acme['company_phone'] == '0312 555 00 00'
+    assert acme['company_name'] == 'ACME SAVUNMA A.Ş.'
+    assert acme['email_domain'] == 'acme.com.tr'
+    assert acme['first_seen'] <= acme['last_seen']
+
+
+def test_search_uses_the_indexes():
+    store = CompanyStore(':memory:')
+    rows = [
+        ('odtu', 'acme', 'Acme', '', '', '', 'https://acme.com.tr', '', 'Savunma', 'acme.com.tr', 'rt.moc.emca', '', 't', 't'),
+        ('itu', 'beta', 'Beta', '', '', '', 'https://beta.com', '', 'Savunma', 'beta.com', 'moc.ateb', '', 't', 't'),
+        ('itu', 'gamma', 'Gamma', '', '', '', 'https://com.tr', '', 'Yazılım', 'com.tr', 'rt.moc', '', 't', 't'),
+        ('gazi', 'delta', 'Delta', '', '', '', 'https://deltacom.tr', '', 'SAVUNMA', 'deltacom.tr', 'rt.mocatled', '', 't', 't'),
+    ]
+    store.upsert(rows)
+    assert [r['company_name'] for r in store.search(domain_suffix='.com.tr')] == ['Acme', 'Gamma']
+    assert [r['company_name'] for r in store.search(domain_suffix='.com.tr', area='savunma')] == ['Acme']
+    assert [r['company_name'] for r in store.search(area='SAVUNMA', teknokent='gazi')] == ['Delta']
+
+    plan = " ".join(row[3] for row in store.db.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM companies WHERE website_rdomain >= ? AND website_rdomain < ?", ('rt.moc.', 'rt.moc/')
+    ))
+    assert 'companies_website_rdomain' in plan
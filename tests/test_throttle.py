@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'teknokent_scraper'))
+
+pytest.importorskip("scrapy")
+from teknokent_scraper.throttle import SlotThrottle, profile_for
+
+PROFILES = {
+    "ariteknokent.com.tr": {"max_concurrency": 8, "min_delay": 0.1, "target_latency": 0.5},
+}
+
+
+def test_profile_matches_subdomains():
+    domain, profile = profile_for("www.ariteknokent.com.tr", PROFILES)
+    assert domain == "ariteknokent.com.tr"
+    assert profile["max_concurrency"] == 8
+
+
+def test_unknown_host_gets_default_profile():
+    domain, profile = profile_for("example.org", PROFILES, {"min_delay": 2.0})
+    assert domain == "example.org"
+    assert profile["max_concurrency"] == 1
+    assert profile["min_delay"] == 2.0
+
+
+def test_fast_responses_raise_concurrency_up_to_the_profile():
+    _, profile = profile_for("ariteknokent.com.tr", PROFILES)
+    throttle = SlotThrottle("ariteknokent.com.tr", profile)
+    for _ in range(200):
+        throttle.on_response(200, 0.05)
+    assert throttle.concurrency == 8
+    assert throttle.delay == pytest.approx(0.1)
+
+
+def test_slow_responses_and_errors_back_off():
+    _, profile = profile_for("ariteknokent.com.tr", PROFILES)
+    throttle = SlotThrottle("ariteknokent.com.tr", profile)
+    for _ in range(200):
+        throttle.on_response(200, 0.05)
+
+    throttle.on_response(200, 3.0)
+    assert throttle.concurrency == 7
+
+    throttle.on_response(429, 0.05)
+    assert throttle.concurrency == 3
+    assert throttle.delay >= 0.5
+    assert throttle.backoffs == 1
+
+
+def test_profile_is_applied_again_to_a_recreated_slot():
+    from types import SimpleNamespace
+    from scrapy.http import Request
+    from scrapy.utils.test import get_crawler
+    from teknokent_scraper.throttle import AdaptiveThrottle
+
+    crawler = get_crawler(settings_dict={'THROTTLE_PROFILES': PROFILES})
+    slots = {}
+    crawler.engine = SimpleNamespace(downloader=SimpleNamespace(slots=slots))
+    throttle = AdaptiveThrottle.from_crawler(crawler)
+    spider = SimpleNamespace(logger=SimpleNamespace(info=lambda message: None))
+    request = Request('https://ariteknokent.com.tr/', meta={'download_slot': 'ariteknokent.com.tr'})
+
+    slots['ariteknokent.com.tr'] = SimpleNamespace(concurrency=16, delay=0)
+    throttle.request_reached_downloader(request, spider)
+    assert (slots['ariteknokent.com.tr'].concurrency, slots['ariteknokent.com.tr'].delay) == (1, 0.1)
+
+    # Scrapy dropped the idle slot and made a fresh one with its defaults
+    slots['ariteknokent.com.tr'] = SimpleNamespace(concurrency=16, delay=0)
+    throttle.request_reached_downloader(request, spider)
+    assert (slots['ariteknokent.com.tr'].concurrency, slots['ariteknokent.com.tr'].delay) == (1, 0.1)
+    assert crawler.stats.get_value('throttle/ariteknokent.com.tr/slots_recreated') == 1
@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("aiohttp")
+from utils.website_liveness import check_store, check_websites, website_url
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """/ok, /moved (-> /ok), /no-head (405 on HEAD), /slow (2 s), /slow-no-head (both 0.35 s)
+    and /page<n> (50 ms, counted)"""
+
+    in_flight = 0
+    most_in_flight = 0
+    lock = threading.Lock()
+
+    def answer(self):
+        if self.path == '/slow':
+            time.sleep(2)
+        elif self.path == '/slow-no-head':
+            time.sleep(0.35)
+        elif self.path.startswith('/page'):
+            with self.lock:
+                StandIn.in_flight += 1
+                StandIn.most_in_flight = max(StandIn.most_in_flight, StandIn.in_flight)
+            time.sleep(0.05)
+            # Before the client has its answer and can send the next request
+            with self.lock:
+                StandIn.in_flight -= 1
+
+        if self.path == '/moved':
+            self.send_response(301)
+            self.send_header('Location', '/ok')
+        elif self.path in ('/no-head', '/slow-no-head') and self.command == 'HEAD':
+            self.send_response(405)
+        elif self.path.startswith(('/ok', '/no-head', '/page', '/slow')):
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    StandIn.most_in_flight = 0
+    # A dotted host name that resolves locally
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+
+
+def test_placeholders_are_not_probed():
+    assert website_url('http://-') is None
+    assert website_url('#') is None
+    assert website_url('') is None
+    assert website_url('acme.com.tr') == 'http://acme.com.tr'
+    assert website_url('https://acme.com.tr; https://acme.com') == 'https://acme.com.tr'
+
+
+async def check(websites, **options):
+    return {website: result async for website, result in check_websites(websites, **options)}
+
+
+def test_status_redirects_fallback_and_timeout(server):
+    results = asyncio.run(check([f'{server}/ok', f'{server}/moved', f'{server}/no-head', f'{server}/slow', 'http://-'],
+                                timeout=0.5))
+    assert results[f'{server}/ok']['status'] == 200
+    assert results[f'{server}/ok']['method'] == 'HEAD'
+    assert results[f'{server}/moved']['final_url'] == f'{server}/ok'
+    assert results[f'{server}/no-head']['status'] == 200
+    assert results[f'{server}/no-head']['method'] == 'GET'
+    assert results[f'{server}/slow']['error'] == 'timeout'
+    assert results['http://-']['error'] == 'invalid'
+    assert results[f'{server}/ok']['elapsed_ms'] > 0
+
+
+def test_timeout_covers_head_and_get_together(server):
+    # Each attempt fits in the timeout, the two together do not
+    results = asyncio.run(check([f'{server}/slow-no-head'], timeout=0.5))
+    result = results[f'{server}/slow-no-head']
+    assert result['method'] == 'GET'
+    assert result['error'] == 'timeout'
+    assert result['elapsed_ms'] < 650
+
+
+def test_per_host_limit(server):
+    websites = [f'{server}/page{i}' for i in range(20)]
+    results = asyncio.run(check(websites, concurrency=10, per_host=3, timeout=5))
+    assert {result['status'] for result in results.values()} == {200}
+    assert StandIn.most_in_flight <= 3
+
+
+def test_results_are_saved_next_to_the_companies(tmp_path, server):
+    db_path = str(tmp_path / 'companies.sqlite3')
+    db = sqlite3.connect(db_path)
+    db.execute("CREATE TABLE companies (company_name TEXT, company_website TEXT)")
+    db.executemany("INSERT INTO companies VALUES (?, ?)", [
+        ('Acme', f'{server}/moved'), ('Acme Ankara', f'{server}/moved'), ('Beta', 'http://-'), ('Gamma', ''),
+    ])
+    db.commit()
+
+    outcomes = asyncio.run(check_store(db_path, timeout=5))
+    assert outcomes == {'2xx': 1, 'invalid': 1}
+    rows = db.execute(
+        "SELECT c.company_name, w.status, w.final_url FROM companies c "
+        "JOIN website_checks w ON w.website = c.company_website ORDER BY c.company_name"
+    ).fetchall()
+    assert rows == [('Acme', 200, f'{server}/ok'), ('Acme Ankara', 200, f'{server}/ok'), ('Beta', None, None)]
+    # Checked a moment ago, so not again
+    assert asyncio.run(check_store(db_path, timeout=5)) == {}
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Fuzzy company entity resolution for the merged teknokent dataset.
+
+"3DTİM ELEKTRONİK ANONİM ŞİRKETİ" and "3DTIM Elektronik A.Ş." are the same
+company. Names are lowercased the Turkish way, folded to ASCII and stripped of
+trailing legal forms (A.Ş., LTD. ŞTİ., ANONİM ŞİRKETİ, SAN. VE TİC. ...).
+Their character n-grams get a MinHash signature, and locality-sensitive
+hashing over bands of the signature yields candidate pairs, so only names
+that share a bucket are ever compared. Candidates are checked with the exact
+Jaccard similarity of their n-grams and joined into clusters. Names with
+different numbers in them ("Firma 1", "Firma 2") are never joined, and
+neither are names whose first words differ ("Orion Otomasyon Bilişim" and
+"Ares Otomasyon Bilişim"): the first word is the brand, the rest is often
+a sector shared by many companies.
+
+Run time grows with the number of names, not with the number of pairs.
+"""
+
+import re
+import sys
+import time
+import zlib
+from itertools import combinations
+from collections import defaultdict
+
+import numpy as np
+
+TURKISH_LOWER = str.maketrans({"İ": "i", "I": "ı"})
+FOLD_TABLE = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+NON_WORD_RE = re.compile(r"[\W_]+")
+DIGITS_RE = re.compile(r"\d+")
+
+# Tokens of legal forms, stripped from the end of a name only:
+# "a s" (A.Ş.), "ltd sti", "anonim sirketi", "san ve tic ltd sti", ...
+LEGAL_TOKENS = frozenset({
+    "a", "s", "as", "anonim", "sirketi", "sirket", "ltd", "limited", "sti",
+    "san", "sanayi", "ve", "tic", "ticaret", "ith", "ihr", "ithalat", "ihracat",
+    "inc", "llc", "co", "corp", "gmbh",
+})
+
+# 2**61 - 1, coefficients stay below 2**31 so a * hash + b fits in 64 bits
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def canonical_name(name):
+    """'3DTİM ELEKTRONİK ANONİM ŞİRKETİ' -> '3dtim elektronik'"""
+    name = str(name).translate(TURKISH_LOWER).lower().translate(FOLD_TABLE)
+    tokens = NON_WORD_RE.sub(" ", name).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_TOKENS:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def shingles(name, ngram=3):
+    """Character n-grams of a canonical name, padded so short names get some"""
+    padded = f" {name} "
+    if len(padded) <= ngram:
+        return {padded}
+    return {padded[i:i + ngram] for i in range(len(padded) - ngram + 1)}
+
+
+def minhash_signatures(shingle_sets, num_perm=120, seed=1, chunk_size=2048):
+    """(len(shingle_sets), num_perm) array of MinHash values"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    # In chunks of names, so the (shingles x num_perm) matrix stays small
+    for start in range(0, len(shingle_sets), chunk_size):
+        chunk = shingle_sets[start:start + chunk_size]
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for shingle_set in chunk for s in shingle_set),
+            dtype=np.uint64,
+        )
+        sizes = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        permuted = (hashes[:, None] * a + b) % MERSENNE_PRIME
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=24, max_bucket=20):
+    """Index pairs whose signatures agree on at least one band"""
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for index, key in enumerate(map(bytes, chunk)):
+            buckets[key].append(index)
+        for members in buckets.values():
+            if len(members) > max_bucket:
+                # Against the first one only, so a crowded bucket (a common
+                # word) stays linear; matching pairs are joined through it
+                first = members[0]
+                pairs.update((first, other) for other in members[1:])
+            elif len(members) > 1:
+                pairs.update(combinations(members, 2))
+    return pairs
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def same_brand(a, b, ngram=3, threshold=0.5):
+    """First words equal, one a prefix of the other ("3d" / "3dtim") or alike"""
+    first_a, first_b = a.split(" ", 1)[0], b.split(" ", 1)[0]
+    if first_a.startswith(first_b) or first_b.startswith(first_a):
+        return True
+    return jaccard(shingles(first_a, ngram), shingles(first_b, ngram)) >= threshold
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def resolve(names, threshold=0.7, ngram=3, num_perm=120, bands=24, seed=1):
+    """Cluster company names that refer to the same company.
+
+    Returns a list of clusters, each a dict with the indices of its names in
+    ``members`` (first one first), the shared canonical name and a
+    ``confidence`` between 0 and 1: the weakest similarity that holds the
+    cluster together (1.0 for names that are equal after canonicalisation).
+    """
+    canonical = [canonical_name(name) for name in names]
+
+    # Equal canonical names are merged up front and share one signature
+    groups = defaultdict(list)
+    for index, key in enumerate(canonical):
+        groups[key].append(index)
+    keys = list(groups)
+    key_shingles = [shingles(key, ngram) for key in keys]
+    key_numbers = [DIGITS_RE.findall(key) for key in keys]
+
+    union = UnionFind(len(keys))
+    confidence = [1.0] * len(keys)
+    if len(keys) > 1:
+        signatures = minhash_signatures(key_shingles, num_perm, seed)
+        for i, j in candidate_pairs(signatures, bands):
+            if key_numbers[i] != key_numbers[j]:
+                continue
+            similarity = jaccard(key_shingles[i], key_shingles[j])
+            if similarity >= threshold and same_brand(keys[i], keys[j], ngram):
+                root_i, root_j = union.find(i), union.find(j)
+                if root_i != root_j:
+                    union.union(i, j)
+                    root = union.find(i)
+                    confidence[root] = min(confidence[root_i], confidence[root_j], similarity)
+
+    clusters = defaultdict(list)
+    for key_index, key in enumerate(keys):
+        clusters[union.find(key_index)].extend(groups[key])
+    return [
+        {
+            "members": sorted(members),
+            "canonical_name": keys[root],
+            "confidence": round(confidence[root], 3),
+        }
+        for root, members in sorted(clusters.items(), key=lambda item: min(item[1]))
+    ]
+
+
+def cluster_ids(names, **options):
+    """(cluster id, confidence) for every name, ids numbered from 0"""
+    assigned = [None] * len(names)
+    for cluster_id, cluster in enumerate(resolve(names, **options)):
+        for index in cluster["members"]:
+            assigned[index] = (cluster_id, cluster["confidence"])
+    return assigned
+
+
+if __name__ == "__main__":
+    # Quick check on a file of names, one per line
+    with open(sys.argv[1], encoding="utf-8") as f:
+        names = [line.strip() for line in f if line.strip()]
+    started = time.perf_counter()
+    clusters = resolve(names)
+    elapsed = time.perf_counter() - started
+    for cluster in clusters:
+        if len(cluster["members"]) > 1:
+            print(f"{cluster['confidence']:.2f}  " + " | ".join(names[i] for i in cluster["members"]))
+    print(f"{len(names)} names, {len(clusters)} companies in {elapsed:.2f}s")
@@ -5,24 +5,96 @@ Script to merge all CSV files from teknokent scraper outputs into a single file.
 
 import pandas as pd
 import os
+import sys
 import glob
+import time
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.entity_resolution import cluster_ids
+
+# The partitioned Parquet feed of the spiders (teknokent_scraper/exporters.py),
+# written relative to teknokent_scraper/ where the crawls run
+PARQUET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "teknokent_scraper", "outputs", "parquet")
+
+# Output directory of each spider's CSV feed, which names the source teknokent
+SPIDER_DIRS = {
+    "ankara_teknokent_comprehensive": "ANKARA_UNI",
+    "bilkent": "BILKENT_CYBERPARK",
+    "ege_teknopark": "EGE_TEKNOKENT",
+    "gazi": "GAZI_TEKNOKENT",
+    "hacettepe": "HACETTEPE",
+    "itu": "ITU_TEKNOKENT",
+    "izmir_teknopark": "IZMIR_TEKNOKENT",
+    "odtu": "ODTU",
+}
+
+
+def load_parquet_outputs(parquet_dir=PARQUET_DIR):
+    """Latest run of every teknokent from the Parquet feed, or None if there is none"""
+    if not os.path.isdir(parquet_dir):
+        return None
+    # One read of the whole dataset; teknokent and run_date come from the paths
+    df = pd.read_parquet(parquet_dir)
+    if df.empty:
+        return None
+    # Partitions are named after the spider; label them like the CSV files
+    df['source_teknokent'] = df['teknokent'].astype(str).map(lambda name: SPIDER_DIRS.get(name, name))
+    # ISO dates sort as strings
+    run_date = df['run_date'].astype(str)
+    latest = run_date.groupby(df['source_teknokent']).transform('max')
+    df = df[run_date == latest].drop(columns=['teknokent', 'run_date', 'scraped_at'])
+    for name, count in df.groupby('source_teknokent').size().items():
+        print(f"Loaded {count} rows from {name} (parquet)")
+    return df
+
+
+def csv_files_to_merge(base_dir, parquet_sources=()):
+    """CSV files under base_dir, except those of teknokents the Parquet feed has"""
+    csv_files = glob.glob(os.path.join(base_dir, "**/*.csv"), recursive=True)
+    return [f for f in csv_files if os.path.basename(os.path.dirname(f)) not in parquet_sources]
+
+
+def resolve_companies(merged_df):
+    """One row per company: fuzzy-matched names collapsed, sources joined.
+
+    The first row of every cluster is kept, with the teknokents of all its
+    rows in source_teknokent and the cluster confidence in match_confidence.
+    """
+    started = time.perf_counter()
+    assigned = cluster_ids(merged_df['company_name'].fillna('').astype(str).tolist())
+    merged_df = merged_df.assign(
+        company_cluster=[cluster_id for cluster_id, _ in assigned],
+        match_confidence=[confidence for _, confidence in assigned],
+    )
+    sources = merged_df.groupby('company_cluster')['source_teknokent'].agg(
+        lambda values: '; '.join(dict.fromkeys(values))
+    )
+    resolved = merged_df.drop_duplicates(subset=['company_cluster'], keep='first').copy()
+    resolved['source_teknokent'] = resolved['company_cluster'].map(sources)
+    print(f"Resolved {len(merged_df)} rows into {len(resolved)} companies in {time.perf_counter() - started:.2f}s")
+    return resolved.drop(columns=['company_cluster'])
+
 def merge_csv_files():
     """Merge all CSV files from the outputs directory into a single file."""
     
     # Base directory containing all the CSV files
     base_dir = "/Users/user/Desktop/Projects/teknokent_scraper/teknokent_scraper/teknokent_scraper/outputs"
     
-    # Find all CSV files recursively
-    csv_files = glob.glob(os.path.join(base_dir, "**/*.csv"), recursive=True)
+    # The Parquet feed has the same items without parsing any CSV
+    parquet_df = load_parquet_outputs()
+    
+    # Find all CSV files recursively, for the teknokents without a Parquet partition
+    parquet_sources = set(parquet_df['source_teknokent']) if parquet_df is not None else set()
+    csv_files = csv_files_to_merge(base_dir, parquet_sources)
     
     print(f"Found {len(csv_files)} CSV files to merge:")
     for file in csv_files:
         print(f"  - {file}")
     
     # List to store all dataframes
-    all_dataframes = []
+    all_dataframes = [parquet_df] if parquet_df is not None else []
     
     # Read each CSV file and add a source column to track origin
     for csv_file in csv_files:
@@ -46,9 +118,10 @@ def merge_csv_files():
         # Merge all dataframes
         merged_df = pd.concat(all_dataframes, ignore_index=True)
         
-        # Remove any duplicate rows based on company name and location
+        # Merge rows of the same company, also when the names differ in case,
+        # legal form ("A.Ş." / "ANONİM ŞİRKETİ") or a few characters
         print(f"\nTotal rows before deduplication: {len(merged_df)}")
-        merged_df = merged_df.drop_duplicates(subset=['company_name', 'company_location'], keep='first')
+        merged_df = resolve_companies(merged_df)
         print(f"Total rows after deduplication: {len(merged_df)}")
         
         # Sort by source_teknokent and company_name for better organization
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Website liveness and redirect check for the companies in the SQLite store.
+
+company_website values come from many places (the ODTU table, Bilkent
+anchors, the Gazi description field, regex hits on Ankara pages) and many are
+dead, redirect elsewhere or are placeholders like "http://-". Every distinct
+website of teknokent_scraper/outputs/companies.sqlite3 is probed once: a HEAD
+request that follows redirects, and a GET when the server does not answer HEAD
+properly. Status, final URL and response time go to the website_checks table
+of the same database, one row per website, joined to companies on
+company_website:
+
+    SELECT c.company_name, w.status, w.final_url, w.elapsed_ms
+    FROM companies c JOIN website_checks w ON w.website = c.company_website
+
+The probes share one keep-alive connection pool with a DNS cache. At most
+--concurrency requests are in flight, at most --per-host of them to the same
+host, and every website gets --timeout seconds once it has its slot, HEAD and
+the GET fallback together, so a few slow hosts do not hold up the rest.
+Websites checked less than --max-age hours ago are skipped.
+
+    python utils/website_liveness.py --concurrency 200 --per-host 4 --timeout 10
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import aiohttp
+
+DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "teknokent_scraper", "outputs", "companies.sqlite3"
+)
+
+# Multi-valued fields are joined with this (teknokent_scraper/pipelines.py)
+LIST_SEPARATOR = "; "
+
+# Answers to HEAD that are worth a GET: servers that do not implement HEAD,
+# or that only refuse it
+HEAD_FALLBACK_STATUSES = frozenset({400, 403, 404, 405, 500, 501})
+
+USER_AGENT = "Mozilla/5.0 (compatible; teknokent-scraper website check)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS website_checks (
+    website TEXT PRIMARY KEY,
+    url TEXT,
+    status INTEGER,
+    final_url TEXT,
+    elapsed_ms REAL,
+    method TEXT,
+    error TEXT,
+    checked_at TEXT NOT NULL
+);
+"""
+
+
+def website_url(website):
+    """URL to probe for a company_website value, or None for a placeholder"""
+    website = (website or "").split(LIST_SEPARATOR, 1)[0].strip()
+    if "//" not in website:
+        website = "http://" + website
+    try:
+        parts = urlsplit(website)
+        host = parts.hostname or ""
+    except ValueError:
+        return None
+    # "http://-", "#", "www" and the like have no dotted host
+    if parts.scheme not in ("http", "https") or "." not in host.strip("."):
+        return None
+    return website
+
+
+async def probe(session, url, timeout):
+    """Status, final URL and response time of one URL, HEAD first, within ``timeout`` seconds"""
+    started = time.perf_counter()
+    result = {"url": url, "status": None, "final_url": None, "method": "HEAD", "error": None}
+    try:
+        # One deadline for HEAD and the GET fallback together
+        async with asyncio.timeout(timeout):
+            for method in ("HEAD", "GET"):
+                result["method"] = method
+                try:
+                    async with session.request(method, url, allow_redirects=True) as response:
+                        # Headers are enough, the body of a GET is never read
+                        result.update(status=response.status, final_url=str(response.url), error=None)
+                except asyncio.TimeoutError:
+                    # Connect timeout: a host too slow for HEAD will not be faster with GET
+                    result["error"] = "timeout"
+                    break
+                except aiohttp.ClientError as e:
+                    result["error"] = f"{type(e).__name__}: {e}"[:200]
+                if result["status"] is not None and result["status"] not in HEAD_FALLBACK_STATUSES:
+                    break
+    except TimeoutError:
+        result["error"] = "timeout"
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def check_websites(websites, concurrency=200, per_host=4, timeout=10.0, dns_ttl=600):
+    """Probe every website, yield (website, result) as the probes finish"""
+    connector = aiohttp.TCPConnector(
+        limit=concurrency, limit_per_host=per_host, ttl_dns_cache=dns_ttl, use_dns_cache=True,
+        ssl=False,  # liveness, not certificate validity
+    )
+    # probe() bounds each website as a whole; only connecting gets its own limit
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=min(timeout, 5))
+    overall = asyncio.Semaphore(concurrency)
+    hosts = {}
+
+    async def check(session, website):
+        url = website_url(website)
+        if url is None:
+            return website, {"url": None, "status": None, "final_url": None, "method": None,
+                             "error": "invalid", "elapsed_ms": None}
+        host = hosts.setdefault(urlsplit(url).hostname, asyncio.Semaphore(per_host))
+        # The host slot first, so waiting for a busy host does not hold an
+        # overall slot; the timeout starts once both are taken
+        async with host, overall:
+            return website, await probe(session, url, timeout)
+
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=client_timeout, headers={"User-Agent": USER_AGENT}
+    ) as session:
+        for done in asyncio.as_completed([check(session, website) for website in websites]):
+            yield await done
+
+
+def websites_to_check(db, max_age_hours):
+    """Distinct non-empty company_website values without a recent check"""
+    checked_after = (datetime.now(tz=timezone.utc) - timedelta(hours=max_age_hours)).isoformat()
+    rows = db.execute(
+        """
+        SELECT DISTINCT c.company_website FROM companies c
+        LEFT JOIN website_checks w ON w.website = c.company_website AND w.checked_at >= ?
+        WHERE c.company_website != '' AND w.website IS NULL
+        """,
+        (checked_after,),
+    )
+    return [website for (website,) in rows]
+
+
+async def check_store(db_path=DB_PATH, max_age_hours=24, batch_size=200, **options):
+    """Check the websites of the store and save the results, return a count per outcome"""
+    db = sqlite3.connect(db_path)
+    db.execute("PRAGMA busy_timeout = 5000")
+    db.executescript(SCHEMA)
+    websites = websites_to_check(db, max_age_hours)
+    print(f"Checking {len(websites)} websites")
+
+    outcomes = {}
+    rows = []
+
+    def save():
+        with db:
+            db.executemany("INSERT OR REPLACE INTO website_checks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        rows.clear()
+
+    async for website, result in check_websites(websites, **options):
+        checked_at = datetime.now(tz=timezone.utc).replace(microsecond=0).isoformat()
+        rows.append((website, result["url"], result["status"], result["final_url"],
+                     result["elapsed_ms"], result["method"], result["error"], checked_at))
+        outcome = result["error"].split(":", 1)[0] if result["error"] else f"{result['status'] // 100}xx"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        if len(rows) >= batch_size:
+            save()
+    save()
+    db.close()
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check which company websites are alive and where they redirect")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite store of the crawls (STORAGE_PATH)")
+    parser.add_argument("--concurrency", type=int, default=200, help="requests in flight")
+    parser.add_argument("--per-host", type=int, default=4, help="requests in flight to one host")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds per website")
+    parser.add_argument("--max-age", type=float, default=24, help="skip websites checked fewer hours ago")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"No store at {args.db}; run a crawl first")
+    started = time.perf_counter()
+    outcomes = asyncio.run(check_store(
+        args.db, max_age_hours=args.max_age,
+        concurrency=args.concurrency, per_host=args.per_host, timeout=args.timeout,
+    ))
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    for outcome, count in sorted(outcomes.items(), key=lambda item: -item[1]):
+        print(f"  {outcome}: {count}")
+
+
+if __name__ == "__main__":
+    main()